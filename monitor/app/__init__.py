@@ -0,0 +1,9 @@
+"""
+Pacote do monitor WegNots. create_app() expõe a API do painel administrativo
+(FLASK_APP=app:create_app()); o Flask só é importado quando a API é criada.
+"""
+
+
+def create_app(*args, **kwargs):
+    from .api import create_app as _create_app
+    return _create_app(*args, **kwargs)
@@ -0,0 +1,552 @@
+#!/usr/bin/env python3
+"""
+API REST do painel administrativo (wegnots-admin)
+
+Implementa as rotas usadas por src/services/monitoring.ts sobre o UserModel e
+o estado do monitor (registro de métricas, heartbeats, históricos). As listas
+usam paginação por _id (keyset: ?limit=N&after=<id>, próximo cursor no
+cabeçalho X-Next-Cursor) e projeção de campos (?fields=id,email). As respostas
+GET levam ETag; com If-None-Match o painel recebe 304 sem corpo enquanto os
+dados não mudam. GET /api/events transmite os eventos do monitor (alertas,
+estado das contas, fila de entrega) via Server-Sent Events. Todas as rotas
+exigem ADMIN_TOKEN, em "Authorization: Bearer <token>" ou no cabeçalho
+X-Admin-Token (?token= no stream, pois EventSource não envia cabeçalhos); sem
+ADMIN_TOKEN configurado a API responde 503 em todas as rotas.
+"""
+
+import os
+import hmac
+import logging
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional, Tuple
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from flask import Blueprint, Flask, Response, jsonify, request, current_app, abort
+from pymongo import MongoClient, ASCENDING
+from pymongo.errors import DuplicateKeyError
+from werkzeug.exceptions import HTTPException
+
+from .core.user_model import UserModel
+from .core.metrics import get_metrics
+from .core.heartbeat import get_heartbeats
+from .core.alert_classifier import load_alerts_config
+from .core.alert_history import get_alert_history
+from .core.metrics_store import get_metrics_store
+from .core.event_bus import get_event_bus
+from .core.rolling_stats import get_rolling_stats, RESOLUTIONS, COUNTERS
+from .core.sender_sketch import get_sender_analytics
+
+logger = logging.getLogger('wegnots.api')
+
+API_PREFIX = '/api'
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+# Comentário enviado ao stream de eventos quando nada acontece (mantém proxies e o navegador conectados)
+SSE_KEEPALIVE = 15
+
+# Campo da API -> campo do documento na coleção users
+EMAIL_FIELDS = {'id': '_id', 'email': 'email', 'description': 'name', 'isActive': 'is_active',
+                'createdAt': 'created_at', 'updatedAt': 'updated_at'}
+TELEGRAM_FIELDS = {'id': '_id', 'chatId': 'chat_id', 'description': 'name', 'isActive': 'is_active'}
+ROUTING_FIELDS = {'id': '_id', 'emailId': '_id', 'telegramChatIds': 'chat_id', 'senders': 'notification_rules',
+                  'useRocketChat': None, 'createdAt': 'created_at', 'updatedAt': 'updated_at'}
+
+api = Blueprint('api', __name__, url_prefix=API_PREFIX)
+
+
+# Serialização --------------------------------------------------------------
+
+def _json_value(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _requested_fields(fields: Dict[str, Optional[str]]) -> List[str]:
+    """Campos da API pedidos em ?fields= (todos, se omitido)"""
+    requested = [name for name in request.args.get('fields', '').split(',') if name]
+    unknown = [name for name in requested if name not in fields]
+    if unknown:
+        abort(400, description=f"campos desconhecidos: {', '.join(unknown)}")
+    return requested or list(fields)
+
+
+def _projection(fields: Dict[str, Optional[str]], names: List[str]) -> Dict[str, int]:
+    return {fields[name]: 1 for name in names if fields[name]}
+
+
+def _serialize(document: Dict[str, Any], fields: Dict[str, Optional[str]], names: List[str]) -> Dict[str, Any]:
+    item = {}
+    for name in names:
+        field = fields[name]
+        if name == 'isActive':
+            item[name] = document.get(field, True)
+        elif name == 'telegramChatIds':
+            item[name] = [document['chat_id']] if document.get('chat_id') else []
+        elif name == 'senders':
+            item[name] = [rule.get('sender') for rule in document.get(field) or []]
+        elif name == 'useRocketChat':
+            item[name] = False
+        else:
+            item[name] = _json_value(document.get(field))
+    return item
+
+
+def _object_id(value: str) -> ObjectId:
+    try:
+        return ObjectId(value)
+    except (InvalidId, TypeError):
+        abort(400, description='id inválido')
+
+
+# Paginação -----------------------------------------------------------------
+
+def paginate(collection, query: Dict[str, Any], projection: Dict[str, int],
+             limit: int, after: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Página ordenada por _id a partir do cursor `after` (exclusivo). Lê um
+    documento a mais para saber se há próxima página; retorna (itens, cursor).
+    """
+    if after:
+        query = {'$and': [query, {'_id': {'$gt': _object_id(after)}}]} if query else {'_id': {'$gt': _object_id(after)}}
+    documents = list(collection.find(query, projection).sort('_id', ASCENDING).limit(limit + 1))
+    if len(documents) > limit:
+        documents = documents[:limit]
+        return documents, str(documents[-1]['_id'])
+    return documents, None
+
+
+def _page_size() -> int:
+    try:
+        limit = int(request.args.get('limit', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        abort(400, description='limit inválido')
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def _list_users(query: Dict[str, Any], fields: Dict[str, Optional[str]]):
+    names = _requested_fields(fields)
+    documents, next_cursor = paginate(_users().collection, query, _projection(fields, names),
+                                      _page_size(), request.args.get('after'))
+    response = jsonify([_serialize(document, fields, names) for document in documents])
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
+
+
+def _users() -> UserModel:
+    user_model = current_app.config.get('USER_MODEL')
+    if user_model is None:
+        abort(503, description='MongoDB indisponível')
+    return user_model
+
+
+def _body() -> Dict[str, Any]:
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        abort(400, description='corpo JSON inválido')
+    return body
+
+
+def _update_user(user_id: str, update: Dict[str, Any]) -> Dict[str, Any]:
+    user_model = _users()
+    _id = _object_id(user_id)
+    if update:
+        update['updated_at'] = datetime.utcnow()
+        try:
+            user_model.collection.update_one({'_id': _id}, {'$set': update})
+        except DuplicateKeyError:
+            abort(409, description='e-mail ou chat_id já cadastrado')
+    user = user_model.collection.find_one({'_id': _id})
+    if user is None:
+        abort(404, description='usuário não encontrado')
+    return user
+
+
+# Autenticação, ETag e CORS ---------------------------------------------------
+
+@api.before_request
+def _authenticate():
+    if request.method == 'OPTIONS':
+        return None
+    admin_token = os.getenv('ADMIN_TOKEN', '')
+    if not admin_token:
+        # Sem token a API ficaria aberta a quem alcança a porta: falha fechada
+        abort(503, description='ADMIN_TOKEN não configurado')
+    authorization = request.headers.get('Authorization', '')
+    received = authorization[7:] if authorization.startswith('Bearer ') else request.headers.get('X-Admin-Token', '')
+    if not received and request.endpoint == 'api.event_stream':
+        received = request.args.get('token', '')
+    if not hmac.compare_digest(received, admin_token):
+        logger.warning(f"Acesso à API negado: {request.method} {request.path}")
+        abort(401)
+    return None
+
+
+@api.after_request
+def _conditional_response(response):
+    if request.method == 'GET' and response.status_code == 200 and response.is_json:
+        # ETag forte sobre o corpo: polling sem mudanças recebe 304
+        response.add_etag()
+        response.headers['Cache-Control'] = 'no-cache'
+        response.make_conditional(request)
+    origins = current_app.config.get('CORS_ORIGINS') or []
+    origin = request.headers.get('Origin')
+    if origin and ('*' in origins or origin in origins):
+        response.headers['Access-Control-Allow-Origin'] = origin
+        response.headers['Access-Control-Allow-Headers'] = 'Authorization, Content-Type, If-None-Match, X-Admin-Token'
+        response.headers['Access-Control-Allow-Methods'] = 'GET, POST, PUT, DELETE, OPTIONS'
+        response.headers['Access-Control-Expose-Headers'] = 'ETag, X-Next-Cursor'
+        response.headers['Vary'] = 'Origin'
+    return response
+
+
+@api.errorhandler(HTTPException)
+def _http_error(error):
+    response = jsonify({'ok': False, 'error': error.description if error.code != 401 else 'unauthorized'})
+    response.status_code = error.code
+    return response
+
+
+# E-mails monitorados e configurações do Telegram (coleção users) ------------
+
+@api.get('/emails')
+def list_emails():
+    return _list_users({}, EMAIL_FIELDS)
+
+
+@api.post('/emails')
+def create_email():
+    body = _body()
+    if not body.get('email') or not body.get('chatId'):
+        abort(400, description='email e chatId são obrigatórios')
+    try:
+        user = _users().create_user(body.get('description') or body['email'], body['email'], str(body['chatId']))
+    except DuplicateKeyError:
+        abort(409, description='e-mail ou chat_id já cadastrado')
+    if body.get('isActive') is False:
+        user = _update_user(str(user['_id']), {'is_active': False})
+    return jsonify(_serialize(user, EMAIL_FIELDS, list(EMAIL_FIELDS))), 201
+
+
+@api.put('/emails/<user_id>')
+def update_email(user_id):
+    body = _body()
+    update = {field: body[name] for name, field in EMAIL_FIELDS.items()
+              if name in ('email', 'description', 'isActive') and name in body}
+    return jsonify(_serialize(_update_user(user_id, update), EMAIL_FIELDS, list(EMAIL_FIELDS)))
+
+
+@api.delete('/emails/<user_id>')
+def delete_email(user_id):
+    _id = _object_id(user_id)
+    central = _users().get_central_server()
+    if central and central['_id'] == _id:
+        abort(409, description='o servidor central não pode ser removido')
+    if not _users().delete_user(_id):
+        abort(404, description='usuário não encontrado')
+    return '', 204
+
+
+@api.get('/telegram/configs')
+def list_telegram_configs():
+    return _list_users({'chat_id': {'$exists': True}}, TELEGRAM_FIELDS)
+
+
+@api.put('/telegram/configs/<user_id>')
+def update_telegram_config(user_id):
+    body = _body()
+    update = {field: (str(body[name]) if name == 'chatId' else body[name]) for name, field in TELEGRAM_FIELDS.items()
+              if name in ('chatId', 'description', 'isActive') and name in body}
+    return jsonify(_serialize(_update_user(user_id, update), TELEGRAM_FIELDS, list(TELEGRAM_FIELDS)))
+
+
+@api.post('/telegram/test')
+def test_telegram():
+    chat_id = _body().get('chatId')
+    telegram_client = current_app.config.get('TELEGRAM_CLIENT')
+    if not chat_id:
+        abort(400, description='chatId é obrigatório')
+    if telegram_client is None:
+        abort(503, description='cliente do Telegram indisponível')
+    success = telegram_client.send_text_message(
+        f"✅ *Teste de conexão*\n\n⏰ {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}\n"
+        "Mensagem enviada pelo painel administrativo.", chat_id=str(chat_id))
+    return jsonify({'success': bool(success),
+                    'message': 'Mensagem enviada' if success else 'Falha ao enviar mensagem'})
+
+
+# Roteamento (regras de notificação por remetente) ---------------------------
+
+@api.get('/routing-rules')
+def list_routing_rules():
+    return _list_users({'notification_rules.0': {'$exists': True}}, ROUTING_FIELDS)
+
+
+def _routing_rules(body: Dict[str, Any]) -> List[Dict[str, str]]:
+    senders = body.get('senders')
+    if not isinstance(senders, list) or not all(isinstance(sender, str) for sender in senders):
+        abort(400, description='senders deve ser uma lista de remetentes')
+    return [{'sender': sender.strip().lower()} for sender in dict.fromkeys(senders) if sender.strip()]
+
+
+@api.post('/routing-rules')
+def create_routing_rule():
+    """A regra pertence ao usuário (emailId); os alertas seguem para o chat_id dele"""
+    body = _body()
+    if not body.get('emailId'):
+        abort(400, description='emailId é obrigatório')
+    rules = _routing_rules(body)
+    if not rules:
+        abort(400, description='informe ao menos um remetente')
+    user = _users().collection.find_one({'_id': _object_id(body['emailId'])}, {'notification_rules': 1})
+    if user is None:
+        abort(404, description='usuário não encontrado')
+    if user.get('notification_rules'):
+        abort(409, description='o usuário já tem regras de roteamento; use PUT para alterá-las')
+    user = _update_user(body['emailId'], {'notification_rules': rules})
+    return jsonify(_serialize(user, ROUTING_FIELDS, list(ROUTING_FIELDS))), 201
+
+
+@api.put('/routing-rules/<user_id>')
+def update_routing_rule(user_id):
+    rules = _routing_rules(_body())
+    return jsonify(_serialize(_update_user(user_id, {'notification_rules': rules}),
+                              ROUTING_FIELDS, list(ROUTING_FIELDS)))
+
+
+@api.delete('/routing-rules/<user_id>')
+def delete_routing_rule(user_id):
+    _update_user(user_id, {'notification_rules': []})
+    return '', 204
+
+
+# Servidor central -----------------------------------------------------------
+
+def _central_server() -> Dict[str, Any]:
+    central = _users().get_central_server()
+    if central is None:
+        abort(404, description='servidor central não configurado')
+    return central
+
+
+def _central_payload(central: Dict[str, Any]) -> Dict[str, Any]:
+    return {'email': central.get('email'), 'chatId': central.get('chat_id'), 'isActive': central.get('is_active', True)}
+
+
+@api.get('/central-server')
+def get_central_server():
+    return jsonify(_central_payload(_central_server()))
+
+
+@api.put('/central-server')
+def update_central_server():
+    email = _body().get('email')
+    if not email:
+        abort(400, description='email é obrigatório')
+    return jsonify(_central_payload(_update_user(str(_central_server()['_id']), {'email': email})))
+
+
+@api.put('/central-server/status')
+def update_central_server_status():
+    active = _body().get('active')
+    if not isinstance(active, bool):
+        abort(400, description='active deve ser booleano')
+    return jsonify(_central_payload(_update_user(str(_central_server()['_id']), {'is_active': active})))
+
+
+# Estado e configuração do monitor -------------------------------------------
+
+def _iso(timestamp: Optional[float]) -> Optional[str]:
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat() if timestamp else None
+
+
+@api.get('/monitoring/status')
+def monitoring_status():
+    """
+    Estado no formato SystemStatus do painel. Só contém valores que mudam a
+    cada verificação (sem uptime/idades), para que o ETag se repita entre elas.
+    """
+    snapshot = get_metrics().status_snapshot()
+    accounts = snapshot['accounts']
+    states = {account['connection_state'] for account in accounts.values()}
+    imap_state = 'connected' if states == {'connected'} else ('error' if 'error' in states else 'disconnected')
+    live, _ = get_heartbeats().liveness()
+    stats = get_rolling_stats()
+    today = stats.today()
+    last_alert = stats.last_alert
+
+    mongo_client = current_app.config.get('MONGO_CLIENT')
+    mongodb = {'status': 'disconnected'}
+    if mongo_client is not None:
+        try:
+            mongo_client.admin.command('ping')
+            mongodb = {'status': 'connected'}
+        except Exception as e:
+            mongodb = {'status': 'error', 'error': str(e)}
+
+    return jsonify({
+        'imap': {'status': imap_state if accounts else 'disconnected',
+                 'lastCheck': _iso(max((a['last_poll_at'] or 0 for a in accounts.values()), default=0))},
+        'telegram': {'status': 'connected' if current_app.config.get('TELEGRAM_CLIENT') else 'disconnected',
+                     'lastMessage': None},
+        'mongodb': mongodb,
+        'monitoring': {'isActive': live, 'lastAlert': _iso(last_alert['ts']) if last_alert else None,
+                       'processedEmails': today['emails'], 'sentAlerts': today['alerts_sent'],
+                       'failedAlerts': today['alerts_failed'], 'queueDepth': snapshot['queue_depth']},
+        'accounts': {name: {'status': account['connection_state'], 'lastCheck': _iso(account['last_poll_at']),
+                            'emailsToday': account['emails_today'], 'alertsToday': account['alerts_today'],
+                            'failedToday': account['failed_today']}
+                     for name, account in accounts.items()},
+    })
+
+
+@api.get('/monitoring/stats')
+def monitoring_stats():
+    """Séries dos contadores deslizantes (?resolution=minute|hour|day&points=N)"""
+    resolution = request.args.get('resolution', 'minute')
+    if resolution not in RESOLUTIONS:
+        abort(400, description='resolution deve ser minute, hour ou day')
+    stats = get_rolling_stats()
+    try:
+        points = max(1, min(int(request.args.get('points', 60)), stats.history_size))
+    except ValueError:
+        abort(400, description='points inválido')
+    series = {name: stats.series(name, resolution, points) for name in COUNTERS}
+    return jsonify({
+        'resolution': resolution,
+        'periods': [_iso(start) for start, _ in series['emails']],
+        'series': {name: [count for _, count in values] for name, values in series.items()},
+        'today': stats.today(),
+    })
+
+
+@api.get('/analytics/senders')
+def sender_analytics():
+    """Maiores remetentes e remetentes distintos do dia por conta (valores aproximados)"""
+    try:
+        top = max(1, min(int(request.args.get('top', 10)), 50))
+    except ValueError:
+        abort(400, description='top inválido')
+    analytics = get_sender_analytics()
+    return jsonify({'day': analytics.day.isoformat(),
+                    'accounts': analytics.summary(request.args.get('account'), top)})
+
+
+@api.get('/monitoring/config')
+@api.get('/config')
+def monitoring_config():
+    """Configuração de monitoramento (config.json) no formato MonitoringConfig, sem credenciais"""
+    config = load_alerts_config()
+    imap = config.get('imap', {})
+    telegram = config.get('telegram', {})
+    rocketchat = config.get('rocketchat', {})
+    levels = config.get('alerts', {}).get('levels', {})
+    return jsonify({
+        'checkInterval': config.get('system', {}).get('check_interval', imap.get('check_interval', 60)),
+        'retryAttempts': imap.get('reconnect_attempts', 5),
+        'retryDelay': imap.get('reconnect_delay', 30),
+        'alertLevels': {'critical': levels.get('critical', []), 'moderate': levels.get('important', []),
+                        'low': levels.get('low', [])},
+        'telegramConfig': {'retryAttempts': telegram.get('retry_attempts', 3),
+                           'retryDelay': telegram.get('retry_delay', 5)},
+        'rocketChatConfig': {'enabled': bool(rocketchat.get('url')), 'defaultChannel': rocketchat.get('channel', '')},
+    })
+
+
+# Históricos -----------------------------------------------------------------
+
+@api.get('/alerts')
+def list_alerts():
+    """Histórico de alertas (mais recentes primeiro); ?after=<cursor> continua a partir da página anterior"""
+    store = get_alert_history()
+    if store is None:
+        abort(503, description='histórico de alertas desabilitado')
+    before = None
+    after = request.args.get('after')
+    if after:
+        try:
+            timestamp, _id = after.split('_', 1)
+            before = {'ts': datetime.fromtimestamp(int(timestamp) / 1000, timezone.utc), '_id': ObjectId(_id)}
+        except (ValueError, InvalidId):
+            abort(400, description='cursor inválido')
+    limit = _page_size()
+    documents = store.search(account=request.args.get('account'), text=request.args.get('q'),
+                             level=request.args.get('level'), before=before, limit=limit)
+    response = jsonify([{key: _json_value(value) for key, value in document.items()} for document in documents])
+    if len(documents) == limit:
+        last = documents[-1]
+        ts = last['ts'] if last['ts'].tzinfo else last['ts'].replace(tzinfo=timezone.utc)
+        response.headers['X-Next-Cursor'] = f"{int(ts.timestamp() * 1000)}_{last['_id']}"
+    return response
+
+
+@api.get('/metrics/history')
+def metrics_history():
+    """Resumos do histórico de métricas (?granularity=hourly|daily&account=&since=ISO)"""
+    store = get_metrics_store()
+    if store is None:
+        abort(503, description='histórico de métricas desabilitado')
+    since = request.args.get('since')
+    try:
+        since = datetime.fromisoformat(since) if since else None
+    except ValueError:
+        abort(400, description='since inválido')
+    granularity = request.args.get('granularity', 'hourly')
+    if granularity not in ('hourly', 'daily'):
+        abort(400, description='granularity deve ser hourly ou daily')
+    rows = store.get_rollups(granularity, account=request.args.get('account'), since=since)
+    return jsonify([{key: _json_value(value) for key, value in row.items()} for row in rows])
+
+
+@api.get('/events')
+def event_stream():
+    """
+    Stream text/event-stream dos eventos do monitor. O navegador reenvia
+    Last-Event-ID ao reconectar e recebe os eventos perdidos ainda no buffer.
+    Um cliente que não acompanha o ritmo tem o stream encerrado.
+    """
+    # IDs malformados ou de antes de um reinício recebem um evento 'reset'
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('lastEventId')
+    subscription = get_event_bus().subscribe(last_event_id)
+    if subscription is None:
+        abort(503, description='limite de clientes de eventos atingido')
+
+    def stream():
+        try:
+            yield "retry: 5000\n\n"
+            while not subscription.dropped or not subscription.queue.empty():
+                event = subscription.get(SSE_KEEPALIVE)
+                yield event.to_sse() if event else ': keepalive\n\n'
+        finally:
+            subscription.close()
+
+    response = Response(stream(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def create_app(mongo_client: Optional[MongoClient] = None, telegram_client=None) -> Flask:
+    """
+    Cria a aplicação Flask da API. Sem mongo_client, conecta a MONGODB_URI
+    (uso via FLASK_APP=app:create_app() ou gunicorn).
+    """
+    app = Flask(__name__)
+    app.json.sort_keys = False
+    if mongo_client is None and os.getenv('MONGODB_URI'):
+        mongo_client = MongoClient(os.getenv('MONGODB_URI'), serverSelectionTimeoutMS=5000)
+    app.config['MONGO_CLIENT'] = mongo_client
+    app.config['TELEGRAM_CLIENT'] = telegram_client
+    app.config['CORS_ORIGINS'] = [origin.strip() for origin in os.getenv('API_CORS_ORIGINS', '').split(',')
+                                  if origin.strip()]
+    try:
+        app.config['USER_MODEL'] = UserModel(mongo_client) if mongo_client is not None else None
+    except Exception as e:
+        logger.error(f"API sem acesso aos usuários do MongoDB: {e}")
+        app.config['USER_MODEL'] = None
+    app.register_blueprint(api)
+    return app
@@ -0,0 +1,145 @@
+"""
+Configuração do pipeline de logging do WegNots
+
+Os registros são enfileirados pelo thread que loga (QueueHandler) e gravados
+por uma thread dedicada (QueueListener) em um arquivo com rotação por
+tamanho. Mensagens INFO/DEBUG repetidas do mesmo ponto do código passam por
+limitação de taxa com amostragem, para que tempestades de e-mails não
+transformem o log em gargalo nem encham o disco.
+"""
+
+import os
+import sys
+import time
+import queue
+import atexit
+import logging
+import threading
+import logging.handlers
+from typing import Dict, Any, Optional, Tuple
+
+
+def build_log_config() -> Dict[str, Any]:
+    """Monta a configuração de log a partir das variáveis de ambiente"""
+    return {
+        'level': os.getenv('LOG_LEVEL', 'INFO'),
+        'format': os.getenv('LOG_FORMAT', '%(asctime)s - %(name)s - %(levelname)s - %(message)s'),
+        'max_size': int(os.getenv('MAX_LOG_SIZE', 10485760)),  # 10MB
+        'backup_count': int(os.getenv('LOG_BACKUP_COUNT', 3)),
+        'file': os.getenv('LOG_FILE', os.path.join('logs', 'wegnots.log')),
+        'queue_size': int(os.getenv('LOG_QUEUE_SIZE', 10000)),
+        'rate_limit_burst': int(os.getenv('LOG_RATE_LIMIT_BURST', 20)),
+        'rate_limit_window': float(os.getenv('LOG_RATE_LIMIT_WINDOW', 60)),
+        'rate_limit_sample': int(os.getenv('LOG_RATE_LIMIT_SAMPLE', 100)),
+    }
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Limita registros abaixo de WARNING por ponto de chamada (logger, arquivo,
+    linha). Em cada janela, as primeiras `burst` mensagens passam; depois
+    apenas 1 a cada `sample`. A primeira mensagem liberada após supressões
+    informa quantas foram descartadas.
+    """
+
+    def __init__(self, burst: int = 20, window: float = 60.0, sample: int = 100):
+        super().__init__()
+        self.burst = burst
+        self.window = window
+        self.sample = max(1, sample)
+        # chave -> [início da janela, emitidas na janela, vistas na janela, suprimidas pendentes]
+        self._state: Dict[Tuple[str, str, int], list] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        key = (record.name, record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            state = self._state.get(key)
+            if state is None or now - state[0] >= self.window:
+                suppressed = state[3] if state else 0
+                state = self._state[key] = [now, 0, 0, suppressed]
+            state[2] += 1
+            allowed = state[1] < self.burst or (state[2] - self.burst) % self.sample == 0
+            if not allowed:
+                state[3] += 1
+                return False
+            state[1] += 1
+            suppressed, state[3] = state[3], 0
+        if suppressed:
+            record.msg = f"{record.getMessage()} (+{suppressed} mensagens semelhantes suprimidas)"
+            record.args = ()
+        return True
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler que descarta registros quando a fila está cheia em vez de bloquear"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def setup_logging(config: Optional[Dict[str, Any]] = None) -> logging.handlers.QueueListener:
+    """
+    Substitui os handlers do logger raiz pelo pipeline assíncrono:
+    QueueHandler (com limitação de taxa) -> QueueListener -> arquivo rotativo + stdout.
+    """
+    global _listener
+    config = config or build_log_config()
+    if _listener is not None:
+        _listener.stop()
+
+    log_file = config.get('file', os.path.join('logs', 'wegnots.log'))
+    if os.path.dirname(log_file):
+        os.makedirs(os.path.dirname(log_file), exist_ok=True)
+
+    formatter = logging.Formatter(config['format'])
+    file_handler = logging.handlers.RotatingFileHandler(
+        log_file,
+        maxBytes=config['max_size'],
+        backupCount=config['backup_count'],
+        encoding='utf-8'
+    )
+    stream_handler = logging.StreamHandler(sys.stdout)
+    for handler in (file_handler, stream_handler):
+        handler.setFormatter(formatter)
+
+    queue_handler = DroppingQueueHandler(queue.Queue(maxsize=config.get('queue_size', 10000)))
+    queue_handler.addFilter(RateLimitFilter(
+        burst=config.get('rate_limit_burst', 20),
+        window=config.get('rate_limit_window', 60),
+        sample=config.get('rate_limit_sample', 100)
+    ))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+    root.addHandler(queue_handler)
+    root.setLevel(getattr(logging, str(config['level']).upper(), logging.INFO))
+
+    _listener = logging.handlers.QueueListener(queue_handler.queue, file_handler, stream_handler,
+                                               respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+    return _listener
+
+
+def stop_logging():
+    """Esvazia a fila e encerra a thread de escrita dos logs"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -3,6 +3,7 @@ import json
 from pathlib import Path
 from typing import Dict, Any
 from dotenv import load_dotenv
+from .logging_config import build_log_config
 
 # Carrega variáveis de ambiente do arquivo .env
 load_dotenv()
@@ -66,14 +67,8 @@ MONITOR_CONFIG = {
     'reconnect_backoff_factor': float(get_env_var('RECONNECT_BACKOFF_FACTOR', 1.5)),
 }
 
-# Configurações de Logging
-LOG_CONFIG = {
-    'level': get_env_var('LOG_LEVEL', 'INFO'),
-    'format': get_env_var('LOG_FORMAT', 
-                         '%(asctime)s - %(name)s - %(levelname)s - %(message)s'),
-    'max_size': int(get_env_var('MAX_LOG_SIZE', 10485760)),  # 10MB
-    'backup_count': int(get_env_var('LOG_BACKUP_COUNT', 3)),
-}
+# Configurações de Logging (rotação, fila assíncrona e limitação de taxa)
+LOG_CONFIG = build_log_config()
 
 # Configurações de Notificação
 NOTIFICATION_DESTINATIONS = parse_json_env('NOTIFICATION_DESTINATIONS', {})
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Classificação dos alertas pelos níveis definidos em config.json (alerts)
+
+Todas as palavras-chave de alerts.levels são compiladas em um único autômato
+Aho-Corasick sobre texto normalizado (minúsculas e sem acentos, de modo que
+"CRITICO" e "crítico" são equivalentes). Os padrões de alerts.patterns são
+validados e combinados em uma única alternância com grupos nomeados, executada
+com orçamento de tempo (ver safe_regex). Assunto e prévia do corpo são
+percorridos uma vez por e-mail, em tempo linear no tamanho do texto,
+independentemente da quantidade de regras.
+"""
+
+import os
+import json
+import logging
+import threading
+import unicodedata
+from collections import deque
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+from .safe_regex import SafePatternSet
+
+logger = logging.getLogger('wegnots.alert_classifier')
+
+# Níveis do config.json em ordem decrescente de severidade
+LEVELS = ('critical', 'important', 'low')
+LEVEL_PRIORITY = {'critical': 'critical', 'important': 'high', 'low': 'low'}
+LEVEL_ALERT_TYPES = {
+    'critical': '🚨 ALERTA CRÍTICO',
+    'important': '⚠️ ALERTA IMPORTANTE',
+    'low': 'ℹ️ INFORMAÇÃO',
+}
+DEFAULT_ALERT_TYPE = '📨 NOVO EMAIL'
+DEFAULT_PRIORITY = 'medium'
+PREVIEW_CHARS = 1000
+CONFIG_PATHS = ('config.json', os.path.join('..', 'config.json'))
+
+
+def fold_text(text: str) -> str:
+    """Normaliza o texto para comparação: casefold e remoção de acentos"""
+    if not text:
+        return ''
+    decomposed = unicodedata.normalize('NFKD', text.casefold())
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+
+class AhoCorasick:
+    """Autômato Aho-Corasick simples sobre caracteres"""
+
+    def __init__(self):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[Tuple[int, Any]]] = [[]]
+        self._built = False
+
+    def add(self, word: str, payload: Any):
+        if not word:
+            return
+        state = 0
+        for char in word:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = next_state
+        self._output[state].append((len(word), payload))
+        self._built = False
+
+    def build(self):
+        """Calcula os links de falha em largura (BFS)"""
+        queue = deque(self._goto[0].values())
+        for state in queue:
+            self._fail[state] = 0
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+        self._built = True
+
+    def iter_matches(self, text: str) -> Iterable[Tuple[int, int, Any]]:
+        """Gera (início, fim, payload) para cada ocorrência no texto"""
+        if not self._built:
+            self.build()
+        state = 0
+        for index, char in enumerate(text):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            for length, payload in self._output[state]:
+                yield index - length + 1, index + 1, payload
+
+    def __len__(self):
+        return len(self._goto)
+
+
+class Classification:
+    __slots__ = ('level', 'priority', 'alert_type', 'matches')
+
+    def __init__(self, level: Optional[str] = None, matches: Optional[List[str]] = None):
+        self.level = level
+        self.priority = LEVEL_PRIORITY.get(level, DEFAULT_PRIORITY)
+        self.alert_type = LEVEL_ALERT_TYPES.get(level, DEFAULT_ALERT_TYPE)
+        self.matches = matches or []
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'level': self.level, 'priority': self.priority,
+                'alert_type': self.alert_type, 'matches': self.matches}
+
+    def __repr__(self):
+        return f"Classification(level={self.level!r}, matches={self.matches!r})"
+
+
+class AlertClassifier:
+    """
+    Classifica um e-mail no nível mais severo entre as palavras-chave e os
+    padrões encontrados no assunto e no início do corpo.
+    Palavras-chave casam no início de palavra, aceitando flexões ("urgentes").
+    """
+
+    def __init__(self, levels: Optional[Dict[str, List[str]]] = None,
+                 patterns: Optional[Dict[str, List[str]]] = None,
+                 preview_chars: int = PREVIEW_CHARS):
+        self.preview_chars = preview_chars
+        self.automaton = AhoCorasick()
+        self.keyword_count = 0
+        for level in LEVELS:
+            for keyword in (levels or {}).get(level, []) or []:
+                folded = fold_text(keyword).strip()
+                if folded:
+                    self.automaton.add(folded, (level, keyword))
+                    self.keyword_count += 1
+        self.automaton.build()
+        self.patterns = SafePatternSet(
+            (pattern, level) for level in LEVELS for pattern in (patterns or {}).get(level, []) or []
+        )
+
+    @staticmethod
+    def _is_word_start(text: str, start: int) -> bool:
+        return start == 0 or not text[start - 1].isalnum()
+
+    def classify(self, subject: Optional[str], body: Optional[str] = None) -> Classification:
+        text = f"{subject or ''}\n{(body or '')[:self.preview_chars]}"
+        found: Dict[str, List[str]] = {}
+
+        folded = fold_text(text)
+        for start, _end, (level, keyword) in self.automaton.iter_matches(folded):
+            if self._is_word_start(folded, start):
+                found.setdefault(level, []).append(keyword)
+
+        for pattern, level in self.patterns.matches(text):
+            found.setdefault(level, []).append(pattern)
+
+        for level in LEVELS:
+            if level in found:
+                return Classification(level, list(dict.fromkeys(found[level])))
+        return Classification()
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> 'AlertClassifier':
+        alerts = (config or {}).get('alerts', {})
+        return cls(alerts.get('levels'), alerts.get('patterns'))
+
+
+def load_alerts_config(path: Optional[str] = None) -> Dict[str, Any]:
+    """Carrega o config.json (ALERTS_CONFIG_PATH ou caminhos padrão); vazio se não existir"""
+    path = path or os.getenv('ALERTS_CONFIG_PATH')
+    for candidate in ([path] if path else CONFIG_PATHS):
+        if os.path.exists(candidate):
+            try:
+                with open(candidate, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except (OSError, ValueError) as e:
+                logger.error(f"Erro ao carregar configuração de alertas {candidate}: {e}")
+                return {}
+    logger.warning("Configuração de alertas (config.json) não encontrada; alertas não serão classificados")
+    return {}
+
+
+_classifier: Optional[AlertClassifier] = None
+_classifier_lock = threading.Lock()
+
+
+def get_classifier() -> AlertClassifier:
+    """Retorna o classificador compartilhado, construído a partir do config.json"""
+    global _classifier
+    with _classifier_lock:
+        if _classifier is None:
+            _classifier = AlertClassifier.from_config(load_alerts_config())
+            logger.info(f"Classificador de alertas carregado: {_classifier.keyword_count} palavras-chave, "
+                        f"{len(_classifier.patterns)} padrões")
+        return _classifier
+
+
+def reload_classifier() -> AlertClassifier:
+    """Reconstrói o classificador após alterações no config.json"""
+    global _classifier
+    with _classifier_lock:
+        if _classifier is not None:
+            _classifier.patterns.close()
+        _classifier = None
+    return get_classifier()
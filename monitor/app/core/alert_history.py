@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Histórico pesquisável dos alertas processados (coleção alert_logs)
+
+Cada e-mail processado gera um documento com os cabeçalhos como campos, a
+classificação, o destino e o resultado da entrega (outcome: delivered, failed,
+suppressed ou coalesced, este com a referência ao alerta original). A prévia
+do corpo é armazenada comprimida (zstd quando disponível, senão zlib). As gravações são
+acumuladas em memória e enviadas em lote com bulk_write por uma thread
+própria, fora do loop de monitoramento. Os índices (conta + data e texto em
+assunto/remetente) são mantidos pelo IndexManager.
+"""
+
+import zlib
+import logging
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional
+
+from bson import Binary, ObjectId
+from pymongo import InsertOne, DESCENDING
+
+from .index_manager import IndexManager
+from .recipient_resolver import normalize_sender
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - depende do ambiente
+    zstandard = None
+
+logger = logging.getLogger('wegnots.alert_history')
+
+COLLECTION = 'alert_logs'
+PREVIEW_CHARS = 2000
+PREVIEW_CODEC = 'zstd' if zstandard is not None else 'zlib'
+# Campos retornados nas listagens (a prévia só é lida quando solicitada)
+LIST_FIELDS = {'preview': 0}
+
+
+def compress_preview(text: Optional[str]) -> Binary:
+    data = (text or '')[:PREVIEW_CHARS].encode('utf-8')
+    if zstandard is not None:
+        return Binary(zstandard.ZstdCompressor(level=3).compress(data))
+    return Binary(zlib.compress(data, 6))
+
+
+def decompress_preview(data: Optional[bytes], codec: str = 'zlib') -> str:
+    if not data:
+        return ''
+    if codec == 'zstd':
+        if zstandard is None:
+            return ''
+        return zstandard.ZstdDecompressor().decompress(bytes(data)).decode('utf-8', errors='replace')
+    return zlib.decompress(bytes(data)).decode('utf-8', errors='replace')
+
+
+class AlertHistoryStore:
+    def __init__(self, collection, batch_size: int = 100, flush_interval: float = 5.0, max_buffer: int = 10000):
+        self.collection = collection
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.dropped = 0
+        # Com o MongoDB indisponível por muito tempo, os registros mais antigos são descartados
+        self._buffer: deque = deque(maxlen=max_buffer)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_client(cls, mongo_client, **kwargs) -> 'AlertHistoryStore':
+        db = mongo_client.wegnots
+        IndexManager(db).ensure([COLLECTION])
+        return cls(db[COLLECTION], **kwargs)
+
+    # Gravação ---------------------------------------------------------------
+
+    def record(self, email_data: Dict[str, Any], delivered: bool, chat_id: Optional[str] = None,
+               error: Optional[str] = None, outcome: Optional[str] = None,
+               original: Optional[Dict[str, Any]] = None):
+        """
+        Acrescenta ao histórico um e-mail processado e o resultado da entrega.
+        `outcome` distingue os e-mails não enviados de propósito (ex.: 'suppressed'
+        pelo limite de inundação) das falhas; por padrão vem de `delivered`.
+        `original` referencia o alerta ao qual uma repetição foi agrupada.
+        """
+        trace = email_data.get('trace')
+        classification = email_data.get('classification')
+        # Destino principal registrado pelo trace; destinatários adicionais informam o chat_id
+        destination = None if chat_id else getattr(trace, 'destination', None)
+        if destination:
+            chat_id = destination.split(':', 1)[-1]
+        document = {
+            'ts': datetime.now(timezone.utc),
+            'account': email_data.get('username'),
+            'server': email_data.get('server'),
+            'email_key': email_data.get('email_key'),
+            'subject': email_data.get('subject') or '',
+            'sender': normalize_sender(email_data.get('from')),
+            'from': email_data.get('from') or '',
+            'level': getattr(classification, 'level', None),
+            'priority': getattr(classification, 'priority', None),
+            'alert_type': getattr(classification, 'alert_type', None),
+            'chat_id': str(chat_id) if chat_id else None,
+            'destination': destination,
+            'delivered': bool(delivered),
+            'outcome': outcome or ('delivered' if delivered else 'failed'),
+            'attempts': len(trace.attempts) if trace is not None else None,
+            'preview': compress_preview(email_data.get('body')),
+            'preview_codec': PREVIEW_CODEC,
+        }
+        if error:
+            document['error'] = error
+        if original:
+            document['original'] = original
+        with self._lock:
+            if len(self._buffer) == self.max_buffer:
+                self.dropped += 1
+            self._buffer.append(document)
+            full = len(self._buffer) >= self.batch_size
+        if full:
+            self._wakeup.set()
+
+    def flush(self) -> int:
+        """Grava o conteúdo do buffer com um único bulk_write"""
+        with self._lock:
+            batch = list(self._buffer)
+            self._buffer.clear()
+        if not batch:
+            return 0
+        try:
+            self.collection.bulk_write([InsertOne(document) for document in batch], ordered=False)
+            logger.debug(f"{len(batch)} registro(s) gravado(s) no histórico de alertas")
+            return len(batch)
+        except Exception as e:
+            logger.error(f"Erro ao gravar histórico de alertas ({len(batch)} registros): {e}")
+            with self._lock:
+                # Devolve o lote ao início do buffer para a próxima tentativa
+                pending = batch + list(self._buffer)
+                self.dropped += max(0, len(pending) - self.max_buffer)
+                self._buffer = deque(pending, maxlen=self.max_buffer)
+            return 0
+
+    def start(self) -> 'AlertHistoryStore':
+        self._thread = threading.Thread(target=self._run, name='alert-history', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout=10)
+        self.flush()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    # Consulta ---------------------------------------------------------------
+
+    def search(self, account: Optional[str] = None, text: Optional[str] = None, chat_id: Optional[str] = None,
+               level: Optional[str] = None, since: Optional[datetime] = None, until: Optional[datetime] = None,
+               before: Optional[Dict[str, Any]] = None, limit: int = 50,
+               include_preview: bool = False) -> List[Dict]:
+        """
+        Pesquisa o histórico do mais recente para o mais antigo, ordenado por
+        (ts, _id). `text` usa o índice de texto (assunto/remetente); `before`
+        recebe o último documento da página anterior ({'ts', '_id'}).
+        """
+        query: Dict[str, Any] = {}
+        if account:
+            query['account'] = account
+        if chat_id:
+            query['chat_id'] = str(chat_id)
+        if level:
+            query['level'] = level
+        if since or until:
+            query['ts'] = {key: value for key, value in (('$gte', since), ('$lt', until)) if value}
+        if before:
+            last_id = ObjectId(before['_id']) if isinstance(before['_id'], str) else before['_id']
+            query['$or'] = [{'ts': {'$lt': before['ts']}}, {'ts': before['ts'], '_id': {'$lt': last_id}}]
+        if text:
+            query['$text'] = {'$search': text}
+
+        projection = None if include_preview else LIST_FIELDS
+        cursor = self.collection.find(query, projection) \
+            .sort([('ts', DESCENDING), ('_id', DESCENDING)]) \
+            .limit(min(max(limit, 1), 500))
+        results = []
+        for document in cursor:
+            if include_preview:
+                document['preview'] = decompress_preview(document.get('preview'), document.get('preview_codec', 'zlib'))
+            results.append(document)
+        return results
+
+
+_store: Optional[AlertHistoryStore] = None
+
+
+def set_alert_history(store: Optional[AlertHistoryStore]):
+    """Define o histórico compartilhado (usado pelo bot e pela API)"""
+    global _store
+    _store = store
+
+
+def get_alert_history() -> Optional[AlertHistoryStore]:
+    return _store
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Extração de campos de e-mails de alarme gerados por máquinas (alerts.templates)
+
+Operadores registram no config.json modelos por remetente (endereço exato ou
+*@dominio) com os campos a extrair, cada um por rótulo ("Equipamento:"), por
+posição de linha ou por padrão ancorado no início da linha (validado por
+safe_regex). Os modelos são compilados uma vez e o modelo de cada remetente
+fica em cache. Os campos extraídos definem o nível do alerta (campo de
+severidade), a chave de deduplicação e uma renderização compacta no lugar do
+corpo em texto livre. Um modelo de exemplo está em config.example.json.
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional
+
+from .alert_classifier import LEVELS, fold_text, load_alerts_config
+from .recipient_resolver import sender_domain_rule
+from .safe_regex import compile_validated
+
+logger = logging.getLogger('wegnots.alert_templates')
+
+MAX_BODY_CHARS = 4096
+SENDER_CACHE_SIZE = 1024
+
+
+class FieldExtractor:
+    """Extrai um campo por rótulo, por linha (1 = primeira linha não vazia) ou por padrão ancorado"""
+    __slots__ = ('name', 'label', 'line', 'start', 'end', 'regex')
+
+    def __init__(self, name: str, spec: Any):
+        if isinstance(spec, str):
+            spec = {'label': spec}
+        self.name = name
+        self.label = fold_text(spec['label']).strip() if spec.get('label') else None
+        self.line = int(spec['line']) if spec.get('line') else None
+        self.start = int(spec.get('start', 0))
+        self.end = int(spec['end']) if spec.get('end') else None
+        self.regex = None
+        if spec.get('pattern'):
+            self.regex = compile_validated(spec['pattern'], prefix='(?mi)^')
+            if self.regex is None:
+                raise ValueError(f"padrão inválido no campo {name}")
+        if self.label is None and self.line is None and self.regex is None:
+            raise ValueError(f"campo {name} sem label, line ou pattern")
+
+    def extract(self, text: str, lines: List[str], labels: Dict[str, str]) -> Optional[str]:
+        if self.label is not None:
+            return labels.get(self.label)
+        if self.line is not None:
+            if self.line > len(lines):
+                return None
+            return lines[self.line - 1][self.start:self.end].strip() or None
+        match = self.regex.search(text)
+        if match is None:
+            return None
+        value = match.group(1) if match.groups() else match.group(0)
+        return (value or '').strip() or None
+
+
+class Extraction:
+    __slots__ = ('template', 'fields', 'level')
+
+    def __init__(self, template: 'AlertTemplate', fields: Dict[str, str], level: Optional[str]):
+        self.template = template
+        self.fields = fields
+        self.level = level
+
+    @property
+    def dedupe_key(self) -> Optional[str]:
+        """Texto que identifica o alarme para a deduplicação (campos dedupe_fields do modelo)"""
+        names = self.template.dedupe_fields
+        if not names or not all(name in self.fields for name in names):
+            return None
+        return f"{self.template.name} " + ' '.join(f"{name}={self.fields[name]}" for name in names)
+
+    def render(self) -> str:
+        """Corpo compacto do alerta: um campo por linha"""
+        return '\n'.join(f"{name}: {value}" for name, value in self.fields.items())
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'template': self.template.name, 'fields': self.fields, 'level': self.level}
+
+
+class AlertTemplate:
+    def __init__(self, spec: Dict[str, Any]):
+        self.name = spec.get('name') or 'modelo'
+        self.senders = [sender.strip().lower() for sender in spec.get('senders', []) if sender.strip()]
+        self.fields = [FieldExtractor(name, field) for name, field in (spec.get('fields') or {}).items()]
+        self.severity_field = spec.get('severity_field')
+        self.levels = {fold_text(str(value)).strip(): level for value, level in (spec.get('levels') or {}).items()
+                       if level in LEVELS}
+        self.level = spec.get('level') if spec.get('level') in LEVELS else None
+        self.dedupe_fields = list(spec.get('dedupe_fields') or [])
+        self._labels = {field.label for field in self.fields if field.label is not None}
+        self._needs_lines = any(field.line is not None for field in self.fields)
+
+    def _label_values(self, lines: List[str]) -> Dict[str, str]:
+        """Valores dos campos por rótulo ("Rótulo: valor" ou "Rótulo = valor"), numa única passada"""
+        values = {}
+        for line in lines:
+            for separator in (':', '='):
+                label, found, value = line.partition(separator)
+                if found:
+                    label = fold_text(label).strip()
+                    if label in self._labels and label not in values:
+                        values[label] = value.strip()
+                    break
+        return values
+
+    def extract(self, body: str) -> Optional[Extraction]:
+        text = (body or '')[:MAX_BODY_CHARS]
+        lines = [line.strip() for line in text.splitlines() if line.strip()] \
+            if self._labels or self._needs_lines else []
+        labels = self._label_values(lines) if self._labels else {}
+        fields = {}
+        for field in self.fields:
+            value = field.extract(text, lines, labels)
+            if value:
+                fields[field.name] = value
+        if not fields:
+            return None
+        level = self.level
+        if self.severity_field and self.severity_field in fields:
+            level = self.levels.get(fold_text(fields[self.severity_field]).strip(), level)
+        return Extraction(self, fields, level)
+
+
+class TemplateRegistry:
+    def __init__(self, templates: Optional[List[Dict[str, Any]]] = None):
+        self.templates: List[AlertTemplate] = []
+        self._rules: Dict[str, AlertTemplate] = {}
+        self._cache: 'OrderedDict[str, Optional[AlertTemplate]]' = OrderedDict()
+        self._lock = threading.Lock()
+        for spec in templates or []:
+            try:
+                template = AlertTemplate(spec)
+            except (ValueError, KeyError, TypeError) as e:
+                logger.error(f"Modelo de extração {spec.get('name', '?')!r} ignorado: {e}")
+                continue
+            self.templates.append(template)
+            for sender in template.senders:
+                self._rules.setdefault(sender, template)
+
+    def for_sender(self, sender: str) -> Optional[AlertTemplate]:
+        """Modelo do remetente (exato, senão curinga de domínio), com cache por remetente"""
+        if not self._rules or not sender:
+            return None
+        with self._lock:
+            if sender in self._cache:
+                self._cache.move_to_end(sender)
+                return self._cache[sender]
+        template = self._rules.get(sender) or self._rules.get(sender_domain_rule(sender) or '')
+        with self._lock:
+            self._cache[sender] = template
+            if len(self._cache) > SENDER_CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return template
+
+    def extract(self, sender: str, body: str) -> Optional[Extraction]:
+        template = self.for_sender(sender)
+        if template is None:
+            return None
+        try:
+            return template.extract(body)
+        except Exception as e:
+            logger.error(f"Erro ao extrair campos com o modelo {template.name}: {e}")
+            return None
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> 'TemplateRegistry':
+        return cls(((config or {}).get('alerts') or {}).get('templates'))
+
+
+_registry: Optional[TemplateRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_template_registry() -> TemplateRegistry:
+    """Retorna os modelos de extração compartilhados, construídos a partir do config.json"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = TemplateRegistry.from_config(load_alerts_config())
+            if _registry.templates:
+                logger.info(f"Modelos de extração carregados: {len(_registry.templates)}")
+        return _registry
+
+
+def reload_template_registry() -> TemplateRegistry:
+    """Reconstrói os modelos após alterações no config.json"""
+    global _registry
+    with _registry_lock:
+        _registry = None
+    return get_template_registry()
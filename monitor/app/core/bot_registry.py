@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Registro persistente de metadados dos bots do Telegram do WegNots
+
+Guarda em disco, indexado pelo hash do token, o resultado do getMe, a versão
+do conjunto de comandos registrado via setMyCommands e os chat IDs já
+descobertos. Cada informação possui um TTL próprio, evitando chamadas
+redundantes à Bot API a cada inicialização do monitor.
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger('wegnots.bot_registry')
+
+DEFAULT_REGISTRY_PATH = os.path.join('data', 'bot_registry.json')
+
+# TTLs padrão (em segundos)
+DEFAULT_ME_TTL = 24 * 60 * 60            # getMe: 1 dia
+DEFAULT_COMMANDS_TTL = 7 * 24 * 60 * 60  # setMyCommands: 7 dias
+DEFAULT_CHAT_TTL = 30 * 24 * 60 * 60     # chat IDs descobertos: 30 dias
+
+
+def token_hash(token: str) -> str:
+    """Gera um identificador estável para o token sem expor o segredo"""
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()[:16]
+
+
+def commands_version(commands: List[Dict[str, str]]) -> str:
+    """Calcula o hash de versão de um conjunto de comandos do bot"""
+    payload = json.dumps(commands, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+class BotRegistry:
+    def __init__(self, path: str = DEFAULT_REGISTRY_PATH,
+                 me_ttl: int = DEFAULT_ME_TTL,
+                 commands_ttl: int = DEFAULT_COMMANDS_TTL,
+                 chat_ttl: int = DEFAULT_CHAT_TTL):
+        self.path = path
+        self.me_ttl = me_ttl
+        self.commands_ttl = commands_ttl
+        self.chat_ttl = chat_ttl
+        self._lock = threading.RLock()
+        self._bots: Dict[str, Dict[str, Any]] = self._load()
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        """Carrega o registro do disco, ignorando arquivos corrompidos"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return data.get('bots', {}) if isinstance(data, dict) else {}
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"Registro de bots ilegível em {self.path}, recriando: {e}")
+            return {}
+
+    def _save(self):
+        """Grava o registro de forma atômica (arquivo temporário + rename)"""
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'bots': self._bots}, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.error(f"Erro ao salvar registro de bots em {self.path}: {e}")
+
+    def _entry(self, token: str) -> Dict[str, Any]:
+        return self._bots.setdefault(token_hash(token), {})
+
+    @staticmethod
+    def _is_fresh(timestamp: Optional[float], ttl: int) -> bool:
+        return timestamp is not None and (time.time() - timestamp) < ttl
+
+    def get_me(self, token: str) -> Optional[Dict[str, Any]]:
+        """Retorna o resultado do getMe em cache, se ainda válido"""
+        with self._lock:
+            entry = self._bots.get(token_hash(token), {})
+            if self._is_fresh(entry.get('me_fetched_at'), self.me_ttl):
+                return entry.get('me')
+            return None
+
+    def store_me(self, token: str, me: Dict[str, Any]):
+        """Armazena o resultado do getMe"""
+        with self._lock:
+            entry = self._entry(token)
+            entry['me'] = me
+            entry['me_fetched_at'] = time.time()
+            self._save()
+
+    def commands_up_to_date(self, token: str, commands: List[Dict[str, str]]) -> bool:
+        """Indica se o conjunto de comandos já foi registrado recentemente para o bot"""
+        with self._lock:
+            entry = self._bots.get(token_hash(token), {})
+            return (entry.get('commands_version') == commands_version(commands)
+                    and self._is_fresh(entry.get('commands_set_at'), self.commands_ttl))
+
+    def mark_commands(self, token: str, commands: List[Dict[str, str]]):
+        """Registra que o conjunto de comandos foi enviado ao Telegram"""
+        with self._lock:
+            entry = self._entry(token)
+            entry['commands_version'] = commands_version(commands)
+            entry['commands_set_at'] = time.time()
+            self._save()
+
+    def get_chat_ids(self, token: str) -> List[str]:
+        """Retorna os chat IDs descobertos para o token que ainda estão no TTL"""
+        with self._lock:
+            chats = self._bots.get(token_hash(token), {}).get('chats', {})
+            return [chat_id for chat_id, seen_at in chats.items()
+                    if self._is_fresh(seen_at, self.chat_ttl)]
+
+    def add_chat_id(self, token: str, chat_id: str):
+        """Registra (ou renova) um chat ID associado ao token"""
+        chat_id = str(chat_id)
+        with self._lock:
+            chats = self._entry(token).setdefault('chats', {})
+            previous = chats.get(chat_id)
+            chats[chat_id] = time.time()
+            # Evita regravar o arquivo a cada mensagem enviada para o mesmo chat
+            if previous is None or not self._is_fresh(previous, self.chat_ttl // 2):
+                self._save()
+
+    def get_update_offset(self, token: str) -> int:
+        """Retorna o próximo offset do getUpdates confirmado para o bot"""
+        with self._lock:
+            return int(self._bots.get(token_hash(token), {}).get('update_offset', 0))
+
+    def set_update_offset(self, token: str, offset: int):
+        """Persiste o offset do getUpdates após o processamento de um lote"""
+        with self._lock:
+            entry = self._entry(token)
+            if entry.get('update_offset') != offset:
+                entry['update_offset'] = offset
+                self._save()
+
+    def invalidate(self, token: str):
+        """Remove todas as informações em cache do token"""
+        with self._lock:
+            if self._bots.pop(token_hash(token), None) is not None:
+                self._save()
+
+
+_registry: Optional[BotRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_bot_registry() -> BotRegistry:
+    """Retorna a instância compartilhada do registro de bots"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = BotRegistry(os.getenv('BOT_REGISTRY_PATH', DEFAULT_REGISTRY_PATH))
+        return _registry
@@ -1,19 +1,45 @@
 import imaplib
 import email
+import time
 import logging
+from datetime import datetime, timedelta
 from email.header import decode_header
 from typing import Dict, List, Optional
+from .metrics import get_metrics, bot_label
+from .heartbeat import get_heartbeats, account_heartbeat, SCHEDULER
+from .tracing import AlertTrace, get_latency_tracker, DETECTED, FETCHED, PARSED, ROUTED, ENQUEUED, DELIVERED
+from .alert_classifier import get_classifier, Classification
+from .alert_templates import get_template_registry
+from .event_bus import get_event_bus
+from .rolling_stats import get_rolling_stats
+from .sender_sketch import get_sender_analytics
+from .volume_anomaly import get_volume_anomaly_detector
+from .flood_guard import get_flood_guard, format_suppressed_summary
+from .near_duplicate import get_near_duplicate_index, format_repeat_summary, fingerprint
+from .thread_index import get_thread_index, parent_ids, parse_fetch_uid, parse_thread_response, thread_parents
+from .recipient_resolver import normalize_sender, accepts_level
 
 logger = logging.getLogger('wegnots.email_handler')
+metrics = get_metrics()
+heartbeats = get_heartbeats()
+latency_tracker = get_latency_tracker()
+events = get_event_bus()
+
+# Timeout dos sockets IMAP: evita que uma conexão travada bloqueie o loop indefinidamente
+IMAP_TIMEOUT = 60
+# Período consultado pelo IMAP THREAD para encontrar o e-mail original de uma resposta
+THREAD_LOOKBACK_DAYS = 7
 
 class IMAPConnection:
-    def __init__(self, server, port, username, password, is_active=True, telegram_chat_id=None, telegram_token=None):
+    def __init__(self, server, port, username, password, is_active=True, telegram_chat_id=None, telegram_token=None,
+                 timeout=IMAP_TIMEOUT):
         self.server = server
         self.port = port
         self.username = username
         self.password = password
         self.is_active = is_active
         self.imap = None
+        self.timeout = timeout
         self.connection_status = 'disconnected'
         # Informações do Telegram específicas para esta conexão
         self.telegram_chat_id = telegram_chat_id
@@ -26,19 +52,20 @@ class IMAPConnection:
             
         try:
             if self.imap:
+                metrics.imap_reconnects.inc(account=self.username)
                 try:
                     self.imap.logout()
                 except:
                     pass
                     
-            self.imap = imaplib.IMAP4_SSL(self.server, self.port)
+            self.imap = imaplib.IMAP4_SSL(self.server, self.port, timeout=self.timeout)
             self.imap.login(self.username, self.password)
-            self.connection_status = 'connected'
+            self._set_status('connected')
             logger.info(f"Conectado ao servidor IMAP {self.server}")
             return True
             
         except Exception as e:
-            self.connection_status = 'error'
+            self._set_status('error')
             logger.error(f"Erro ao conectar ao servidor {self.server}: {e}")
             return False
 
@@ -50,14 +77,31 @@ class IMAPConnection:
                 logger.info(f"Desconectado do servidor IMAP {self.server}")
             except:
                 pass
-        self.connection_status = 'disconnected'
+        self._set_status('disconnected')
+
+    def _set_status(self, state):
+        """Atualiza o estado da conexão; mudanças são publicadas para o painel"""
+        changed = state != self.connection_status
+        self.connection_status = state
+        metrics.record_connection_state(self.username, state)
+        if changed:
+            events.publish('account-status', {'account': self.username, 'server': self.server, 'status': state})
+
+    def command(self, name, *args):
+        """Executa um comando IMAP contabilizando a ida e volta ao servidor"""
+        metrics.imap_round_trips.inc(account=self.username)
+        return getattr(self.imap, name)(*args)
+
+    def supports(self, capability: str) -> bool:
+        """Indica se o servidor anunciou a capability (ex.: THREAD=REFERENCES)"""
+        return capability in (getattr(self.imap, 'capabilities', None) or ())
 
     def check_connection(self) -> bool:
         """Verifica se a conexão está ativa e reconecta se necessário"""
         if not self.imap:
             return self.connect()
         try:
-            self.imap.noop()
+            self.command('noop')
             return True
         except:
             return self.connect()
@@ -97,8 +141,8 @@ class IMAPConnection:
                     email_body = msg_data[0][1]
                     email_message = email.message_from_bytes(email_body)
 
-                    # Log detalhado do email
-                    logger.info(f"Email encontrado - Servidor: {self.server}, ID: {email_id}, "
+                    # Log detalhado do email (apenas em DEBUG: fica fora do caminho crítico)
+                    logger.debug(f"Email encontrado - Servidor: {self.server}, ID: {email_id}, "
                               f"Subject: {email_message['subject']}, "
                               f"From: {email_message['from']}, "
                               f"Date: {email_message['date']}")
@@ -181,9 +225,30 @@ class IMAPConnection:
         return diagnosis
 
 class EmailHandler:
-    def __init__(self, telegram_client):
+    def __init__(self, telegram_client, check_interval=60, classifier=None, recipients=None, history=None, stats=None,
+                 senders=None, anomalies=None, flood_guard=None, duplicates=None, threads=None, templates=None):
         self.connections = {}
         self.telegram_client = telegram_client
+        self.check_interval = check_interval
+        self.classifier = classifier or get_classifier()
+        # Resolução opcional de destinatários adicionais (regras de notificação dos usuários)
+        self.recipients = recipients
+        # Histórico opcional dos alertas processados (AlertHistoryStore)
+        self.history = history
+        # Contadores por minuto/hora/dia do status e do resumo diário
+        self.stats = stats or get_rolling_stats()
+        # Maiores remetentes e remetentes distintos por conta (sketches de memória fixa)
+        self.senders = senders or get_sender_analytics()
+        # Detecção opcional de volume anômalo (inundação ou silêncio) por conta
+        self.anomalies = anomalies or get_volume_anomaly_detector()
+        # Limitador opcional por (conta, remetente) antes do roteamento
+        self.flood_guard = flood_guard or get_flood_guard()
+        # Agrupamento opcional de alertas quase duplicados (SimHash) por chat
+        self.duplicates = duplicates or get_near_duplicate_index()
+        # Índice opcional de conversas: respostas viram reply da mensagem original no Telegram
+        self.threads = threads or get_thread_index()
+        # Modelos de extração de campos por remetente (alerts.templates do config.json)
+        self.templates = templates or get_template_registry()
         self.processed_emails = {}  # Dictionary to store processed email IDs per account
         
     def _get_email_key(self, server, username, email_id):
@@ -206,6 +271,7 @@ class EmailHandler:
                 
                 # Adiciona a conexão ao dicionário, usando o username como chave
                 self.connections[config['username']] = connection
+                heartbeats.register(account_heartbeat(config['username']), self.check_interval)
                 logger.info(f"Configurada conexão IMAP para {config['username']}")
         
     def connect(self) -> bool:
@@ -223,15 +289,21 @@ class EmailHandler:
         new_emails = []
         
         for username, connection in self.connections.items():
+            # Uma conta inacessível pode levar o timeout inteiro do IMAP; o ciclo
+            # continua vivo enquanto as contas avançam
+            heartbeats.beat(SCHEDULER)
             if not connection or not connection.is_active or not connection.imap:
                 logger.warning(f"Conexão inativa ou com problemas para {username}")
                 continue
                 
+            poll_started = time.monotonic()
+            found_before = len(new_emails)
             try:
                 logger.debug(f"Verificando emails para {username} em {connection.server}")
-                status, selected = connection.imap.select('INBOX')
+                status, selected = connection.command('select', 'INBOX')
                 if status != 'OK':
                     logger.error(f"Falha ao selecionar INBOX para {username}: {status}")
+                    metrics.record_poll(username, time.monotonic() - poll_started, success=False)
                     continue
                     
                 # Initialize processed emails set for this account if it doesn't exist
@@ -239,8 +311,11 @@ class EmailHandler:
                     self.processed_emails[username] = set()
                 
                 # Estratégia 1: Busca emails não lidos (UNSEEN)
-                status, messages = connection.imap.search(None, 'UNSEEN')
+                status, messages = connection.command('search', None, 'UNSEEN')
                 email_ids = messages[0].split() if status == 'OK' else []
+                detected_at = time.time()
+                server_threads = self._server_threads(connection) if email_ids else {}
+                uidvalidity = self._uidvalidity(connection) if self.threads is not None else ''
                 
                 # Se não houver emails não lidos, não procuramos mais
                 # Removida a busca por emails das últimas 24h e emails recentes
@@ -255,19 +330,36 @@ class EmailHandler:
                             logger.debug(f"Email {email_id} já processado para {username}")
                             continue
                             
-                        status, msg_data = connection.imap.fetch(email_id, '(RFC822)')
+                        status, msg_data = connection.command('fetch', email_id, '(UID INTERNALDATE RFC822)')
                         if status != 'OK' or not msg_data or not msg_data[0]:
                             logger.error(f"Falha ao buscar email ID {email_id} para {username}")
                             continue
                             
+                        # Trace de latência: chegada no servidor (INTERNALDATE) -> entrega
+                        trace = AlertTrace(username, arrival=parse_internaldate(msg_data[0][0]))
+                        trace.mark(DETECTED, detected_at)
+                        trace.mark(FETCHED)
+                        
                         email_body = msg_data[0][1]
+                        metrics.imap_bytes.inc(len(email_body), account=username)
+                        
+                        parse_started = time.monotonic()
                         message = email.message_from_bytes(email_body)
                         
                         subject = decode_email_header(message['subject'])
                         from_addr = decode_email_header(message['from'])
                         body = get_email_body(message)
+                        message_id = (message['message-id'] or '').strip()
+                        # Ancestrais pelos cabeçalhos e, quando disponível, pela árvore do IMAP UID THREAD
+                        uid = parse_fetch_uid(msg_data[0][0])
+                        thread_parent_keys = parent_ids(message['in-reply-to'], message['references'])
+                        thread_parent_keys.extend(self._thread_key(connection, uidvalidity, parent)
+                                                  for parent in server_threads.get(uid, ()))
+                        metrics.parse_duration.observe(time.monotonic() - parse_started, account=username)
+                        trace.mark(PARSED)
                         
                         logger.info(f"Novo email encontrado para {username}: Subject='{subject}', De='{from_addr}'")
+                        metrics.record_email_detected(username)
                         
                         new_emails.append({
                             'id': email_id.decode(),
@@ -278,11 +370,15 @@ class EmailHandler:
                             'body': body,
                             'telegram_chat_id': connection.telegram_chat_id,
                             'telegram_token': connection.telegram_token,
-                            'email_key': email_key
+                            'email_key': email_key,
+                            'message_id': message_id,
+                            'thread_key': self._thread_key(connection, uidvalidity, uid) if uid else None,
+                            'thread_parents': thread_parent_keys,
+                            'trace': trace
                         })
                         
                         # Mark as read immediately after processing
-                        connection.imap.store(email_id, '+FLAGS', '\\Seen')
+                        connection.command('store', email_id, '+FLAGS', '\\Seen')
                         # Add to processed set
                         self.processed_emails[username].add(email_key)
                         
@@ -292,8 +388,14 @@ class EmailHandler:
                             
                     except Exception as e:
                         logger.error(f"Erro ao processar email ID {email_id} para {username}: {e}")
+                        
+                metrics.record_poll(username, time.monotonic() - poll_started, success=True)
+                heartbeats.beat(account_heartbeat(username))
+                if self.anomalies is not None:
+                    self.anomalies.observe(username, len(new_emails) - found_before)
                     
             except Exception as e:
+                metrics.record_poll(username, time.monotonic() - poll_started, success=False)
                 logger.error(f"Erro ao verificar e-mails em {connection.server} para {username}: {e}")
                 logger.info(f"Tentando reconectar para {username}")
                 connection.connect()
@@ -306,36 +408,284 @@ class EmailHandler:
     def process_emails(self):
         """Processa emails não lidos e envia alertas"""
         new_emails = self.check_new_emails()
+        self._send_flood_summaries()
+        self._send_repeat_summaries()
         
         if not new_emails:
             return
             
+        # Classificação, roteamento e profundidade da fila de entrega por bot durante o ciclo
+        routed = []
+        for email_data in new_emails:
+            sender = normalize_sender(email_data['from'])
+            email_data['classification'] = self._classify(email_data, sender)
+            self.stats.record_email(email_data['username'], email_data['classification'].level)
+            self.senders.add(email_data['username'], sender)
+            if not self._allow_flood(email_data, sender):
+                self._record_skipped(email_data, 'suppressed')
+                continue
+            routed.append(email_data)
+            email_data['trace'].mark(ROUTED)
+            metrics.queue_depth.inc(bot=self._bot_label(email_data))
+            email_data['trace'].mark(ENQUEUED)
+        self._publish_queue_depth()
+        new_emails = routed
+            
+        # Destinatários adicionais de todos os remetentes do ciclo, resolvidos com uma única consulta;
+        # as preferências por nível são aplicadas em memória no envio
+        recipients = {}
+        if self.recipients is not None and new_emails:
+            try:
+                recipients = self.recipients.get_recipients_for_senders(
+                    [email_data['from'] for email_data in new_emails], all_levels=True)
+            except Exception as e:
+                logger.error(f"Erro ao resolver destinatários adicionais: {e}")
+            
         for email_data in new_emails:
+            # Um lote grande (ou limitado pelo Telegram) ainda é progresso: o watchdog não deve reiniciar
+            heartbeats.beat(SCHEDULER)
             try:
+                # Verificado no envio: repetições do mesmo ciclo casam com o alerta já entregue
+                if self._is_near_duplicate(email_data):
+                    self._record_skipped(email_data, 'coalesced')
+                    continue
                 # Usa telegram_token e chat_id específicos da conta, se disponíveis
                 token = email_data.get('telegram_token')
                 chat_id = email_data.get('telegram_chat_id')
+                trace = email_data['trace']
+                classification = email_data['classification']
                 
-                logger.info(f"Enviando alerta para {email_data['username']} usando token: {'personalizado' if token else 'padrão'}, chat_id: {chat_id or 'padrão'}")
+                logger.debug(f"Enviando alerta para {email_data['username']} usando token: {'personalizado' if token else 'padrão'}, chat_id: {chat_id or 'padrão'}")
                 
                 # Log detalhado dos detalhes do alerta a ser enviado
-                logger.debug(f"Detalhes do alerta: Subject='{email_data['subject']}', From='{email_data['from']}', Body Length={len(email_data['body']) if email_data['body'] else 0}")
+                logger.debug(f"Detalhes do alerta: Subject='{email_data['subject']}', From='{email_data['from']}', Body Length={len(email_data['body']) if email_data['body'] else 0}, Classificação={classification}")
                 
+                reply_to = self._thread_reply_to(email_data)
                 result = self.telegram_client.send_alert(
                     subject=email_data['subject'],
                     from_addr=email_data['from'],
                     body=email_data['body'],
+                    alert_type=classification.alert_type,
                     token=token,
-                    chat_id=chat_id
+                    chat_id=chat_id,
+                    trace=trace,
+                    priority=classification.priority,
+                    reply_to_message_id=reply_to
                 )
-                
                 if result:
+                    self._remember_thread(email_data)
+                    self._register_delivered(email_data)
                     logger.info(f"Alerta enviado com sucesso para {email_data['username']}")
                 else:
                     logger.error(f"Falha ao enviar alerta para {email_data['username']}")
+                metrics.record_alert(
+                    email_data['username'],
+                    success=bool(result),
+                    latency=trace.elapsed(DETECTED, DELIVERED)
+                )
+                latency_tracker.record(trace)
+                self.stats.record_alert(email_data['username'], email_data['subject'], bool(result))
+                if self.history is not None:
+                    self.history.record(email_data, delivered=bool(result))
+                self._publish_alert(email_data, 'delivered' if result else 'failed')
+                self._notify_recipients(email_data, [user for user in recipients.get(email_data['from'], [])
+                                                     if accepts_level(user, classification.level)])
                     
             except Exception as e:
+                metrics.record_alert(email_data.get('username', 'desconhecido'), success=False)
+                self.stats.record_alert(email_data.get('username', 'desconhecido'), email_data.get('subject', ''), False)
+                if self.history is not None and 'classification' in email_data:
+                    self.history.record(email_data, delivered=False, error=str(e))
                 logger.error(f"Erro ao processar e-mail para {email_data.get('username', 'desconhecido')}: {e}")
+            finally:
+                metrics.queue_depth.dec(bot=self._bot_label(email_data))
+        self._publish_queue_depth()
+                
+    def _classify(self, email_data, sender):
+        """
+        Aplica o modelo de extração do remetente, se houver: o nível vem do campo
+        de severidade (ou das palavras-chave, na falta dele) e o corpo do alerta
+        passa a ser a lista compacta de campos
+        """
+        extraction = self.templates.extract(sender, email_data['body']) if self.templates is not None else None
+        if extraction is None:
+            return self.classifier.classify(email_data['subject'], email_data['body'])
+        if extraction.level is not None:
+            classification = Classification(extraction.level, [f"{extraction.template.name}:{extraction.level}"])
+        else:
+            classification = self.classifier.classify(email_data['subject'], email_data['body'])
+        email_data['fields'] = extraction.fields
+        email_data['dedupe_key'] = extraction.dedupe_key
+        email_data['body'] = extraction.render()
+        return classification
+
+    def _server_threads(self, connection):
+        """
+        Ancestrais (por UID) de cada mensagem segundo o IMAP UID THREAD REFERENCES,
+        quando o servidor o suporta; vazio caso contrário (ficam só os cabeçalhos)
+        """
+        if self.threads is None or not connection.supports('THREAD=REFERENCES'):
+            return {}
+        since = (datetime.now() - timedelta(days=THREAD_LOOKBACK_DAYS)).strftime('%d-%b-%Y')
+        try:
+            status, data = connection.command('uid', 'THREAD', 'REFERENCES', 'UTF-8', f'SINCE {since}')
+        except Exception as e:
+            logger.debug(f"IMAP THREAD indisponível para {connection.username}: {e}")
+            return {}
+        return thread_parents(parse_thread_response(data)) if status == 'OK' else {}
+
+    @staticmethod
+    def _uidvalidity(connection) -> str:
+        """UIDVALIDITY informado no SELECT (resposta já recebida, sem ida ao servidor)"""
+        try:
+            _status, data = connection.imap.response('UIDVALIDITY')
+            return data[0].decode() if data and data[0] else ''
+        except Exception:
+            return ''
+
+    @staticmethod
+    def _thread_key(connection, uidvalidity, uid) -> str:
+        """Chave do e-mail no índice de conversas: o UID, ao contrário da posição, não muda com expunge"""
+        return f"{connection.server}:{connection.username}:{uidvalidity}:{uid.decode()}"
+
+    def _chat_key(self, email_data) -> str:
+        """Destino principal do alerta (bot e chat) usado pelos índices por chat"""
+        chat_id = email_data.get('telegram_chat_id') or self.telegram_client.default_chat_id
+        return f"{email_data.get('telegram_token') or ''}:{chat_id}"
+
+    def _thread_reply_to(self, email_data):
+        """message_id do Telegram a responder quando o e-mail continua uma conversa já alertada"""
+        if self.threads is None or not email_data.get('thread_parents'):
+            return None
+        return self.threads.find(self._chat_key(email_data), email_data['thread_parents'])
+
+    def _remember_thread(self, email_data):
+        message_id = getattr(email_data['trace'], 'message_id', None)
+        if self.threads is None or not isinstance(message_id, int):
+            return
+        keys = [key for key in (email_data.get('message_id'), email_data.get('thread_key')) if key]
+        self.threads.remember(self._chat_key(email_data), keys, message_id)
+
+    def _is_near_duplicate(self, email_data) -> bool:
+        """Agrupa o e-mail a um alerta quase idêntico já entregue recentemente ao mesmo chat"""
+        if self.duplicates is None:
+            return False
+        # Com modelo de extração, a chave dos campos identificadores é comparada exatamente
+        dedupe_key = email_data.get('dedupe_key')
+        if dedupe_key is None:
+            email_data['fingerprint'] = fingerprint(email_data['subject'], email_data['body'])
+        original = self.duplicates.find(self._chat_key(email_data), email_data.get('fingerprint'), dedupe_key,
+                                        level=email_data['classification'].level)
+        if original is None:
+            return False
+        email_data['original'] = {'email_key': original.email_key, 'subject': original.subject}
+        metrics.alerts_coalesced.inc(account=email_data['username'])
+        logger.debug(f"Alerta agrupado a '{original.subject}' (repetição {original.repeats}): {email_data['subject']}")
+        return True
+
+    def _register_delivered(self, email_data):
+        """Registra o alerta entregue como referência para as repetições seguintes"""
+        if self.duplicates is None or ('fingerprint' not in email_data and email_data.get('dedupe_key') is None):
+            return
+        self.duplicates.register(
+            self._chat_key(email_data), email_data['subject'],
+            fingerprint=email_data.get('fingerprint'), key=email_data.get('dedupe_key'),
+            account=email_data['username'], email_key=email_data.get('email_key'),
+            target={'token': email_data.get('telegram_token'), 'chat_id': email_data.get('telegram_chat_id')}
+        )
+
+    def _send_repeat_summaries(self):
+        """Resume as repetições agrupadas de cada alerta cuja janela terminou"""
+        if self.duplicates is None:
+            return
+        for entry in self.duplicates.expired_repeats():
+            try:
+                self.telegram_client.send_text_message(
+                    format_repeat_summary(entry, self.duplicates.window),
+                    token=entry.target.get('token'),
+                    chat_id=entry.target.get('chat_id'),
+                    disable_notification=True
+                )
+            except Exception as e:
+                logger.error(f"Erro ao enviar resumo de repetições de {entry.account}: {e}")
+
+    def _allow_flood(self, email_data, sender) -> bool:
+        """Aplica o limite por (conta, remetente); alertas suprimidos entram no próximo resumo"""
+        if self.flood_guard is None:
+            return True
+        target = {'token': email_data.get('telegram_token'), 'chat_id': email_data.get('telegram_chat_id')}
+        if self.flood_guard.allow(email_data['username'], sender, email_data['classification'].level,
+                                  subject=email_data['subject'], target=target):
+            return True
+        metrics.alerts_suppressed.inc(account=email_data['username'])
+        logger.debug(f"Alerta suprimido (inundação de {sender}): {email_data['subject']}")
+        return False
+
+    def _send_flood_summaries(self):
+        """Envia os resumos "+N suprimidos" vencidos, um por origem em inundação"""
+        if self.flood_guard is None:
+            return
+        for summary in self.flood_guard.due_summaries():
+            try:
+                self.telegram_client.send_text_message(
+                    format_suppressed_summary(summary, self.flood_guard.window, self.flood_guard.limit),
+                    token=summary['target'].get('token'),
+                    chat_id=summary['target'].get('chat_id'),
+                    disable_notification=True
+                )
+            except Exception as e:
+                logger.error(f"Erro ao enviar resumo de alertas suprimidos de {summary['account']}: {e}")
+
+    def _record_skipped(self, email_data, outcome: str):
+        """Registra no histórico e no barramento de eventos um alerta que não foi enviado de propósito"""
+        if self.history is not None:
+            chat_id = email_data.get('telegram_chat_id') or self.telegram_client.default_chat_id
+            self.history.record(email_data, delivered=False, chat_id=chat_id, outcome=outcome,
+                                original=email_data.get('original'))
+        self._publish_alert(email_data, outcome)
+
+    def _publish_alert(self, email_data, outcome: str):
+        classification = email_data['classification']
+        event = {
+            'account': email_data['username'],
+            'subject': email_data['subject'],
+            'from': email_data['from'],
+            'level': classification.level,
+            'alert_type': classification.alert_type,
+            'delivered': outcome == 'delivered',
+            'outcome': outcome,
+        }
+        if email_data.get('original'):
+            event['original'] = email_data['original']
+        events.publish('alert', event)
+
+    def _publish_queue_depth(self):
+        depth = {labels[0]: value for labels, value in metrics.queue_depth.items()}
+        events.publish('queue-depth', {'total': sum(depth.values()), 'bots': depth})
+                
+    def _notify_recipients(self, email_data, users):
+        """Envia o alerta aos usuários resolvidos pelas regras, exceto ao destino principal da conta"""
+        primary = str(email_data.get('telegram_chat_id') or self.telegram_client.default_chat_id)
+        classification = email_data['classification']
+        for chat_id in dict.fromkeys(str(user['chat_id']) for user in users if user.get('chat_id')):
+            if chat_id == primary:
+                continue
+            delivered = self.telegram_client.send_alert(
+                subject=email_data['subject'],
+                from_addr=email_data['from'],
+                body=email_data['body'],
+                alert_type=classification.alert_type,
+                chat_id=chat_id,
+                priority=classification.priority
+            )
+            if not delivered:
+                logger.error(f"Falha ao enviar alerta de {email_data['username']} para o destinatário {chat_id}")
+            if self.history is not None:
+                self.history.record(email_data, delivered=bool(delivered), chat_id=chat_id)
+                
+    def _bot_label(self, email_data):
+        """Rótulo do bot que entregará o alerta (token da conta ou o padrão)"""
+        return bot_label(email_data.get('telegram_token') or getattr(self.telegram_client, 'default_token', None))
                 
     def shutdown(self):
         """Encerra todas as conexões IMAP"""
@@ -346,6 +696,14 @@ class EmailHandler:
         """Realiza diagnóstico de todas as conexões"""
         return {username: connection.diagnose_connection() for username, connection in self.connections.items()}
 
+def parse_internaldate(fetch_meta) -> Optional[float]:
+    """Converte o INTERNALDATE de uma resposta FETCH em timestamp (epoch)"""
+    try:
+        parsed = imaplib.Internaldate2tuple(fetch_meta)
+        return time.mktime(parsed) if parsed else None
+    except Exception:
+        return None
+
 def decode_email_header(header):
     """Decodifica cabeçalhos de e-mail"""
     if not header:
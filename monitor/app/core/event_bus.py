@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Barramento de eventos em processo para o painel (Server-Sent Events)
+
+O monitor publica eventos (alert, account-status, queue-depth) sem bloquear:
+cada evento recebe um id "<época>-<n>" (época = início do processo, n
+crescente), fica em um buffer circular para retomada via Last-Event-ID e é copiado para a fila limitada de cada assinante. Um
+assinante lento cuja fila enche é desconectado, em vez de acumular memória ou
+atrasar o loop de monitoramento; o navegador reconecta e recupera o que perdeu
+pelo buffer.
+"""
+
+import json
+import time
+import queue
+import logging
+import threading
+from collections import deque
+from typing import Dict, Any, List, Optional, Tuple
+
+logger = logging.getLogger('wegnots.event_bus')
+
+HISTORY_SIZE = 500
+CLIENT_QUEUE_SIZE = 100
+MAX_SUBSCRIBERS = 50
+
+
+def parse_event_id(value: Optional[str]) -> Optional[Tuple[str, int]]:
+    """(época, n) de um Last-Event-ID "<época>-<n>"; None se vazio ou malformado"""
+    epoch, _, sequence = (value or '').strip().rpartition('-')
+    if not epoch or not sequence.isdigit():
+        return None
+    return epoch, int(sequence)
+
+
+class Event:
+    __slots__ = ('epoch', 'id', 'type', 'data', 'ts')
+
+    def __init__(self, epoch: str, event_id: int, event_type: str, data: Dict[str, Any]):
+        self.epoch = epoch
+        self.id = event_id
+        self.type = event_type
+        self.data = data
+        self.ts = time.time()
+
+    @property
+    def sse_id(self) -> str:
+        return f"{self.epoch}-{self.id}"
+
+    def to_sse(self) -> str:
+        """Formato text/event-stream (id, event, data)"""
+        payload = json.dumps({**self.data, 'ts': self.ts}, ensure_ascii=False, default=str)
+        return f"id: {self.sse_id}\nevent: {self.type}\ndata: {payload}\n\n"
+
+
+class Subscription:
+    def __init__(self, bus: 'EventBus', max_queue: int):
+        self.bus = bus
+        self.queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self.dropped = False
+
+    def offer(self, event: Event) -> bool:
+        try:
+            self.queue.put_nowait(event)
+            return True
+        except queue.Full:
+            self.dropped = True
+            return False
+
+    def get(self, timeout: float) -> Optional[Event]:
+        """Próximo evento ou None se nada chegar em `timeout` segundos (ou se foi desconectado)"""
+        if self.dropped and self.queue.empty():
+            return None
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.bus.unsubscribe(self)
+
+
+class EventBus:
+    def __init__(self, history_size: int = HISTORY_SIZE, client_queue_size: int = CLIENT_QUEUE_SIZE,
+                 max_subscribers: int = MAX_SUBSCRIBERS):
+        self.client_queue_size = client_queue_size
+        self.max_subscribers = max_subscribers
+        self.dropped_clients = 0
+        self._history: deque = deque(maxlen=history_size)
+        self._subscribers: List[Subscription] = []
+        # IDs de outra execução do processo (antes de um reinício) não são comparáveis
+        self.epoch = str(int(time.time() * 1000))
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def publish(self, event_type: str, data: Dict[str, Any]) -> Event:
+        """Publica um evento; nunca bloqueia quem publica"""
+        with self._lock:
+            event = Event(self.epoch, self._next_id, event_type, data)
+            self._next_id += 1
+            self._history.append(event)
+            slow = [subscriber for subscriber in self._subscribers if not subscriber.offer(event)]
+            for subscriber in slow:
+                self._subscribers.remove(subscriber)
+                self.dropped_clients += 1
+        if slow:
+            logger.warning(f"{len(slow)} cliente(s) de eventos desconectado(s) por fila cheia")
+        return event
+
+    def subscribe(self, last_event_id: Optional[str] = None) -> Optional[Subscription]:
+        """
+        Registra um assinante (None se o limite foi atingido). Com
+        last_event_id, os eventos posteriores ainda no buffer são reenviados;
+        se o buffer já não cobre o intervalo, ou o ID é de outra época (antes
+        de um reinício) ou malformado, um evento 'reset' avisa o cliente para
+        recarregar o estado completo.
+        """
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                return None
+            subscription = Subscription(self, self.client_queue_size)
+            if last_event_id:
+                parsed = parse_event_id(last_event_id)
+                # ID de outra época (reinício do processo), malformado ou à frente do contador
+                if parsed is None or parsed[0] != self.epoch or parsed[1] >= self._next_id:
+                    subscription.offer(self._reset('unknown_event_id'))
+                    missed = []
+                else:
+                    sequence = parsed[1]
+                    oldest = self._history[0].id if self._history else self._next_id
+                    missed = [event for event in self._history if event.id > sequence]
+                    # Buffer sem o intervalo perdido ou perda maior que a fila: recarga completa
+                    if sequence + 1 < oldest or len(missed) >= self.client_queue_size:
+                        subscription.offer(self._reset('history_expired'))
+                        missed = []
+                for event in missed:
+                    subscription.offer(event)
+            self._subscribers.append(subscription)
+            return subscription
+
+    def _reset(self, reason: str) -> Event:
+        return Event(self.epoch, self._next_id - 1, 'reset', {'reason': reason})
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            if subscription in self._subscribers:
+                self._subscribers.remove(subscription)
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+
+_bus: Optional[EventBus] = None
+_bus_lock = threading.Lock()
+
+
+def get_event_bus() -> EventBus:
+    """Retorna o barramento de eventos compartilhado pelo processo"""
+    global _bus
+    with _bus_lock:
+        if _bus is None:
+            _bus = EventBus()
+        return _bus
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Supressão de inundações por remetente (janela deslizante por conta e remetente)
+
+Cada par (conta, remetente) pode gerar até `limit` alertas em `window`
+segundos. Acima disso os alertas deixam de ser enviados individualmente e são
+contados; a cada `summary_interval` segundos sai um único resumo "+N alertas
+suprimidos" por origem. Alertas de níveis isentos (críticos, por padrão) nunca
+são suprimidos. Assim uma origem com defeito não consome a cota de envio do
+bot enquanto há alertas importantes de outras origens.
+"""
+
+import time
+import logging
+import threading
+from collections import deque
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+from .markdown import escape_markdown
+
+logger = logging.getLogger('wegnots.flood_guard')
+
+DEFAULT_LIMIT = 20
+DEFAULT_WINDOW = 600
+DEFAULT_SUMMARY_INTERVAL = 300
+
+
+class SourceState:
+    __slots__ = ('sent', 'suppressed', 'since', 'last_summary', 'last_subject', 'target')
+
+    def __init__(self, limit: int):
+        # Horários dos últimos envios; nunca guarda mais que `limit` entradas
+        self.sent: deque = deque(maxlen=limit)
+        self.suppressed = 0
+        self.since: Optional[float] = None
+        self.last_summary: Optional[float] = None
+        self.last_subject = ''
+        self.target: Dict[str, Any] = {}
+
+
+class FloodGuard:
+    def __init__(self, limit: int = DEFAULT_LIMIT, window: float = DEFAULT_WINDOW,
+                 summary_interval: float = DEFAULT_SUMMARY_INTERVAL, exempt_levels: Iterable[str] = ('critical',)):
+        self.limit = limit
+        self.window = window
+        self.summary_interval = summary_interval
+        self.exempt_levels = set(exempt_levels)
+        self._sources: Dict[Tuple[str, str], SourceState] = {}
+        self._lock = threading.Lock()
+
+    def allow(self, account: str, sender: str, level: Optional[str] = None, subject: str = '',
+              target: Optional[Dict[str, Any]] = None, now: Optional[float] = None) -> bool:
+        """
+        Registra um alerta da origem e indica se ele deve ser enviado. Quando
+        suprimido, o assunto e o destino (token/chat_id) ficam para o resumo.
+        """
+        if level in self.exempt_levels:
+            return True
+        now = time.time() if now is None else now
+        with self._lock:
+            state = self._sources.get((account, sender))
+            if state is None:
+                state = self._sources[(account, sender)] = SourceState(self.limit)
+            while state.sent and now - state.sent[0] >= self.window:
+                state.sent.popleft()
+            if len(state.sent) < self.limit:
+                state.sent.append(now)
+                return True
+            if not state.suppressed:
+                state.since = state.last_summary = now
+                logger.warning(f"Inundação de {sender or 'remetente desconhecido'} em {account}: "
+                               f"alertas suprimidos até o próximo resumo")
+            state.suppressed += 1
+            state.last_subject = subject
+            state.target = target or {}
+            return False
+
+    def due_summaries(self, now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Resumos vencidos (origens com alertas suprimidos há summary_interval);
+        os contadores são zerados. Origens inativas são descartadas.
+        """
+        now = time.time() if now is None else now
+        summaries = []
+        with self._lock:
+            for key, state in list(self._sources.items()):
+                if state.suppressed and now - state.last_summary >= self.summary_interval:
+                    summaries.append({
+                        'account': key[0], 'sender': key[1], 'suppressed': state.suppressed,
+                        'since': state.since, 'last_subject': state.last_subject, 'target': state.target,
+                    })
+                    state.suppressed = 0
+                    state.last_summary = now
+                elif not state.suppressed and (not state.sent or now - state.sent[-1] >= self.window):
+                    del self._sources[key]
+        return summaries
+
+    def suppressed(self) -> Dict[str, int]:
+        """Alertas suprimidos ainda não resumidos, por conta"""
+        totals: Dict[str, int] = {}
+        with self._lock:
+            for (account, _sender), state in self._sources.items():
+                if state.suppressed:
+                    totals[account] = totals.get(account, 0) + state.suppressed
+        return totals
+
+
+def format_suppressed_summary(summary: Dict[str, Any], window: float = DEFAULT_WINDOW,
+                              limit: int = DEFAULT_LIMIT) -> str:
+    minutes = max(1, int((time.time() - (summary['since'] or time.time())) // 60))
+    message = (
+        "🔕 *Alertas suprimidos*\n\n"
+        f"📧 Conta: {escape_markdown(summary['account'])}\n"
+        f"👤 Remetente: {escape_markdown(summary['sender'] or 'desconhecido')}\n"
+        f"🔁 Mais {summary['suppressed']} alerta(s) suprimido(s) nos últimos {minutes} min "
+        f"(limite de {limit} a cada {int(window // 60)} min)\n"
+    )
+    if summary.get('last_subject'):
+        message += f"📝 Último assunto: {escape_markdown(summary['last_subject'])}\n"
+    return message + "\nAlertas críticos desta origem continuam sendo enviados."
+
+
+_guard: Optional[FloodGuard] = None
+_guard_lock = threading.Lock()
+
+
+def get_flood_guard() -> Optional[FloodGuard]:
+    """Retorna o limitador compartilhado pelo processo (None se desabilitado)"""
+    return _guard
+
+
+def set_flood_guard(guard: Optional[FloodGuard]):
+    global _guard
+    with _guard_lock:
+        _guard = guard
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Heartbeats do loop principal e dos workers de cada conta
+
+O agendador (loop de main.py) e cada conta IMAP registram um heartbeat com o
+intervalo esperado entre batidas. Os endpoints /live e /ready do servidor de
+health check consultam esses registros, e um watchdog opcional encerra o
+processo quando o agendador fica travado, para que o Docker o reinicie.
+"""
+
+import os
+import time
+import logging
+import threading
+from typing import Dict, Any, Iterable, Optional, Tuple
+
+from ..config.logging_config import stop_logging
+
+logger = logging.getLogger('wegnots.heartbeat')
+
+SCHEDULER = 'scheduler'
+ACCOUNT_PREFIX = 'account:'
+DEFAULT_MAX_MISSED = 3
+
+
+class HeartbeatMonitor:
+    def __init__(self):
+        # nome -> [última batida (monotonic), intervalo esperado em segundos]
+        self._beats: Dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, interval: float):
+        """Registra um componente; o registro conta como a primeira batida"""
+        with self._lock:
+            self._beats[name] = [time.monotonic(), float(interval)]
+
+    def unregister(self, name: str):
+        with self._lock:
+            self._beats.pop(name, None)
+
+    def beat(self, name: str):
+        entry = self._beats.get(name)
+        if entry is not None:
+            entry[0] = time.monotonic()
+
+    def check(self, names: Optional[Iterable[str]] = None,
+              max_missed: int = DEFAULT_MAX_MISSED) -> Tuple[bool, Dict[str, Any]]:
+        """
+        Verifica se os componentes bateram dentro de max_missed intervalos.
+        Retorna (ok, detalhes por componente).
+        """
+        now = time.monotonic()
+        with self._lock:
+            items = list(self._beats.items()) if names is None else \
+                [(name, self._beats[name]) for name in names if name in self._beats]
+        ok = True
+        details = {}
+        for name, (last_beat, interval) in items:
+            age = now - last_beat
+            healthy = age <= interval * max_missed
+            ok = ok and healthy
+            details[name] = {'ok': healthy, 'age': round(age, 1), 'interval': interval}
+        return ok, details
+
+    def liveness(self, max_missed: int = DEFAULT_MAX_MISSED) -> Tuple[bool, Dict[str, Any]]:
+        """O processo está vivo enquanto o agendador continuar batendo"""
+        return self.check([SCHEDULER], max_missed)
+
+    def readiness(self, max_missed: int = DEFAULT_MAX_MISSED) -> Tuple[bool, Dict[str, Any]]:
+        """Pronto quando o agendador e todos os workers de conta estão progredindo"""
+        return self.check(None, max_missed)
+
+
+def account_heartbeat(username: str) -> str:
+    return f"{ACCOUNT_PREFIX}{username}"
+
+
+def start_watchdog(monitor: HeartbeatMonitor, max_missed: int = DEFAULT_MAX_MISSED,
+                   check_every: float = 10.0) -> threading.Thread:
+    """
+    Inicia uma thread que encerra o processo (código 1) se o agendador parar
+    de bater, permitindo que a política de restart do contêiner o reinicie.
+    """
+    def _watch():
+        while True:
+            time.sleep(check_every)
+            ok, details = monitor.liveness(max_missed)
+            if not ok:
+                logger.critical(f"Loop de monitoramento sem progresso ({details}). Encerrando para reinício automático.")
+                # os._exit não roda o atexit: esvazia a fila de logs antes (senão o motivo se perde)
+                stop_logging()
+                logging.shutdown()
+                os._exit(1)
+
+    thread = threading.Thread(target=_watch, name='heartbeat-watchdog', daemon=True)
+    thread.start()
+    return thread
+
+
+_heartbeats: Optional[HeartbeatMonitor] = None
+_heartbeats_lock = threading.Lock()
+
+
+def get_heartbeats() -> HeartbeatMonitor:
+    """Retorna o monitor de heartbeats compartilhado pelo processo"""
+    global _heartbeats
+    with _heartbeats_lock:
+        if _heartbeats is None:
+            _heartbeats = HeartbeatMonitor()
+        return _heartbeats
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Gerenciamento idempotente e versionado dos índices do MongoDB
+
+A especificação desejada de cada coleção fica em INDEX_SPECS. O hash de cada
+especificação aplicada é gravado na coleção schema_meta; na inicialização,
+coleções cuja especificação não mudou não sofrem nenhuma operação de índice.
+Quando muda, apenas os índices ausentes são criados (nunca há drop_indexes).
+Alterações de TTL são aplicadas com collMod, sem reconstruir o índice.
+"""
+
+import json
+import hashlib
+import logging
+from datetime import datetime
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger('wegnots.index_manager')
+
+META_COLLECTION = 'schema_meta'
+META_ID = 'indexes'
+
+# Os nomes seguem o padrão do MongoDB (campo_1) para reaproveitar índices já existentes
+INDEX_SPECS: Dict[str, List[Dict[str, Any]]] = {
+    'users': [
+        {'keys': [('email', 1)], 'name': 'email_1', 'unique': True},
+        {'keys': [('chat_id', 1)], 'name': 'chat_id_1', 'unique': True},
+        {'keys': [('notification_rules.sender', 1)], 'name': 'notification_rules.sender_1'},
+        {'keys': [('is_central_server', 1)], 'name': 'is_central_server_1'},
+    ],
+    'processed_emails': [
+        {'keys': [('processed_time', 1)], 'name': 'processed_time_ttl', 'expireAfterSeconds': 7 * 24 * 60 * 60},
+        {'keys': [('email_id', 1)], 'name': 'email_id_1'},
+    ],
+    'alert_logs': [
+        {'keys': [('account', 1), ('ts', -1)], 'name': 'account_1_ts_-1'},
+        {'keys': [('ts', -1)], 'name': 'ts_-1'},
+        {'keys': [('subject', 'text'), ('sender', 'text')], 'name': 'subject_text_sender_text',
+         'default_language': 'portuguese', 'weights': {'subject': 2, 'sender': 1}},
+    ],
+    'sender_stats': [
+        {'keys': [('account', 1), ('day', -1)], 'name': 'account_1_day_-1'},
+    ],
+    # Resumos do histórico de métricas (a coleção bruta é time series e expira sozinha)
+    'metrics_hourly': [
+        {'keys': [('account', 1), ('period', 1)], 'name': 'account_1_period_1'},
+        {'keys': [('period', 1)], 'name': 'period_ttl', 'expireAfterSeconds': 180 * 24 * 60 * 60},
+    ],
+    'metrics_daily': [
+        {'keys': [('account', 1), ('period', 1)], 'name': 'account_1_period_1'},
+        {'keys': [('period', 1)], 'name': 'period_ttl', 'expireAfterSeconds': 2 * 365 * 24 * 60 * 60},
+    ],
+}
+
+# Coleções já verificadas neste processo: (banco, coleção, hash da especificação)
+_verified = set()
+
+# Opções comparadas com index_information() para detectar divergências
+_COMPARED_OPTIONS = ('unique', 'expireAfterSeconds', 'sparse', 'partialFilterExpression')
+
+
+def spec_hash(specs: List[Dict[str, Any]]) -> str:
+    return hashlib.sha256(json.dumps(specs, sort_keys=True, default=str).encode('utf-8')).hexdigest()[:16]
+
+
+class IndexManager:
+    def __init__(self, db, specs: Optional[Dict[str, List[Dict[str, Any]]]] = None):
+        self.db = db
+        self.specs = specs if specs is not None else INDEX_SPECS
+        self.meta = db[META_COLLECTION]
+
+    def _key(self, name: str) -> Tuple[str, str, str]:
+        return (getattr(self.db, 'name', ''), name, spec_hash(self.specs[name]))
+
+    def _applied(self) -> Dict[str, str]:
+        doc = self.meta.find_one({'_id': META_ID}) or {}
+        return doc.get('collections', {})
+
+    def ensure(self, collections: Optional[Iterable[str]] = None) -> int:
+        """
+        Garante os índices das coleções informadas (todas, se omitido).
+        Retorna o número de operações de índice executadas (0 se nada mudou).
+        """
+        names = [name for name in (collections if collections is not None else self.specs) if name in self.specs]
+        unchecked = [name for name in names if self._key(name) not in _verified]
+        if not unchecked:
+            return 0
+        applied = self._applied()
+        pending = [name for name in unchecked if applied.get(name) != spec_hash(self.specs[name])]
+        _verified.update(self._key(name) for name in unchecked if name not in pending)
+        if not pending:
+            logger.debug(f"Índices atualizados para {names}; nenhuma alteração necessária")
+            return 0
+
+        operations = 0
+        for name in pending:
+            done, complete = self._ensure_collection(name, self.specs[name])
+            operations += done
+            if not complete:
+                # Sem registrar a versão: a coleção é verificada novamente na próxima inicialização
+                continue
+            self.meta.update_one(
+                {'_id': META_ID},
+                {'$set': {f'collections.{name}': spec_hash(self.specs[name]), 'updated_at': datetime.utcnow()}},
+                upsert=True
+            )
+            _verified.add(self._key(name))
+        logger.info(f"Índices verificados para {pending}: {operations} operação(ões) executada(s)")
+        return operations
+
+    def _ensure_collection(self, name: str, specs: List[Dict[str, Any]]) -> Tuple[int, bool]:
+        """Cria os índices ausentes; retorna (operações executadas, especificação totalmente aplicada)"""
+        collection = self.db[name]
+        existing = collection.index_information()
+        operations = 0
+        complete = True
+        for spec in specs:
+            options = {key: value for key, value in spec.items() if key != 'keys'}
+            current = existing.get(spec['name'])
+            if current is None:
+                try:
+                    collection.create_index(spec['keys'], **options)
+                except Exception as e:
+                    logger.error(f"Erro ao criar índice {name}.{spec['name']}: {e}")
+                    complete = False
+                    continue
+                logger.info(f"Índice criado: {name}.{spec['name']}")
+                operations += 1
+                continue
+            if 'expireAfterSeconds' in spec and current.get('expireAfterSeconds') != spec['expireAfterSeconds']:
+                # TTL pode ser alterado sem reconstruir o índice
+                try:
+                    self.db.command('collMod', name, index={'name': spec['name'],
+                                                            'expireAfterSeconds': spec['expireAfterSeconds']})
+                except Exception as e:
+                    logger.error(f"Erro ao alterar o TTL do índice {name}.{spec['name']}: {e}")
+                    complete = False
+                    continue
+                logger.info(f"TTL do índice {name}.{spec['name']} alterado para {spec['expireAfterSeconds']}s")
+                operations += 1
+            elif any(current.get(option) != spec.get(option) for option in _COMPARED_OPTIONS if option != 'expireAfterSeconds'):
+                logger.warning(f"Índice {name}.{spec['name']} existe com opções diferentes da especificação; "
+                               "ajuste manual necessário (o índice não é removido automaticamente)")
+        return operations, complete
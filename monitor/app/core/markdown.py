@@ -0,0 +1,17 @@
+#!/usr/bin/env python3
+"""
+Escape de textos dinâmicos (assuntos, remetentes, contas) em mensagens
+enviadas ao Telegram com parse_mode Markdown (v1)
+"""
+
+from typing import Optional
+
+MARKDOWN_RESERVED = ('_', '*', '`', '[')
+
+
+def escape_markdown(text: Optional[str]) -> str:
+    """Escapa os caracteres reservados do Markdown (v1)"""
+    text = '' if text is None else str(text)
+    for char in MARKDOWN_RESERVED:
+        text = text.replace(char, f'\\{char}')
+    return text
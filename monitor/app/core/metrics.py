@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+Registro de métricas em memória do WegNots
+
+Contadores, gauges e histogramas com rótulos (ex.: por conta ou por bot),
+alimentados pelo EmailHandler e pelo caminho de entrega do Telegram. Todas
+as operações de escrita são O(1) e a leitura do resumo de status independe
+do volume de e-mails processados.
+"""
+
+import time
+import bisect
+import threading
+from datetime import date
+from typing import Dict, Any, List, Optional, Tuple
+
+# Limites (em segundos) dos buckets de latência
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+
+
+def _label_key(labelnames: Tuple[str, ...], labels: Dict[str, Any]) -> Tuple[str, ...]:
+    return tuple(str(labels.get(name, '')) for name in labelnames)
+
+
+def _escape_label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labelnames: Tuple[str, ...], key: Tuple[str, ...], extra: str = '') -> str:
+    parts = [f'{name}="{_escape_label(value)}"' for name, value in zip(labelnames, key)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+def bot_label(token: Optional[str]) -> str:
+    """Rótulo público de um bot: o ID numérico antes do ':' do token"""
+    return token.split(':', 1)[0] if token else 'default'
+
+
+class Counter:
+    type_name = 'counter'
+
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(_label_key(self.labelnames, labels), 0)
+
+    def items(self) -> List[Tuple[Tuple[str, ...], float]]:
+        with self._lock:
+            return list(self._values.items())
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type_name}"]
+        for key, value in sorted(self.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    type_name = 'gauge'
+
+    def set(self, value: float, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = value
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # rótulos -> [contagens por bucket (+Inf no final), soma, total]
+        self._series: Dict[Tuple[str, ...], List[Any]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = _label_key(self.labelnames, labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def quantile(self, q: float, **labels) -> Optional[float]:
+        """Estima o quantil q por interpolação linear dentro do bucket"""
+        with self._lock:
+            series = self._series.get(_label_key(self.labelnames, labels))
+            if not series or not series[2]:
+                return None
+            counts, total = list(series[0]), series[2]
+        rank = q * total
+        cumulative = 0
+        for index, count in enumerate(counts):
+            if count and cumulative + count >= rank:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else lower
+                return lower + (upper - lower) * ((rank - cumulative) / count)
+            cumulative += count
+        return self.buckets[-1]
+
+    def items(self) -> List[Tuple[Tuple[str, ...], List[Any]]]:
+        with self._lock:
+            return [(key, [list(series[0]), series[1], series[2]]) for key, series in self._series.items()]
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total_sum, total) in sorted(self.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound) if bound == float("inf") else bound}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total_sum)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {total}")
+        return lines
+
+
+class AccountStatus:
+    """Estado resumido de uma conta monitorada, atualizado in-place"""
+    __slots__ = ('connection_state', 'last_poll_success', 'last_poll_duration',
+                 'alerts_day', 'alerts_today', 'emails_today', 'failed_today')
+
+    def __init__(self):
+        self.connection_state = 'disconnected'
+        self.last_poll_success: Optional[float] = None
+        self.last_poll_duration: Optional[float] = None
+        self.alerts_day = date.today()
+        self.alerts_today = 0
+        self.emails_today = 0
+        self.failed_today = 0
+
+    def roll_day(self):
+        today = date.today()
+        if today != self.alerts_day:
+            self.alerts_day = today
+            self.alerts_today = 0
+            self.emails_today = 0
+            self.failed_today = 0
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, Any] = {}
+        self._accounts: Dict[str, AccountStatus] = {}
+
+        self.emails_detected = self.counter(
+            'wegnots_emails_detected_total', 'E-mails novos detectados', ('account',))
+        self.alerts_sent = self.counter(
+            'wegnots_alerts_sent_total', 'Alertas entregues ao Telegram', ('account',))
+        self.alerts_failed = self.counter(
+            'wegnots_alerts_failed_total', 'Alertas que falharam na entrega', ('account',))
+        self.alerts_suppressed = self.counter(
+            'wegnots_alerts_suppressed_total', 'Alertas suprimidos por inundação do mesmo remetente', ('account',))
+        self.alerts_coalesced = self.counter(
+            'wegnots_alerts_coalesced_total', 'Alertas quase duplicados agrupados a um alerta recente', ('account',))
+        self.queue_depth = self.gauge(
+            'wegnots_delivery_queue_depth', 'Alertas aguardando envio por bot', ('bot',))
+        self.alert_latency = self.histogram(
+            'wegnots_alert_latency_seconds', 'Latência entre detecção do e-mail e entrega no Telegram', ('account',))
+        self.poll_duration = self.histogram(
+            'wegnots_poll_duration_seconds', 'Duração de cada verificação IMAP por conta', ('account',))
+        self.imap_round_trips = self.counter(
+            'wegnots_imap_round_trips_total', 'Comandos IMAP enviados ao servidor', ('account',))
+        self.imap_bytes = self.counter(
+            'wegnots_imap_bytes_fetched_total', 'Bytes de mensagens baixados via IMAP', ('account',))
+        self.imap_reconnects = self.counter(
+            'wegnots_imap_reconnects_total', 'Reconexões IMAP realizadas', ('account',))
+        self.parse_duration = self.histogram(
+            'wegnots_parse_duration_seconds', 'Tempo de parsing de cada e-mail', ('account',),
+            buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5))
+        self.send_latency = self.histogram(
+            'wegnots_telegram_send_seconds', 'Duração das chamadas sendMessage por bot', ('bot',))
+        self.send_retries = self.counter(
+            'wegnots_telegram_retries_total', 'Novas tentativas de envio ao Telegram', ('bot',))
+        self.rate_limited = self.counter(
+            'wegnots_telegram_rate_limited_total', 'Respostas 429 recebidas do Telegram', ('bot',))
+        self._rendered: Tuple[float, str] = (0.0, '')
+
+    def _register(self, cls, name, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            return metric
+
+    def counter(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter, name, help_text, labelnames)
+
+    def gauge(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()) -> Gauge:
+        return self._register(Gauge, name, help_text, labelnames)
+
+    def histogram(self, name: str, help_text: str, labelnames: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram, name, help_text, labelnames, buckets)
+
+    def register(self, metric: Any) -> Any:
+        """Registra uma métrica externa que implemente name e render()"""
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def all_metrics(self) -> List[Any]:
+        with self._lock:
+            return list(self._metrics.values())
+
+    def render_prometheus(self, max_age: float = 1.0) -> str:
+        """
+        Exporta as métricas no formato texto do Prometheus. O resultado é
+        reaproveitado por max_age segundos para que scrapes frequentes não
+        disputem os locks com o loop de monitoramento.
+        """
+        rendered_at, text = self._rendered
+        now = time.monotonic()
+        if text and now - rendered_at < max_age:
+            return text
+        lines = [
+            '# HELP wegnots_uptime_seconds Tempo desde o início do processo',
+            '# TYPE wegnots_uptime_seconds gauge',
+            f'wegnots_uptime_seconds {_format_value(time.time() - self.started_at)}',
+        ]
+        for metric in sorted(self.all_metrics(), key=lambda m: m.name):
+            lines.extend(metric.render())
+        text = '\n'.join(lines) + '\n'
+        self._rendered = (now, text)
+        return text
+
+    def _account(self, account: str) -> AccountStatus:
+        status = self._accounts.get(account)
+        if status is None:
+            with self._lock:
+                status = self._accounts.setdefault(account, AccountStatus())
+        return status
+
+    # Pontos de instrumentação usados pelo EmailHandler / TelegramClient
+
+    def record_connection_state(self, account: str, state: str):
+        self._account(account).connection_state = state
+
+    def record_poll(self, account: str, duration: float, success: bool):
+        status = self._account(account)
+        status.last_poll_duration = duration
+        self.poll_duration.observe(duration, account=account)
+        if success:
+            status.last_poll_success = time.time()
+
+    def record_email_detected(self, account: str):
+        status = self._account(account)
+        status.roll_day()
+        status.emails_today += 1
+        self.emails_detected.inc(account=account)
+
+    def record_alert(self, account: str, success: bool, latency: Optional[float] = None):
+        status = self._account(account)
+        status.roll_day()
+        if success:
+            status.alerts_today += 1
+            self.alerts_sent.inc(account=account)
+            if latency is not None:
+                self.alert_latency.observe(latency, account=account)
+        else:
+            status.failed_today += 1
+            self.alerts_failed.inc(account=account)
+
+    def status_snapshot(self) -> Dict[str, Any]:
+        """Resumo do estado atual para o comando /status e para health checks"""
+        now = time.time()
+        accounts = {}
+        for account, status in list(self._accounts.items()):
+            status.roll_day()
+            latency_p95 = self.alert_latency.quantile(0.95, account=account)
+            accounts[account] = {
+                'connection_state': status.connection_state,
+                'last_poll_age': (now - status.last_poll_success) if status.last_poll_success else None,
+                'last_poll_at': status.last_poll_success,
+                'last_poll_duration': status.last_poll_duration,
+                'emails_today': status.emails_today,
+                'alerts_today': status.alerts_today,
+                'failed_today': status.failed_today,
+                'latency_p95': latency_p95,
+            }
+        return {
+            'uptime': now - self.started_at,
+            'accounts': accounts,
+            'active_servers': sum(1 for a in accounts.values() if a['connection_state'] == 'connected'),
+            'emails_today': sum(a['emails_today'] for a in accounts.values()),
+            'notifications_sent': sum(a['alerts_today'] for a in accounts.values()),
+            'queue_depth': sum(value for _, value in self.queue_depth.items()),
+        }
+
+
+_metrics: Optional[MetricsRegistry] = None
+_metrics_lock = threading.Lock()
+
+
+def get_metrics() -> MetricsRegistry:
+    """Retorna o registro de métricas compartilhado pelo processo"""
+    global _metrics
+    with _metrics_lock:
+        if _metrics is None:
+            _metrics = MetricsRegistry()
+        return _metrics
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Histórico das métricas do monitor no MongoDB
+
+A cada intervalo, as variações dos contadores e histogramas por conta (e-mails
+detectados, alertas entregues e com falha, verificações IMAP e sua duração,
+latência de entrega, bytes e reconexões) são gravadas em uma coleção time
+series (metrics_raw) com expiração automática. Agregações periódicas com $merge
+mantêm os resumos por hora (metrics_hourly) e por dia (metrics_daily), que são
+pequenos e atendem o painel sem varrer os eventos brutos.
+"""
+
+import time
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from pymongo import ASCENDING
+
+from .index_manager import IndexManager
+from .metrics import MetricsRegistry, get_metrics
+
+logger = logging.getLogger('wegnots.metrics_store')
+
+RAW_COLLECTION = 'metrics_raw'
+HOURLY_COLLECTION = 'metrics_hourly'
+DAILY_COLLECTION = 'metrics_daily'
+
+# Campo do documento -> (métrica do registro, tipo)
+SAMPLED_FIELDS = {
+    'emails': ('emails_detected', 'counter'),
+    'alerts_sent': ('alerts_sent', 'counter'),
+    'alerts_failed': ('alerts_failed', 'counter'),
+    'imap_bytes': ('imap_bytes', 'counter'),
+    'reconnects': ('imap_reconnects', 'counter'),
+    'polls': ('poll_duration', 'count'),
+    'poll_seconds': ('poll_duration', 'sum'),
+    'latency_count': ('alert_latency', 'count'),
+    'latency_seconds': ('alert_latency', 'sum'),
+}
+SUMMED_FIELDS = tuple(SAMPLED_FIELDS)
+
+
+def _summary_stage() -> Dict[str, Any]:
+    """Campos derivados comuns aos resumos por hora e por dia"""
+    return {'$set': {
+        'account': '$_id.account',
+        'period': '$_id.period',
+        'poll_avg': {'$cond': [{'$gt': ['$polls', 0]}, {'$divide': ['$poll_seconds', '$polls']}, None]},
+        'latency_avg': {'$cond': [{'$gt': ['$latency_count', 0]},
+                                  {'$divide': ['$latency_seconds', '$latency_count']}, None]},
+        'error_rate': {'$cond': [{'$gt': [{'$add': ['$alerts_sent', '$alerts_failed']}, 0]},
+                                 {'$divide': ['$alerts_failed', {'$add': ['$alerts_sent', '$alerts_failed']}]}, 0]},
+        'updated_at': '$$NOW',
+    }}
+
+
+class MetricsStore:
+    def __init__(self, db, registry: Optional[MetricsRegistry] = None, flush_interval: float = 60.0,
+                 rollup_interval: float = 300.0, raw_retention_days: int = 30, timezone_name: str = 'UTC'):
+        self.db = db
+        self.registry = registry or get_metrics()
+        self.flush_interval = flush_interval
+        self.rollup_interval = rollup_interval
+        self.raw_retention_days = raw_retention_days
+        self.timezone_name = timezone_name
+        self._last: Dict[Tuple[str, str], float] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def ensure_collections(self):
+        """Cria a coleção time series (com TTL) e os índices dos resumos, se necessário"""
+        if RAW_COLLECTION not in self.db.list_collection_names():
+            self.db.create_collection(
+                RAW_COLLECTION,
+                timeseries={'timeField': 'ts', 'metaField': 'meta', 'granularity': 'minutes'},
+                expireAfterSeconds=self.raw_retention_days * 24 * 60 * 60
+            )
+            logger.info(f"Coleção time series {RAW_COLLECTION} criada (retenção de {self.raw_retention_days} dias)")
+        IndexManager(self.db).ensure([HOURLY_COLLECTION, DAILY_COLLECTION])
+
+    # Amostragem -------------------------------------------------------------
+
+    def _current_values(self) -> Dict[Tuple[str, str], float]:
+        """Valores acumulados por (conta, campo)"""
+        values: Dict[Tuple[str, str], float] = {}
+        for field, (metric_name, kind) in SAMPLED_FIELDS.items():
+            metric = getattr(self.registry, metric_name)
+            for key, value in metric.items():
+                account = key[0]
+                if kind == 'count':
+                    value = value[2]
+                elif kind == 'sum':
+                    value = value[1]
+                values[(account, field)] = value
+        return values
+
+    def sample(self, now: Optional[datetime] = None) -> Tuple[List[Dict[str, Any]], Dict[Tuple[str, str], float]]:
+        """
+        Documentos com as variações por conta desde a última amostra gravada e
+        os valores acumulados atuais, que só viram referência após a gravação
+        """
+        now = now or datetime.now(timezone.utc)
+        current = self._current_values()
+        documents: Dict[str, Dict[str, Any]] = {}
+        for (account, field), value in current.items():
+            delta = value - self._last.get((account, field), 0)
+            if delta:
+                document = documents.setdefault(account, {'ts': now, 'meta': {'account': account},
+                                                          **{name: 0 for name in SUMMED_FIELDS}})
+                document[field] = delta
+        return list(documents.values()), current
+
+    def flush(self) -> int:
+        documents, current = self.sample()
+        if documents:
+            # Se a gravação falhar, as variações entram na próxima amostra
+            self.db[RAW_COLLECTION].insert_many(documents, ordered=False)
+        self._last = current
+        return len(documents)
+
+    # Resumos ----------------------------------------------------------------
+
+    def rollup_hourly(self, since: datetime):
+        """Recalcula (idempotente) os resumos por hora a partir de `since`"""
+        self.db[RAW_COLLECTION].aggregate([
+            {'$match': {'ts': {'$gte': since}}},
+            {'$group': {
+                '_id': {'account': '$meta.account',
+                        'period': {'$dateTrunc': {'date': '$ts', 'unit': 'hour'}}},
+                **{field: {'$sum': f'${field}'} for field in SUMMED_FIELDS},
+            }},
+            _summary_stage(),
+            {'$merge': {'into': HOURLY_COLLECTION, 'on': '_id', 'whenMatched': 'replace', 'whenNotMatched': 'insert'}},
+        ])
+
+    def rollup_daily(self, since: datetime):
+        """Recalcula os resumos por dia (fuso configurado) a partir dos resumos por hora"""
+        self.db[HOURLY_COLLECTION].aggregate([
+            {'$match': {'period': {'$gte': since}}},
+            {'$group': {
+                '_id': {'account': '$account',
+                        'period': {'$dateTrunc': {'date': '$period', 'unit': 'day', 'timezone': self.timezone_name}}},
+                **{field: {'$sum': f'${field}'} for field in SUMMED_FIELDS},
+            }},
+            _summary_stage(),
+            {'$merge': {'into': DAILY_COLLECTION, 'on': '_id', 'whenMatched': 'replace', 'whenNotMatched': 'insert'}},
+        ])
+
+    def _local_midnight(self, now: datetime, days_back: int = 0) -> datetime:
+        """Meia-noite local (fuso configurado) de `days_back` dias antes de `now`, em UTC"""
+        zone = ZoneInfo(self.timezone_name)
+        day = now.astimezone(zone).date() - timedelta(days=days_back)
+        return datetime(day.year, day.month, day.day, tzinfo=zone).astimezone(timezone.utc)
+
+    def run_rollups(self, now: Optional[datetime] = None):
+        now = now or datetime.now(timezone.utc)
+        started = time.monotonic()
+        # Reprocessa a hora anterior (eventos atrasados) e os dois últimos dias
+        self.rollup_hourly(now.replace(minute=0, second=0, microsecond=0) - timedelta(hours=1))
+        self.rollup_daily(self._local_midnight(now, days_back=2))
+        logger.debug(f"Resumos de métricas atualizados em {time.monotonic() - started:.2f}s")
+
+    def get_rollups(self, granularity: str = 'hourly', account: Optional[str] = None,
+                    since: Optional[datetime] = None, limit: int = 500) -> List[Dict[str, Any]]:
+        """Lê os resumos (hourly/daily) para o painel"""
+        collection = self.db[DAILY_COLLECTION if granularity == 'daily' else HOURLY_COLLECTION]
+        query: Dict[str, Any] = {}
+        if account:
+            query['account'] = account
+        if since:
+            query['period'] = {'$gte': since}
+        cursor = collection.find(query, {'_id': 0}).sort([('period', ASCENDING)]).limit(limit)
+        return list(cursor)
+
+    # Agendamento ------------------------------------------------------------
+
+    def start(self) -> 'MetricsStore':
+        self.ensure_collections()
+        self._last = self._current_values()
+        self._thread = threading.Thread(target=self._run, name='metrics-store', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=10)
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error(f"Erro ao gravar métricas no encerramento: {e}")
+
+    def _run(self):
+        last_rollup = 0.0
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+                if time.monotonic() - last_rollup >= self.rollup_interval:
+                    self.run_rollups()
+                    last_rollup = time.monotonic()
+            except Exception as e:
+                logger.error(f"Erro ao gravar histórico de métricas: {e}")
+
+
+_store: Optional[MetricsStore] = None
+
+
+def set_metrics_store(store: Optional[MetricsStore]):
+    """Define o histórico de métricas compartilhado (usado pela API)"""
+    global _store
+    _store = store
+
+
+def get_metrics_store() -> Optional[MetricsStore]:
+    return _store
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Detecção de alertas quase duplicados com SimHash e LSH por faixas
+
+Sistemas de monitoramento repetem o mesmo alarme mudando apenas horário,
+contador ou identificador, o que a deduplicação por Message-ID não pega. O
+assunto e o início do corpo são normalizados (datas, horários, UUIDs e contadores
+longos viram marcadores; identificadores como "M01" são mantidos) e reduzidos a
+um SimHash de 64 bits. As impressões recentes de cada
+chat ficam num índice LSH de `max_distance + 1` faixas: duas impressões a até
+`max_distance` bits de distância coincidem em pelo menos uma faixa, então a
+busca só compara os candidatos da mesma faixa (sublinear). Um e-mail a até
+`max_distance` bits de um alerta entregue há menos de `window` segundos é
+agrupado a ele; quando a janela expira, as repetições saem num único resumo.
+Alertas com chave de deduplicação (campos extraídos por alert_templates) são
+comparados pela chave exata, sem SimHash. Só alertas efetivamente entregues
+são registrados, e níveis isentos (críticos, por padrão) nunca são agrupados.
+"""
+
+import re
+import time
+import hashlib
+import logging
+import threading
+from collections import Counter, deque
+from typing import Dict, Any, Iterable, List, Optional
+
+from .markdown import escape_markdown
+
+logger = logging.getLogger('wegnots.near_duplicate')
+
+HASH_BITS = 64
+PREVIEW_CHARS = 500
+DEFAULT_WINDOW = 600
+DEFAULT_MAX_DISTANCE = 3
+
+# Trechos variáveis entre repetições do mesmo alarme; dígitos dentro de
+# identificadores alfanuméricos (M01, E101) e números curtos são mantidos
+_VARIABLE = re.compile(
+    r'\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b'  # UUID
+    r'|\b\d{1,4}[/.-]\d{1,2}[/.-]\d{1,4}\b'                              # datas
+    r'|\b\d{1,2}:\d{2}(?::\d{2})?(?:[.,]\d+)?\b'                          # horários
+    r'|\b(?=[a-f]*\d)[0-9a-f]{8,}\b'                                      # identificadores hexadecimais
+    r'|\b\d{4,}\b'                                                         # contadores longos
+)
+_TOKEN = re.compile(r'\w+')
+
+
+def normalize(subject: str, body: str = '', preview_chars: int = PREVIEW_CHARS) -> List[str]:
+    """Tokens do assunto e do início do corpo, com datas, horários e contadores substituídos por '0'"""
+    text = f"{subject or ''}\n{(body or '')[:preview_chars]}".lower()
+    return _TOKEN.findall(_VARIABLE.sub('0', text))
+
+
+def _feature_hash(feature: str) -> int:
+    return int.from_bytes(hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def fingerprint(subject: str, body: str = '') -> int:
+    return simhash(normalize(subject, body))
+
+
+def simhash(tokens: List[str]) -> int:
+    """SimHash de 64 bits sobre palavras e pares de palavras consecutivas"""
+    features = Counter(tokens)
+    features.update(f"{a} {b}" for a, b in zip(tokens, tokens[1:]))
+    weights = [0] * HASH_BITS
+    for feature, weight in features.items():
+        h = _feature_hash(feature)
+        for bit in range(HASH_BITS):
+            weights[bit] += weight if h >> bit & 1 else -weight
+    return sum(1 << bit for bit, weight in enumerate(weights) if weight > 0)
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count('1')
+
+
+class DuplicateEntry:
+    __slots__ = ('fingerprint', 'key', 'first_seen', 'repeats', 'subject', 'account', 'target', 'email_key')
+
+    def __init__(self, fingerprint: Optional[int], first_seen: float, subject: str = '', account: str = '',
+                 target: Optional[Dict[str, Any]] = None, key: Optional[str] = None,
+                 email_key: Optional[str] = None):
+        self.fingerprint = fingerprint
+        self.email_key = email_key
+        self.key = key
+        self.first_seen = first_seen
+        self.repeats = 0
+        self.subject = subject
+        self.account = account
+        self.target = target or {}
+
+
+class ChatIndex:
+    """Alertas recentes de um chat em ordem de chegada, indexados por faixa ou por chave exata"""
+
+    def __init__(self, bands: int):
+        self.entries: deque = deque()
+        self.buckets: List[Dict[int, List[DuplicateEntry]]] = [{} for _ in range(bands)]
+        self.keys: Dict[str, DuplicateEntry] = {}
+
+
+class NearDuplicateIndex:
+    def __init__(self, window: float = DEFAULT_WINDOW, max_distance: int = DEFAULT_MAX_DISTANCE,
+                 max_entries: int = 1000, exempt_levels: Iterable[str] = ('critical',)):
+        self.window = window
+        self.max_distance = max_distance
+        self.max_entries = max_entries
+        self.exempt_levels = set(exempt_levels)
+        # max_distance + 1 faixas: pelo princípio da casa dos pombos, impressões
+        # com até max_distance bits diferentes têm ao menos uma faixa idêntica
+        self.bands = max_distance + 1
+        self._band_bits = HASH_BITS // self.bands
+        self._chats: Dict[str, ChatIndex] = {}
+        # Entradas expiradas com repetições, aguardando o resumo
+        self._repeated: List[DuplicateEntry] = []
+        self._lock = threading.Lock()
+
+    def _band_keys(self, fingerprint: int) -> List[int]:
+        mask = (1 << self._band_bits) - 1
+        keys = [(fingerprint >> (band * self._band_bits)) & mask for band in range(self.bands - 1)]
+        # A última faixa leva os bits restantes
+        keys.append(fingerprint >> ((self.bands - 1) * self._band_bits))
+        return keys
+
+    def find(self, chat: str, fingerprint: Optional[int] = None, key: Optional[str] = None,
+             level: Optional[str] = None, now: Optional[float] = None) -> Optional[DuplicateEntry]:
+        """
+        Alerta entregue recentemente ao chat do qual este é repetição (contando
+        a repetição), pela chave exata quando informada ou pela impressão SimHash.
+        """
+        if level in self.exempt_levels:
+            return None
+        now = time.time() if now is None else now
+        with self._lock:
+            index = self._chats.get(chat)
+            if index is None:
+                return None
+            self._expire(index, now)
+            if key is not None:
+                entry = index.keys.get(key)
+                if entry is not None:
+                    entry.repeats += 1
+                return entry
+            for band, band_key in enumerate(self._band_keys(fingerprint)):
+                for entry in index.buckets[band].get(band_key, ()):
+                    if hamming(entry.fingerprint, fingerprint) <= self.max_distance:
+                        entry.repeats += 1
+                        return entry
+        return None
+
+    def register(self, chat: str, subject: str, fingerprint: Optional[int] = None, key: Optional[str] = None,
+                 account: str = '', target: Optional[Dict[str, Any]] = None, now: Optional[float] = None,
+                 email_key: Optional[str] = None):
+        """Registra um alerta entregue ao chat como referência para as próximas repetições"""
+        now = time.time() if now is None else now
+        entry = DuplicateEntry(fingerprint, now, subject, account, target, key, email_key)
+        with self._lock:
+            index = self._chats.get(chat)
+            if index is None:
+                index = self._chats[chat] = ChatIndex(self.bands)
+            index.entries.append(entry)
+            if key is not None:
+                index.keys[key] = entry
+            else:
+                for band, band_key in enumerate(self._band_keys(fingerprint)):
+                    index.buckets[band].setdefault(band_key, []).append(entry)
+            if len(index.entries) > self.max_entries:
+                self._remove(index, index.entries.popleft())
+
+    def _remove(self, index: ChatIndex, entry: DuplicateEntry):
+        if entry.key is not None:
+            if index.keys.get(entry.key) is entry:
+                del index.keys[entry.key]
+            return
+        for band, key in enumerate(self._band_keys(entry.fingerprint)):
+            bucket = index.buckets[band].get(key)
+            if bucket is not None:
+                bucket.remove(entry)
+                if not bucket:
+                    del index.buckets[band][key]
+
+    def _expire(self, index: ChatIndex, now: float):
+        while index.entries and now - index.entries[0].first_seen >= self.window:
+            entry = index.entries.popleft()
+            self._remove(index, entry)
+            if entry.repeats:
+                self._repeated.append(entry)
+
+    def expired_repeats(self, now: Optional[float] = None) -> List[DuplicateEntry]:
+        """Alertas cuja janela terminou com repetições agrupadas (para o resumo)"""
+        now = time.time() if now is None else now
+        with self._lock:
+            for chat, index in list(self._chats.items()):
+                self._expire(index, now)
+                if not index.entries:
+                    del self._chats[chat]
+            repeated, self._repeated = self._repeated, []
+        return repeated
+
+
+def format_repeat_summary(entry: DuplicateEntry, window: float = DEFAULT_WINDOW) -> str:
+    return (
+        "🔁 *Alarme repetido*\n\n"
+        f"📧 Conta: {escape_markdown(entry.account)}\n"
+        f"📝 Assunto: {escape_markdown(entry.subject)}\n"
+        f"➕ {entry.repeats} repetição(ões) quase idêntica(s) agrupada(s) em {int(window // 60)} min"
+    )
+
+
+_index: Optional[NearDuplicateIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_near_duplicate_index() -> Optional[NearDuplicateIndex]:
+    """Retorna o índice compartilhado pelo processo (None se desabilitado)"""
+    return _index
+
+
+def set_near_duplicate_index(index: Optional[NearDuplicateIndex]):
+    global _index
+    with _index_lock:
+        _index = index
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Ferramentas de diagnóstico sob demanda para o processo em execução
+
+- Amostragem de CPU: uma thread coleta periodicamente as pilhas de todas as
+  threads (sys._current_frames) durante um tempo limitado e agrega as pilhas
+  mais frequentes, sem instrumentar o código nem reiniciar o monitor.
+- tracemalloc: inicia o rastreamento de alocações e compara snapshots
+  sucessivos, mostrando os pontos de alocação que mais cresceram.
+"""
+
+import sys
+import time
+import logging
+import threading
+import tracemalloc
+from collections import Counter
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger('wegnots.profiling')
+
+MAX_PROFILE_SECONDS = 60
+_profile_lock = threading.Lock()
+
+
+class ProfilerBusyError(Exception):
+    """Já existe uma amostragem de CPU em andamento"""
+    pass
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    filename = code.co_filename.rsplit('/', 1)[-1]
+    return f"{filename}:{code.co_name}:{frame.f_lineno}"
+
+
+def _collapse_stack(frame, max_depth: int = 40) -> str:
+    labels = []
+    while frame is not None and len(labels) < max_depth:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(labels))
+
+
+def sample_cpu(seconds: float = 10.0, interval: float = 0.01, top: int = 25) -> Dict[str, Any]:
+    """
+    Amostra as pilhas de todas as threads por `seconds` segundos (limitado a
+    MAX_PROFILE_SECONDS) e retorna as pilhas e funções mais frequentes.
+    """
+    seconds = max(0.1, min(float(seconds), MAX_PROFILE_SECONDS))
+    if not _profile_lock.acquire(blocking=False):
+        raise ProfilerBusyError("Amostragem de CPU já em andamento")
+    try:
+        own_thread = threading.get_ident()
+        thread_names = {t.ident: t.name for t in threading.enumerate()}
+        stacks: Counter = Counter()
+        leaf_functions: Counter = Counter()
+        samples = 0
+        deadline = time.monotonic() + seconds
+        logger.info(f"Iniciando amostragem de CPU por {seconds:.1f}s")
+        while time.monotonic() < deadline:
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_thread:
+                    continue
+                thread_name = thread_names.get(thread_id, str(thread_id))
+                stacks[f"{thread_name};{_collapse_stack(frame)}"] += 1
+                leaf_functions[_frame_label(frame)] += 1
+            samples += 1
+            time.sleep(interval)
+        return {
+            'seconds': seconds,
+            'samples': samples,
+            'interval': interval,
+            'top_stacks': [{'stack': stack, 'count': count} for stack, count in stacks.most_common(top)],
+            'top_functions': [{'function': name, 'count': count} for name, count in leaf_functions.most_common(top)],
+        }
+    finally:
+        _profile_lock.release()
+
+
+class MemoryTracker:
+    """Controla o tracemalloc e calcula diferenças entre snapshots sucessivos"""
+
+    def __init__(self):
+        self._previous: Optional[tracemalloc.Snapshot] = None
+        self._lock = threading.Lock()
+
+    def start(self, frames: int = 10) -> Dict[str, Any]:
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(frames)
+                logger.info(f"tracemalloc iniciado ({frames} frames)")
+            self._previous = self._take()
+            return self.status()
+
+    def stop(self) -> Dict[str, Any]:
+        with self._lock:
+            if tracemalloc.is_tracing():
+                tracemalloc.stop()
+                logger.info("tracemalloc encerrado")
+            self._previous = None
+            return self.status()
+
+    def status(self) -> Dict[str, Any]:
+        current, peak = tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (0, 0)
+        return {'tracing': tracemalloc.is_tracing(), 'current_bytes': current, 'peak_bytes': peak}
+
+    @staticmethod
+    def _take() -> tracemalloc.Snapshot:
+        # Ignora as alocações do próprio tracemalloc e do importlib
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+            tracemalloc.Filter(False, '<unknown>'),
+        ))
+
+    def snapshot(self, top: int = 20, key_type: str = 'lineno') -> Dict[str, Any]:
+        """Tira um snapshot e compara com o anterior (ou com o início do rastreamento)"""
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                raise RuntimeError("tracemalloc não está ativo")
+            snapshot = self._take()
+            previous, self._previous = self._previous, snapshot
+        if previous is not None:
+            stats = snapshot.compare_to(previous, key_type)
+            entries = [{
+                'location': str(stat.traceback[0]),
+                'size_bytes': stat.size,
+                'size_diff_bytes': stat.size_diff,
+                'count': stat.count,
+                'count_diff': stat.count_diff,
+            } for stat in stats[:top]]
+        else:
+            entries = [{
+                'location': str(stat.traceback[0]),
+                'size_bytes': stat.size,
+                'count': stat.count,
+            } for stat in snapshot.statistics(key_type)[:top]]
+        return {**self.status(), 'compared_to_previous': previous is not None, 'top': entries}
+
+
+_memory_tracker = MemoryTracker()
+
+
+def get_memory_tracker() -> MemoryTracker:
+    return _memory_tracker
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Resolução de destinatários dos alertas a partir da coleção users em memória
+
+Mantém índices hash por e-mail do próprio usuário, por remetente exato das
+notification_rules e por curinga de domínio (*@dominio), além do servidor
+central. Os índices são carregados uma vez e atualizados incrementalmente por
+um change stream do MongoDB (quando o servidor é um replica set) ou, na falta
+dele, por recarga periódica. Cada consulta no caminho crítico é O(1) e não
+faz nenhuma ida ao banco.
+"""
+
+import logging
+import threading
+from email.utils import parseaddr
+from typing import Dict, Any, Iterable, List, Optional, Set
+
+logger = logging.getLogger('wegnots.recipient_resolver')
+
+# Campos usados na resolução (projeção das leituras)
+USER_FIELDS = {
+    'name': 1, 'email': 1, 'chat_id': 1, 'is_active': 1, 'is_central_server': 1,
+    'notification_rules': 1, 'notification_preferences': 1,
+}
+
+
+# Nível de classificação do alerta -> preferência do usuário (notification_preferences)
+PREFERENCE_BY_LEVEL = {
+    'critical': 'receive_criticals',
+    'important': 'receive_moderates',
+    None: 'receive_moderates',  # alertas não classificados
+    'low': 'receive_low',
+}
+
+
+def accepts_level(user: Dict, level: Optional[str]) -> bool:
+    """Indica se o usuário aceita alertas do nível informado (padrão: aceita)"""
+    preferences = user.get('notification_preferences') or {}
+    return bool(preferences.get(PREFERENCE_BY_LEVEL.get(level, 'receive_moderates'), True))
+
+
+def normalize_sender(sender: Optional[str]) -> str:
+    """Extrai e normaliza o endereço de um cabeçalho From ("Nome <a@b.com>" -> "a@b.com")"""
+    return parseaddr(sender or '')[1].strip().lower()
+
+
+def sender_domain_rule(sender: str) -> Optional[str]:
+    """Regra curinga de domínio correspondente ao remetente (a@b.com -> *@b.com)"""
+    return f"*@{sender.rsplit('@', 1)[1]}" if '@' in sender else None
+
+
+class RecipientResolver:
+    def __init__(self, collection, poll_interval: float = 60.0):
+        self.collection = collection
+        self.poll_interval = poll_interval
+        self._users: Dict[Any, Dict] = {}
+        self._by_email: Dict[str, Set[Any]] = {}
+        self._by_rule: Dict[str, Set[Any]] = {}  # remetente exato ou *@dominio
+        self._central_id = None
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.mode = 'idle'
+
+    # Índices ----------------------------------------------------------------
+
+    @staticmethod
+    def _keys(user: Dict):
+        """Chaves de índice de um usuário: (índice, chave)"""
+        email = (user.get('email') or '').lower()
+        if email:
+            yield 'email', email
+        for rule in user.get('notification_rules') or []:
+            sender = (rule.get('sender') or '').lower() if isinstance(rule, dict) else ''
+            if sender:
+                yield 'rule', sender
+
+    def _index_map(self, kind: str) -> Dict[str, Set[Any]]:
+        return self._by_email if kind == 'email' else self._by_rule
+
+    def _index(self, user_id, user: Dict):
+        self._users[user_id] = user
+        for kind, key in self._keys(user):
+            self._index_map(kind).setdefault(key, set()).add(user_id)
+        if user.get('is_central_server'):
+            self._central_id = user_id
+
+    def _unindex(self, user_id):
+        user = self._users.pop(user_id, None)
+        if user is None:
+            return
+        for kind, key in self._keys(user):
+            ids = self._index_map(kind).get(key)
+            if ids is not None:
+                ids.discard(user_id)
+                if not ids:
+                    del self._index_map(kind)[key]
+        if self._central_id == user_id:
+            self._central_id = None
+
+    def load(self, users: Iterable[Dict]):
+        """Reconstrói todos os índices a partir dos documentos informados"""
+        with self._lock:
+            self._users, self._by_email, self._by_rule, self._central_id = {}, {}, {}, None
+            for user in users:
+                self._index(user['_id'], user)
+        logger.debug(f"Índices de destinatários carregados: {len(self._users)} usuários")
+
+    def upsert(self, user: Dict):
+        with self._lock:
+            self._unindex(user['_id'])
+            self._index(user['_id'], user)
+
+    def remove(self, user_id):
+        with self._lock:
+            self._unindex(user_id)
+
+    def refresh(self):
+        """Recarrega a coleção inteira (uma única consulta com projeção)"""
+        self.load(self.collection.find({}, USER_FIELDS))
+
+    def __len__(self):
+        return len(self._users)
+
+    # Consultas --------------------------------------------------------------
+
+    def resolve(self, sender: str, level: Optional[str] = None, all_levels: bool = False) -> List[Dict]:
+        """
+        Usuários ativos que devem receber alertas do remetente, incluindo o
+        servidor central, filtrados pelas preferências para o nível do alerta
+        (com all_levels, sem filtro: o chamador aplica accepts_level depois).
+        """
+        address = normalize_sender(sender)
+        with self._lock:
+            ids = set(self._by_email.get(address, ()))
+            ids.update(self._by_rule.get(address, ()))
+            domain_rule = sender_domain_rule(address)
+            if domain_rule:
+                ids.update(self._by_rule.get(domain_rule, ()))
+            if self._central_id is not None:
+                ids.add(self._central_id)
+            users = (self._users[user_id] for user_id in ids)
+            return [user for user in users
+                    if user.get('is_active', True) and (all_levels or accepts_level(user, level))]
+
+    def get_recipients_for_senders(self, senders: Iterable[str], level: Optional[str] = None,
+                                   all_levels: bool = False) -> Dict[str, List[Dict]]:
+        """Resolve de uma vez todos os remetentes de um ciclo (remetente -> usuários)"""
+        return {sender: self.resolve(sender, level, all_levels) for sender in dict.fromkeys(senders)}
+
+    # Atualização incremental ------------------------------------------------
+
+    def start(self) -> 'RecipientResolver':
+        self.refresh()
+        self._thread = threading.Thread(target=self._run, name='recipient-resolver', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self._watch()
+            except Exception as e:
+                # Sem replica set (ou conexão perdida): recarga periódica
+                if self.mode != 'polling':
+                    logger.warning(f"Change stream indisponível ({e}); atualizando destinatários por polling "
+                                   f"a cada {self.poll_interval:.0f}s")
+                self.mode = 'polling'
+                if self._stop.wait(self.poll_interval):
+                    return
+                try:
+                    self.refresh()
+                except Exception as refresh_error:
+                    logger.error(f"Erro ao recarregar destinatários: {refresh_error}")
+
+    def _watch(self):
+        """Aplica as alterações da coleção users conforme chegam pelo change stream"""
+        with self.collection.watch(full_document='updateLookup', max_await_time_ms=1000) as stream:
+            if self.mode == 'polling':
+                # Voltando de uma falha: alterações podem ter sido perdidas
+                self.refresh()
+            self.mode = 'change_stream'
+            logger.info("Destinatários atualizados via change stream")
+            while not self._stop.is_set() and stream.alive:
+                change = stream.try_next()
+                if change is None:
+                    continue
+                self.apply_change(change)
+
+    def apply_change(self, change: Dict):
+        operation = change.get('operationType')
+        if operation in ('insert', 'update', 'replace') and change.get('fullDocument'):
+            self.upsert(change['fullDocument'])
+        elif operation == 'delete':
+            self.remove(change['documentKey']['_id'])
+        elif operation in ('drop', 'rename', 'invalidate'):
+            self.refresh()
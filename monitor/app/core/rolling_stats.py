@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Contadores em janelas deslizantes (minuto, hora e dia) pré-calculados
+
+Cada contador é um buffer circular de `stats_history_size` posições por
+resolução; registrar um evento custa O(1) (índice do período atual, zerando a
+posição quando o período muda). O status da API e o resumo diário leem os
+totais diretamente, sem consultas de agregação. O estado é gravado
+periodicamente em disco (checkpoint atômico) e restaurado na inicialização.
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+
+from .markdown import escape_markdown
+
+logger = logging.getLogger('wegnots.rolling_stats')
+
+DEFAULT_HISTORY_SIZE = 1000
+DEFAULT_CHECKPOINT_PATH = 'data/rolling_stats.json'
+# Resolução -> duração do período em segundos
+RESOLUTIONS = {'minute': 60, 'hour': 3600, 'day': 86400}
+COUNTERS = ('emails', 'alerts_sent', 'alerts_failed', 'critical', 'important', 'low')
+
+
+def _utc_offset() -> int:
+    """Deslocamento do fuso local, para que os dias virem à meia-noite local"""
+    return int(datetime.now().astimezone().utcoffset().total_seconds())
+
+
+class RollingCounter:
+    __slots__ = ('period', 'size', 'offset', 'counts', 'periods')
+
+    def __init__(self, period: int, size: int, offset: int = 0):
+        self.period = period
+        self.size = size
+        self.offset = offset
+        self.counts = [0] * size
+        self.periods = [-1] * size
+
+    def _index(self, now: float) -> Tuple[int, int]:
+        number = int(now + self.offset) // self.period
+        return number, number % self.size
+
+    def add(self, amount: int = 1, now: Optional[float] = None):
+        number, index = self._index(time.time() if now is None else now)
+        if self.periods[index] != number:
+            self.periods[index] = number
+            self.counts[index] = 0
+        self.counts[index] += amount
+
+    def total(self, periods: int = 1, now: Optional[float] = None) -> int:
+        """Soma dos últimos `periods` períodos, incluindo o atual"""
+        current, _ = self._index(time.time() if now is None else now)
+        first = current - min(periods, self.size) + 1
+        return sum(count for number, count in zip(self.periods, self.counts) if first <= number <= current)
+
+    def series(self, points: int, now: Optional[float] = None) -> List[Tuple[int, int]]:
+        """Últimos `points` períodos como (início do período em epoch UTC, contagem)"""
+        current, _ = self._index(time.time() if now is None else now)
+        points = min(points, self.size)
+        result = []
+        for number in range(current - points + 1, current + 1):
+            index = number % self.size
+            count = self.counts[index] if self.periods[index] == number else 0
+            result.append((number * self.period - self.offset, count))
+        return result
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'periods': list(self.periods), 'counts': list(self.counts)}
+
+    def restore(self, data: Dict[str, Any]):
+        periods, counts = data.get('periods', []), data.get('counts', [])
+        if len(periods) == self.size and len(counts) == self.size:
+            self.periods, self.counts = list(periods), list(counts)
+
+
+class RollingStats:
+    def __init__(self, history_size: int = DEFAULT_HISTORY_SIZE, path: Optional[str] = DEFAULT_CHECKPOINT_PATH,
+                 offset: Optional[int] = None):
+        self.history_size = history_size
+        self.path = path
+        offset = _utc_offset() if offset is None else offset
+        self._counters: Dict[str, Dict[str, RollingCounter]] = {
+            name: {resolution: RollingCounter(period, history_size, offset)
+                   for resolution, period in RESOLUTIONS.items()}
+            for name in COUNTERS
+        }
+        self._accounts: Dict[str, RollingCounter] = {}
+        self._offset = offset
+        self.last_alert: Optional[Dict[str, Any]] = None
+        self.last_summary_date: Optional[str] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # Registro (caminho quente) ---------------------------------------------
+
+    def record(self, name: str, amount: int = 1, now: Optional[float] = None):
+        with self._lock:
+            for counter in self._counters[name].values():
+                counter.add(amount, now)
+
+    def record_email(self, account: str, level: Optional[str] = None, now: Optional[float] = None):
+        with self._lock:
+            for counter in self._counters['emails'].values():
+                counter.add(1, now)
+            if level in self._counters:
+                for counter in self._counters[level].values():
+                    counter.add(1, now)
+            counter = self._accounts.get(account)
+            if counter is None:
+                # Por conta basta a contagem diária (resumo e status)
+                counter = self._accounts[account] = RollingCounter(RESOLUTIONS['day'], 7, self._offset)
+            counter.add(1, now)
+
+    def record_alert(self, account: str, subject: str, delivered: bool, now: Optional[float] = None):
+        self.record('alerts_sent' if delivered else 'alerts_failed', now=now)
+        if delivered:
+            self.last_alert = {'ts': time.time() if now is None else now, 'account': account, 'subject': subject}
+
+    # Leitura ----------------------------------------------------------------
+
+    def total(self, name: str, resolution: str = 'day', periods: int = 1, now: Optional[float] = None) -> int:
+        with self._lock:
+            return self._counters[name][resolution].total(periods, now)
+
+    def series(self, name: str, resolution: str = 'minute', points: int = 60,
+               now: Optional[float] = None) -> List[Tuple[int, int]]:
+        with self._lock:
+            return self._counters[name][resolution].series(points, now)
+
+    def today(self, now: Optional[float] = None) -> Dict[str, Any]:
+        """Totais do dia corrente (fuso local)"""
+        with self._lock:
+            totals = {name: resolutions['day'].total(1, now) for name, resolutions in self._counters.items()}
+            totals['accounts'] = {account: counter.total(1, now) for account, counter in self._accounts.items()
+                                  if counter.total(1, now)}
+        return totals
+
+    # Checkpoint -------------------------------------------------------------
+
+    def save(self):
+        """Grava o estado de forma atômica (arquivo temporário + rename)"""
+        if not self.path:
+            return
+        with self._lock:
+            data = {
+                'history_size': self.history_size,
+                'counters': {name: {resolution: counter.to_dict() for resolution, counter in resolutions.items()}
+                             for name, resolutions in self._counters.items()},
+                'accounts': {account: counter.to_dict() for account, counter in self._accounts.items()},
+                'last_alert': self.last_alert,
+                'last_summary_date': self.last_summary_date,
+            }
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.error(f"Erro ao salvar contadores em {self.path}: {e}")
+
+    def load(self) -> bool:
+        """Restaura o último checkpoint; ignora arquivos ausentes, corrompidos ou de outro tamanho"""
+        if not self.path:
+            return False
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError) as e:
+            logger.warning(f"Checkpoint de contadores ilegível em {self.path}, ignorando: {e}")
+            return False
+        if data.get('history_size') != self.history_size:
+            logger.info("Tamanho do histórico de contadores alterado; checkpoint descartado")
+            return False
+        with self._lock:
+            for name, resolutions in data.get('counters', {}).items():
+                for resolution, counter in resolutions.items():
+                    if name in self._counters and resolution in RESOLUTIONS:
+                        self._counters[name][resolution].restore(counter)
+            for account, counter in data.get('accounts', {}).items():
+                self._accounts[account] = RollingCounter(RESOLUTIONS['day'], 7, self._offset)
+                self._accounts[account].restore(counter)
+            self.last_alert = data.get('last_alert')
+            self.last_summary_date = data.get('last_summary_date')
+        return True
+
+    # Agendamento: checkpoint e resumo diário -------------------------------
+
+    def start(self, checkpoint_interval: float = 60.0, telegram_client=None,
+              summary_time: Optional[str] = None) -> 'RollingStats':
+        """Inicia a thread de checkpoint e, se informado, o envio do resumo diário às HH:MM"""
+        self._thread = threading.Thread(target=self._run, args=(checkpoint_interval, telegram_client, summary_time),
+                                        name='rolling-stats', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=10)
+        self.save()
+
+    def _run(self, checkpoint_interval: float, telegram_client, summary_time: Optional[str]):
+        last_checkpoint = time.monotonic()
+        while not self._stop.wait(min(checkpoint_interval, 30)):
+            try:
+                if telegram_client is not None and summary_time:
+                    self.maybe_send_summary(telegram_client, summary_time)
+                if time.monotonic() - last_checkpoint >= checkpoint_interval:
+                    self.save()
+                    last_checkpoint = time.monotonic()
+            except Exception as e:
+                logger.error(f"Erro na rotina de contadores: {e}")
+
+    def maybe_send_summary(self, telegram_client, summary_time: str, now: Optional[datetime] = None) -> bool:
+        """Envia o resumo do dia uma única vez, após o horário configurado"""
+        now = now or datetime.now()
+        hour, minute = (int(part) for part in summary_time.split(':', 1))
+        today = now.strftime('%Y-%m-%d')
+        if self.last_summary_date == today or (now.hour, now.minute) < (hour, minute):
+            return False
+        if not telegram_client.send_text_message(format_daily_summary(self.today(now.timestamp()), now)):
+            return False
+        self.last_summary_date = today
+        self.save()
+        logger.info(f"Resumo diário de {today} enviado")
+        return True
+
+
+def format_daily_summary(totals: Dict[str, Any], day: datetime) -> str:
+    lines = [
+        "📊 *Resumo Diário do Monitor*",
+        "",
+        f"📅 {day.strftime('%d/%m/%Y')}",
+        f"📨 E-mails processados: {totals['emails']}",
+        f"✅ Alertas enviados: {totals['alerts_sent']}",
+        f"❌ Falhas de envio: {totals['alerts_failed']}",
+        f"🚨 Críticos: {totals['critical']} | ⚠️ Importantes: {totals['important']} | ℹ️ Baixa: {totals['low']}",
+    ]
+    if totals.get('accounts'):
+        lines.append("")
+        lines.append("*Por conta:*")
+        for account, count in sorted(totals['accounts'].items(), key=lambda item: -item[1]):
+            lines.append(f"• {escape_markdown(account)}: {count}")
+    return '\n'.join(lines)
+
+
+_stats: Optional[RollingStats] = None
+_stats_lock = threading.Lock()
+
+
+def get_rolling_stats() -> RollingStats:
+    """Retorna os contadores compartilhados pelo processo"""
+    global _stats
+    with _stats_lock:
+        if _stats is None:
+            _stats = RollingStats(path=None)
+        return _stats
+
+
+def set_rolling_stats(stats: RollingStats):
+    """Substitui os contadores compartilhados (configurados a partir do config.json)"""
+    global _stats
+    with _stats_lock:
+        _stats = stats
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+Execução segura dos padrões de alerta definidos pelos operadores
+
+Quando o pacote google-re2 está instalado, os padrões são executados pelo
+RE2, cujo tempo de execução é linear no tamanho do texto. Sem ele, o módulo
+re é usado apenas com padrões validados: construções que levam a backtracking
+catastrófico (quantificadores aninhados, alternâncias repetidas, referências
+retroativas e lookarounds) são rejeitadas e cada padrão recebe uma pontuação
+de custo. Flags no início do padrão, como (?i), valem só para ele (viram um
+grupo (?i:...)). Em ambos os casos o texto é truncado. Sem o RE2, os padrões
+rodam em um processo auxiliar: se a avaliação de um e-mail estoura o orçamento
+de tempo, o processo é encerrado e o padrão que estava em execução vai para a
+quarentena.
+"""
+
+import re
+import time
+import logging
+import threading
+import multiprocessing
+from typing import Dict, Any, Iterable, List, Tuple
+
+try:
+    import re2
+except ImportError:  # pragma: no cover - depende do ambiente
+    re2 = None
+
+try:
+    from re import _parser as sre_parse, _constants as sre_constants
+except ImportError:  # Python < 3.11
+    import sre_parse
+    import sre_constants
+
+logger = logging.getLogger('wegnots.safe_regex')
+
+ENGINE = 're2' if re2 is not None else 're'
+MAX_PATTERN_LENGTH = 500
+MAX_COST = 1000
+MAX_INPUT_CHARS = 4096
+DEFAULT_BUDGET = 0.05  # segundos por e-mail
+
+_REPEATS = tuple(op for op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT,
+                                getattr(sre_constants, 'POSSESSIVE_REPEAT', None)) if op is not None)
+_UNBOUNDED = sre_constants.MAXREPEAT
+_LEADING_FLAGS = re.compile(r'^\(\?([aiLmsux]+)\)')
+
+
+class PatternCheck:
+    __slots__ = ('pattern', 'ok', 'cost', 'errors')
+
+    def __init__(self, pattern: str, ok: bool, cost: int, errors: List[str]):
+        self.pattern = pattern
+        self.ok = ok
+        self.cost = cost
+        self.errors = errors
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'pattern': self.pattern, 'ok': self.ok, 'cost': self.cost, 'errors': self.errors, 'engine': ENGINE}
+
+
+def _has_variable_branch(items) -> bool:
+    """Indica se há, fora de grupos aninhados, uma alternância com ramos de tamanhos diferentes"""
+    for op, arg in items:
+        if op == sre_constants.SUBPATTERN and _has_variable_branch(arg[-1]):
+            return True
+        if op == sre_constants.BRANCH and len({branch.getwidth() for branch in arg[1]}) > 1:
+            return True
+    return False
+
+
+def _branch_width(items) -> int:
+    """Maior número de ramos de uma alternância em qualquer nível (1 se não houver alternância)"""
+    widest = 1
+    for op, arg in items:
+        if op == sre_constants.BRANCH:
+            widest = max(widest, len(arg[1]), *(_branch_width(branch) for branch in arg[1]))
+        elif op == sre_constants.SUBPATTERN:
+            widest = max(widest, _branch_width(arg[-1]))
+        elif op in _REPEATS:
+            widest = max(widest, _branch_width(arg[2]))
+        elif op == getattr(sre_constants, 'ATOMIC_GROUP', None):
+            widest = max(widest, _branch_width(arg))
+    return widest
+
+
+def scope_leading_flags(pattern: str) -> str:
+    """Converte flags globais no início do padrão ((?i)falha) em flags de grupo ((?i:falha))"""
+    match = _LEADING_FLAGS.match(pattern)
+    if match is None:
+        return pattern
+    return f"(?{match.group(1)}:{pattern[match.end():]})"
+
+
+def _walk(items, repeat_depth: int, errors: List[str]) -> int:
+    """
+    Percorre a árvore do sre_parse somando o custo e registrando construções
+    perigosas. `repeat_depth` conta as repetições envolventes que podem repetir
+    o conteúdo mais de uma vez (ilimitadas ou com máximo > 1).
+    """
+    cost = 0
+    for op, arg in items:
+        cost += 1
+        if op in _REPEATS:
+            low, high, sub = arg
+            unbounded = high == _UNBOUNDED
+            if unbounded and repeat_depth:
+                errors.append("quantificador ilimitado dentro de repetição (ex.: (a+)+, (.*,){15})")
+            if unbounded and _has_variable_branch(sub):
+                errors.append("alternância de tamanho variável dentro de repetição ilimitada (ex.: (a|aa)+)")
+            if re2 is None and high > 1:
+                # No re, ramos do mesmo tamanho que se sobrepõem ((\d\d|1\d)+) também
+                # levam a backtracking exponencial: ramos^repetições caminhos
+                branches = _branch_width(sub)
+                if branches > 1 and (unbounded or branches ** min(high, 64) > MAX_COST):
+                    errors.append("alternância dentro de repetição (ex.: (ab|ac)+); "
+                                  "instale google-re2 para usar esse tipo de padrão")
+            inner = _walk(sub, repeat_depth + (1 if high > 1 else 0), errors)
+            multiplier = 10 if unbounded else max(1, min(high, 10))
+            cost += inner * multiplier
+        elif op == sre_constants.SUBPATTERN:
+            cost += _walk(arg[-1], repeat_depth, errors)
+        elif op == getattr(sre_constants, 'ATOMIC_GROUP', None):
+            cost += _walk(arg, repeat_depth, errors)
+        elif op == sre_constants.BRANCH:
+            cost += sum(_walk(branch, repeat_depth, errors) for branch in arg[1])
+        elif op in (sre_constants.GROUPREF, getattr(sre_constants, 'GROUPREF_EXISTS', None)):
+            errors.append("referências retroativas não são suportadas")
+        elif op in (sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+            errors.append("lookahead/lookbehind não são suportados")
+    return cost
+
+
+def validate_pattern(pattern: str) -> PatternCheck:
+    """Valida um padrão e calcula sua pontuação de custo (quanto maior, mais caro)"""
+    errors: List[str] = []
+    if not isinstance(pattern, str) or not pattern:
+        return PatternCheck(pattern, False, 0, ["padrão vazio"])
+    if len(pattern) > MAX_PATTERN_LENGTH:
+        return PatternCheck(pattern, False, 0, [f"padrão maior que {MAX_PATTERN_LENGTH} caracteres"])
+    try:
+        tree = sre_parse.parse(scope_leading_flags(pattern))
+    except (re.error, OverflowError, RecursionError) as e:
+        return PatternCheck(pattern, False, 0, [f"sintaxe inválida: {e}"])
+    if tree.state.groupdict:
+        errors.append("grupos nomeados não são permitidos")
+    if tree.state.flags & ~sre_constants.SRE_FLAG_UNICODE:
+        errors.append("flags globais só são aceitas no início do padrão (use (?i:...))")
+    cost = _walk(tree, 0, errors)
+    if cost > MAX_COST:
+        errors.append(f"custo {cost} acima do limite {MAX_COST}")
+    if not errors and re2 is not None:
+        try:
+            re2.compile(scope_leading_flags(pattern))
+        except Exception as e:
+            errors.append(f"não suportado pelo RE2: {e}")
+    return PatternCheck(pattern, not errors, cost, list(dict.fromkeys(errors)))
+
+
+def _compile(pattern: str):
+    return (re2 or re).compile(pattern)
+
+
+def compile_validated(pattern: str, prefix: str = ''):
+    """Compila um padrão de operador já validado (None, com log, se rejeitado)"""
+    check = validate_pattern(pattern)
+    if not check.ok:
+        logger.error(f"Padrão rejeitado: {pattern!r} - {'; '.join(check.errors)}")
+        return None
+    return _compile(f"{prefix}{scope_leading_flags(pattern)}")
+
+
+def _pattern_worker(conn, patterns: List[str]):
+    """
+    Processo auxiliar: avalia os padrões um a um sobre cada texto recebido e
+    envia (índice, posições) ao fim de cada padrão, seguido de None
+    """
+    compiled = [_compile(f"(?i){scope_leading_flags(pattern)}") for pattern in patterns]
+    while True:
+        try:
+            text = conn.recv()
+        except (EOFError, OSError):
+            return
+        for index, regex in enumerate(compiled):
+            conn.send((index, [match.start() for match in regex.finditer(text)]))
+        conn.send(None)
+
+
+class SafePatternSet:
+    """
+    Conjunto de padrões de operadores, cada um com um rótulo (ex.: o nível do
+    alerta) devolvido nas ocorrências. Com o RE2 os padrões são combinados em
+    uma única alternância com grupos nomeados; sem ele, são avaliados em um
+    processo auxiliar que é encerrado quando o orçamento de tempo estoura.
+    """
+
+    def __init__(self, patterns: Iterable[Tuple[str, Any]], budget: float = DEFAULT_BUDGET,
+                 max_input: int = MAX_INPUT_CHARS):
+        self.budget = budget
+        self.max_input = max_input
+        self.rejected: List[PatternCheck] = []
+        self.quarantined: List[str] = []
+        self._entries: Dict[str, Tuple[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._worker = None
+        self._conn = None
+        for pattern, label in patterns:
+            check = validate_pattern(pattern)
+            if not check.ok:
+                logger.error(f"Padrão de alerta rejeitado: {pattern!r} - {'; '.join(check.errors)}")
+                self.rejected.append(check)
+                continue
+            self._entries[f"p{len(self._entries)}"] = (pattern, label)
+        self._regex = self._build() if re2 is not None else None
+
+    def _build(self):
+        if not self._entries:
+            return None
+        alternatives = '|'.join(f"(?P<{group}>{scope_leading_flags(pattern)})" for group, (pattern, _label) in self._entries.items())
+        return _compile(f"(?i){alternatives}")
+
+    def __len__(self):
+        return len(self._entries)
+
+    def matches(self, text: str) -> List[Tuple[str, Any]]:
+        """Retorna (padrão, rótulo) de cada ocorrência no texto truncado, na ordem do texto"""
+        if not self._entries or not text:
+            return []
+        text = text[:self.max_input]
+        if self._regex is not None:
+            return self._match_combined(text)
+        with self._lock:
+            return self._match_in_worker(text)
+
+    def _match_combined(self, text: str) -> List[Tuple[str, Any]]:
+        found = []
+        for match in self._regex.finditer(text):
+            for group, value in match.groupdict().items():
+                if value is not None:
+                    found.append(self._entries[group])
+                    break
+        return found
+
+    def _match_in_worker(self, text: str) -> List[Tuple[str, Any]]:
+        groups = list(self._entries)
+        conn = self._ensure_worker()
+        found: List[Tuple[int, int]] = []
+        done = 0
+        started = time.monotonic()
+        try:
+            conn.send(text)
+            while True:
+                remaining = self.budget - (time.monotonic() - started)
+                if remaining <= 0 or not conn.poll(remaining):
+                    break
+                message = conn.recv()
+                if message is None:
+                    return [self._entries[groups[index]] for _start, index in sorted(found)]
+                index, starts = message
+                found.extend((start, index) for start in starts)
+                done += 1
+        except (EOFError, OSError) as e:
+            logger.error(f"Processo de avaliação dos padrões de alerta falhou: {e}")
+            self._stop_worker()
+            return [self._entries[groups[index]] for _start, index in sorted(found)]
+
+        # Orçamento estourado: o padrão em execução no processo auxiliar é o culpado
+        pattern, _label = self._entries[groups[done]]
+        logger.error(f"Padrão de alerta em quarentena por exceder o orçamento de tempo "
+                     f"({self.budget * 1000:.0f}ms): {pattern!r}")
+        self._stop_worker()
+        result = [self._entries[groups[index]] for _start, index in sorted(found)]
+        self.quarantined.append(pattern)
+        del self._entries[groups[done]]
+        return result
+
+    def _ensure_worker(self):
+        """Inicia o processo auxiliar com os padrões atuais (de novo após uma quarentena)"""
+        if self._worker is None or not self._worker.is_alive():
+            self._stop_worker()
+            parent_conn, child_conn = multiprocessing.Pipe()
+            patterns = [pattern for pattern, _label in self._entries.values()]
+            self._worker = multiprocessing.Process(target=_pattern_worker, args=(child_conn, patterns),
+                                                   name='wegnots-patterns', daemon=True)
+            self._worker.start()
+            child_conn.close()
+            self._conn = parent_conn
+        return self._conn
+
+    def _stop_worker(self):
+        if self._worker is not None:
+            self._worker.terminate()
+            self._worker.join(1)
+            self._worker = None
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def close(self):
+        """Encerra o processo auxiliar, se houver"""
+        with self._lock:
+            self._stop_worker()
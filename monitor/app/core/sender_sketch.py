@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Análise de remetentes em memória fixa: Count-Min Sketch e HyperLogLog
+
+Para cada conta monitorada, os remetentes do dia alimentam um Count-Min Sketch
+(contagem aproximada por remetente, nunca subestimada) com uma lista dos K
+maiores, e um HyperLogLog (quantidade aproximada de remetentes distintos). A
+memória por conta é constante (~36 KB), independentemente do volume. Na virada
+do dia o resumo de cada conta é gravado no MongoDB (coleção sender_stats) e os
+sketches são reiniciados. O documento do dia guarda também o estado dos
+sketches, restaurado na inicialização para que um reinício no meio do dia
+continue a contagem em vez de sobrescrever o resumo parcial.
+"""
+
+import math
+import heapq
+import hashlib
+import logging
+import threading
+from array import array
+from datetime import date, datetime
+from typing import Dict, Any, List, Optional, Tuple, Callable
+
+from .index_manager import IndexManager
+
+logger = logging.getLogger('wegnots.sender_sketch')
+
+COLLECTION = 'sender_stats'
+CMS_WIDTH = 2048
+CMS_DEPTH = 4
+HLL_PRECISION = 12
+TOP_K = 20
+
+_MASK64 = (1 << 64) - 1
+
+
+def _hash128(value: str) -> Tuple[int, int]:
+    digest = hashlib.blake2b(value.encode('utf-8'), digest_size=16).digest()
+    return int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little')
+
+
+class CountMinSketch:
+    """Contagem aproximada: erro <= 2N/width com probabilidade 1 - 2^-depth"""
+
+    def __init__(self, width: int = CMS_WIDTH, depth: int = CMS_DEPTH):
+        self.width = width
+        self.depth = depth
+        self.total = 0
+        self._rows = [array('I', [0]) * width for _ in range(depth)]
+
+    def _indexes(self, key: str):
+        # Hashing duplo (Kirsch-Mitzenmacher): depth índices a partir de um único hash
+        h1, h2 = _hash128(key)
+        return [(h1 + row * h2) % self.width for row in range(self.depth)]
+
+    def add(self, key: str, amount: int = 1) -> int:
+        """Incrementa e retorna a estimativa atualizada (atualização conservadora)"""
+        indexes = self._indexes(key)
+        estimate = min(row[index] for row, index in zip(self._rows, indexes)) + amount
+        for row, index in zip(self._rows, indexes):
+            if row[index] < estimate:
+                row[index] = estimate
+        self.total += amount
+        return estimate
+
+    def estimate(self, key: str) -> int:
+        return min(row[index] for row, index in zip(self._rows, self._indexes(key)))
+
+    def to_bytes(self) -> bytes:
+        return b''.join(row.tobytes() for row in self._rows)
+
+    def load_bytes(self, data: bytes, total: int):
+        rows = array('I')
+        rows.frombytes(data)
+        if len(rows) != self.width * self.depth:
+            raise ValueError(f"estado do Count-Min com {len(rows)} contadores, esperado {self.width * self.depth}")
+        self._rows = [rows[row * self.width:(row + 1) * self.width] for row in range(self.depth)]
+        self.total = total
+
+
+class HyperLogLog:
+    """Cardinalidade aproximada com 2^precision registradores (erro padrão ~1,04/sqrt(m))"""
+
+    def __init__(self, precision: int = HLL_PRECISION):
+        self.precision = precision
+        self.m = 1 << precision
+        self.registers = bytearray(self.m)
+
+    def add(self, value: str):
+        h, _ = _hash128(value)
+        index = h >> (64 - self.precision)
+        remaining = (h << self.precision) & _MASK64
+        rank = min(64 - self.precision, 64 - remaining.bit_length()) + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def count(self) -> int:
+        alpha = 0.7213 / (1 + 1.079 / self.m)
+        estimate = alpha * self.m * self.m / sum(2.0 ** -register for register in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * self.m and zeros:
+            # Correção para cardinalidades pequenas (linear counting)
+            estimate = self.m * math.log(self.m / zeros)
+        return int(round(estimate))
+
+
+class TopK:
+    """Os K maiores remetentes segundo o sketch (heap com entradas obsoletas descartadas sob demanda)"""
+
+    def __init__(self, k: int = TOP_K):
+        self.k = k
+        self.counts: Dict[str, int] = {}
+        self._heap: List[Tuple[int, str]] = []
+
+    def offer(self, key: str, estimate: int):
+        if key in self.counts or len(self.counts) < self.k:
+            self.counts[key] = estimate
+            heapq.heappush(self._heap, (estimate, key))
+        else:
+            smallest, smallest_key = self._min()
+            if estimate <= smallest:
+                return
+            del self.counts[smallest_key]
+            self.counts[key] = estimate
+            heapq.heappush(self._heap, (estimate, key))
+        if len(self._heap) > 4 * self.k:
+            self._heap = [(count, key) for key, count in self.counts.items()]
+            heapq.heapify(self._heap)
+
+    def _min(self) -> Tuple[int, str]:
+        while True:
+            count, key = self._heap[0]
+            if self.counts.get(key) == count:
+                return count, key
+            heapq.heappop(self._heap)
+
+    def items(self) -> List[Tuple[str, int]]:
+        return sorted(self.counts.items(), key=lambda item: (-item[1], item[0]))
+
+
+class AccountSketch:
+    __slots__ = ('cms', 'hll', 'top')
+
+    def __init__(self, top_k: int = TOP_K):
+        self.cms = CountMinSketch()
+        self.hll = HyperLogLog()
+        self.top = TopK(top_k)
+
+    def add(self, sender: str):
+        self.top.offer(sender, self.cms.add(sender))
+        self.hll.add(sender)
+
+    def summary(self, top: int = TOP_K) -> Dict[str, Any]:
+        return {
+            'total': self.cms.total,
+            'distinct': self.hll.count(),
+            'top': [{'sender': sender, 'count': count} for sender, count in self.top.items()[:top]],
+        }
+
+    def to_state(self) -> Dict[str, Any]:
+        """Estado completo dos sketches, para retomar a contagem após um reinício"""
+        return {'cms': self.cms.to_bytes(), 'hll': bytes(self.hll.registers),
+                'top': [[sender, count] for sender, count in self.top.items()]}
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any], total: int, top_k: int = TOP_K) -> 'AccountSketch':
+        sketch = cls(top_k)
+        sketch.cms.load_bytes(bytes(state['cms']), total)
+        if len(state['hll']) != sketch.hll.m:
+            raise ValueError(f"estado do HyperLogLog com {len(state['hll'])} registradores")
+        sketch.hll.registers = bytearray(state['hll'])
+        for sender, count in state.get('top', []):
+            sketch.top.offer(sender, count)
+        return sketch
+
+
+class SenderAnalytics:
+    def __init__(self, persist: Optional[Callable[[date, Dict[str, Dict[str, Any]]], None]] = None,
+                 top_k: int = TOP_K):
+        self.persist = persist
+        self.top_k = top_k
+        self.day = date.today()
+        self._accounts: Dict[str, AccountSketch] = {}
+        self._lock = threading.Lock()
+
+    def add(self, account: str, sender: str, today: Optional[date] = None):
+        """Registra um remetente (já normalizado) na conta; custo O(depth)"""
+        if not sender:
+            return
+        self._roll_day(today or date.today())
+        with self._lock:
+            sketch = self._accounts.get(account)
+            if sketch is None:
+                sketch = self._accounts[account] = AccountSketch(self.top_k)
+            sketch.add(sender)
+
+    def _roll_day(self, today: date):
+        if today == self.day:
+            return
+        with self._lock:
+            if today == self.day:
+                return
+            previous_day, accounts = self.day, self._accounts
+            self.day, self._accounts = today, {}
+        self._persist(previous_day, accounts)
+
+    def _persist(self, day: date, accounts: Dict[str, AccountSketch]):
+        if self.persist is None or not accounts:
+            return
+        try:
+            self.persist(day, {account: {**sketch.summary(self.top_k), 'state': sketch.to_state()}
+                               for account, sketch in accounts.items()})
+            logger.info(f"Análise de remetentes de {day.isoformat()} gravada ({len(accounts)} conta(s))")
+        except Exception as e:
+            logger.error(f"Erro ao gravar análise de remetentes de {day.isoformat()}: {e}")
+
+    def flush(self):
+        """Grava o resumo parcial do dia corrente (encerramento do processo)"""
+        with self._lock:
+            accounts = dict(self._accounts)
+        self._persist(self.day, accounts)
+
+    def restore(self, summaries: Dict[str, Dict[str, Any]]) -> int:
+        """Retoma os sketches do dia corrente a partir dos resumos gravados (inicialização)"""
+        restored = 0
+        with self._lock:
+            for account, summary in summaries.items():
+                try:
+                    self._accounts[account] = AccountSketch.from_state(summary['state'], summary['total'], self.top_k)
+                    restored += 1
+                except (KeyError, TypeError, ValueError) as e:
+                    logger.warning(f"Estado da análise de remetentes de {account} ignorado: {e}")
+        return restored
+
+    def summary(self, account: Optional[str] = None, top: int = 10) -> Dict[str, Dict[str, Any]]:
+        """Resumo do dia por conta: total, remetentes distintos e os maiores remetentes"""
+        self._roll_day(date.today())
+        with self._lock:
+            return {name: sketch.summary(top) for name, sketch in self._accounts.items()
+                    if account is None or name == account}
+
+
+def mongo_persister(db) -> Callable[[date, Dict[str, Dict[str, Any]]], None]:
+    """Grava um documento por conta e dia na coleção sender_stats (idempotente por _id)"""
+    IndexManager(db).ensure([COLLECTION])
+    collection = db[COLLECTION]
+
+    def persist(day: date, summaries: Dict[str, Dict[str, Any]]):
+        day_start = datetime(day.year, day.month, day.day)
+        for account, summary in summaries.items():
+            collection.replace_one({'_id': f"{account}:{day.isoformat()}"},
+                                   {'account': account, 'day': day_start, **summary}, upsert=True)
+
+    return persist
+
+
+def mongo_loader(db) -> Callable[[date], Dict[str, Dict[str, Any]]]:
+    """Lê os resumos (com o estado dos sketches) gravados para um dia em sender_stats"""
+    collection = db[COLLECTION]
+
+    def load(day: date) -> Dict[str, Dict[str, Any]]:
+        day_start = datetime(day.year, day.month, day.day)
+        return {document['account']: document for document in collection.find({'day': day_start})}
+
+    return load
+
+
+_analytics: Optional[SenderAnalytics] = None
+_analytics_lock = threading.Lock()
+
+
+def get_sender_analytics() -> SenderAnalytics:
+    """Retorna a análise de remetentes compartilhada pelo processo"""
+    global _analytics
+    with _analytics_lock:
+        if _analytics is None:
+            _analytics = SenderAnalytics()
+        return _analytics
+
+
+def set_sender_analytics(analytics: SenderAnalytics):
+    global _analytics
+    with _analytics_lock:
+        _analytics = analytics
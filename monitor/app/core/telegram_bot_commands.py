@@ -5,27 +5,123 @@ Módulo para gerenciar os comandos do bot Telegram do WegNots
 
 import requests
 import logging
-from typing import Dict, Any, Optional
+import threading
+from datetime import timezone
+from typing import Dict, Any, Iterable, Optional, Set
+from .bot_registry import BotRegistry, get_bot_registry
+from .metrics import get_metrics
+from .alert_history import get_alert_history
+from .sender_sketch import get_sender_analytics
+from .markdown import escape_markdown as _escape
 
 logger = logging.getLogger('wegnots.telegram.commands')
 
+# Emojis do estado de conexão exibidos no /status
+CONNECTION_ICONS = {'connected': '🟢', 'error': '🔴', 'disconnected': '⚪'}
+# Alertas não enviados de propósito (os demais usam delivered: ✅/❌)
+HISTORY_ICONS = {'suppressed': '🔇', 'coalesced': '🔁'}
+
+
+def _format_age(seconds: Optional[float]) -> str:
+    if seconds is None:
+        return 'nunca'
+    if seconds < 60:
+        return f"{int(seconds)}s"
+    if seconds < 3600:
+        return f"{int(seconds // 60)}min"
+    return f"{seconds / 3600:.1f}h"
+
+NO_ACCESS_MESSAGE = "⛔ Este chat não tem acesso às contas monitoradas."
+
+
+class CommandScope:
+    """
+    Contas que cada chat pode consultar em /status e /remetentes: os chats
+    autorizados (chat central/padrão) veem todas; os demais, só as contas
+    cujos alertas são roteados para eles.
+    """
+
+    def __init__(self, admin_chats: Iterable[Any] = (), account_chats: Optional[Dict[str, Any]] = None):
+        self.admin_chats = {str(chat) for chat in admin_chats if chat}
+        self.accounts_by_chat: Dict[str, Set[str]] = {}
+        for account, chat in (account_chats or {}).items():
+            if chat:
+                self.accounts_by_chat.setdefault(str(chat), set()).add(account)
+
+    def visible_accounts(self, chat_id: str) -> Optional[Set[str]]:
+        """Contas visíveis para o chat (None = todas)"""
+        if str(chat_id) in self.admin_chats:
+            return None
+        return self.accounts_by_chat.get(str(chat_id), set())
+
+    @classmethod
+    def from_config(cls, telegram_config: Dict[str, Any], imap_configs: Dict[str, Dict[str, Any]],
+                    admin_chats: Iterable[Any] = ()) -> 'CommandScope':
+        """Escopo a partir do config.ini: chat padrão + autorizados e o chat de cada conta"""
+        return cls([telegram_config.get('chat_id'), *admin_chats],
+                   {config['username']: config.get('telegram_chat_id') or telegram_config.get('chat_id')
+                    for config in imap_configs.values() if config.get('username')})
+
+
+_scope: Optional[CommandScope] = None
+_scope_lock = threading.Lock()
+
+
+def get_command_scope() -> Optional[CommandScope]:
+    """Retorna o escopo de contas por chat do processo (None: nenhum chat tem acesso)"""
+    return _scope
+
+
+def set_command_scope(scope: Optional[CommandScope]):
+    global _scope
+    with _scope_lock:
+        _scope = scope
+
+
+def _scope_status(status_info: Dict[str, Any], accounts: Set[str]) -> Dict[str, Any]:
+    """Restringe o /status às contas visíveis, recalculando os totais"""
+    visible = {name: info for name, info in status_info.get('accounts', {}).items() if name in accounts}
+    return {
+        **status_info,
+        'accounts': visible,
+        'active_servers': sum(1 for info in visible.values() if info.get('connection_state') == 'connected'),
+        'emails_today': sum(info.get('emails_today', 0) for info in visible.values()),
+        'notifications_sent': sum(info.get('alerts_today', 0) for info in visible.values()),
+    }
+
+# Conjunto de comandos registrado via setMyCommands
+BOT_COMMANDS = [
+    {"command": "start", "description": "Iniciar o monitoramento de e-mails"},
+    {"command": "status", "description": "Verificar status do sistema"},
+    {"command": "historico", "description": "Últimos alertas recebidos (opcional: termo de busca)"},
+    {"command": "remetentes", "description": "Maiores remetentes e remetentes distintos do dia por conta"},
+    {"command": "help", "description": "Exibir ajuda"}
+]
+
 class TelegramCommands:
-    def __init__(self, token: str):
+    def __init__(self, token: str, registry: Optional[BotRegistry] = None, scope: Optional[CommandScope] = None):
         self.token = token
         self.base_url = f"https://api.telegram.org/bot{token}"
+        self.registry = registry or get_bot_registry()
+        self.scope = scope
+
+    def visible_accounts(self, chat_id: str) -> Optional[Set[str]]:
+        """Contas que o chat pode consultar (None = todas; sem escopo configurado, nenhuma)"""
+        scope = self.scope or get_command_scope()
+        return scope.visible_accounts(chat_id) if scope is not None else set()
         
-    def set_bot_commands(self) -> bool:
-        """Configura os comandos disponíveis no bot"""
+    def set_bot_commands(self, force: bool = False) -> bool:
+        """Configura os comandos disponíveis no bot (ignorado se a mesma versão já foi registrada)"""
+        if not force and self.registry.commands_up_to_date(self.token, BOT_COMMANDS):
+            logger.debug(f"Comandos do bot {self.token[:8]}... já registrados, ignorando setMyCommands")
+            return True
+            
         url = f"{self.base_url}/setMyCommands"
-        commands = [
-            {"command": "start", "description": "Iniciar o monitoramento de e-mails"},
-            {"command": "status", "description": "Verificar status do sistema"},
-            {"command": "help", "description": "Exibir ajuda"}
-        ]
         
         try:
-            response = requests.post(url, json={"commands": commands})
+            response = requests.post(url, json={"commands": BOT_COMMANDS}, timeout=10)
             if response.status_code == 200:
+                self.registry.mark_commands(self.token, BOT_COMMANDS)
                 logger.info("Comandos do bot configurados com sucesso")
                 return True
             else:
@@ -35,11 +131,14 @@ class TelegramCommands:
             logger.error(f"Exceção ao configurar comandos do bot: {e}")
             return False
     
-    def set_webhook(self, webhook_url: str) -> bool:
-        """Configura um webhook para o bot"""
+    def set_webhook(self, webhook_url: str, secret_token: Optional[str] = None) -> bool:
+        """Configura um webhook para o bot (com secret_token opcional validado no recebimento)"""
         url = f"{self.base_url}/setWebhook"
+        payload = {"url": webhook_url, "allowed_updates": ["message"]}
+        if secret_token:
+            payload["secret_token"] = secret_token
         try:
-            response = requests.post(url, json={"url": webhook_url})
+            response = requests.post(url, json=payload, timeout=10)
             if response.status_code == 200:
                 logger.info(f"Webhook configurado com sucesso: {webhook_url}")
                 return True
@@ -81,16 +180,33 @@ class TelegramCommands:
             return False
     
     def handle_status_command(self, chat_id: str, status_info: Dict[str, Any]) -> bool:
-        """Lida com o comando /status enviando informações sobre o status do sistema"""
+        """Lida com o comando /status enviando informações sobre as contas visíveis para o chat"""
         url = f"{self.base_url}/sendMessage"
+        visible = self.visible_accounts(chat_id)
+        if visible is not None:
+            status_info = _scope_status(status_info, visible)
         
-        message = (
+        accounts = status_info.get('accounts', {})
+        account_lines = []
+        for account, info in sorted(accounts.items()):
+            latency = info.get('latency_p95')
+            account_lines.append(
+                f"{CONNECTION_ICONS.get(info.get('connection_state'), '⚪')} {_escape(account)}\n"
+                f"    último poll: {_format_age(info.get('last_poll_age'))} | "
+                f"alertas hoje: {info.get('alerts_today', 0)} | "
+                f"p95: {f'{latency:.1f}s' if latency is not None else '-'}"
+            )
+        healthy = bool(accounts) and all(info.get('connection_state') == 'connected' for info in accounts.values())
+        
+        message = NO_ACCESS_MESSAGE if visible is not None and not visible else (
             "📊 *Status do Sistema*\n\n"
-            f"🖥️ Servidores ativos: {status_info.get('active_servers', 0)}\n"
+            f"🖥️ Servidores ativos: {status_info.get('active_servers', 0)}/{len(accounts)}\n"
             f"📧 E-mails monitorados hoje: {status_info.get('emails_today', 0)}\n"
             f"🔔 Notificações enviadas: {status_info.get('notifications_sent', 0)}\n"
-            f"⏰ Em execução há: {status_info.get('uptime', '0')} minutos\n\n"
-            "✅ Sistema operando normalmente"
+            f"📬 Fila de envio: {status_info.get('queue_depth', 0)}\n"
+            f"⏰ Em execução há: {int(status_info.get('uptime', 0) // 60)} minutos\n\n"
+            + ("\n".join(account_lines) + "\n\n" if account_lines else "")
+            + ("✅ Sistema operando normalmente" if healthy else "⚠️ Há contas com problemas de conexão")
         )
         
         try:
@@ -110,6 +226,87 @@ class TelegramCommands:
             logger.error(f"Exceção ao enviar mensagem de status: {e}")
             return False
     
+    def handle_history_command(self, chat_id: str, query: str = '') -> bool:
+        """Lida com o comando /historico listando os últimos alertas entregues neste chat"""
+        url = f"{self.base_url}/sendMessage"
+        history = get_alert_history()
+        
+        if history is None:
+            message = "📭 O histórico de alertas não está disponível no momento."
+        else:
+            try:
+                alerts = history.search(chat_id=chat_id, text=query or None, limit=10)
+            except Exception as e:
+                logger.error(f"Erro ao consultar histórico de alertas: {e}")
+                alerts = None
+            if alerts is None:
+                message = "⚠️ Não foi possível consultar o histórico agora."
+            elif not alerts:
+                message = "📭 Nenhum alerta encontrado."
+            else:
+                lines = [f"🗂 *Últimos alertas{' para ' + _escape(query) if query else ''}*\n"]
+                for alert in alerts:
+                    ts = alert['ts'].replace(tzinfo=alert['ts'].tzinfo or timezone.utc).astimezone()
+                    icon = HISTORY_ICONS.get(alert.get('outcome'), '✅' if alert.get('delivered') else '❌')
+                    lines.append(f"{icon} {ts.strftime('%d/%m %H:%M')} - {_escape((alert.get('subject') or '(sem assunto)')[:80])}\n"
+                                 f"    _{_escape(alert.get('sender') or '')}_")
+                message = "\n".join(lines)
+        
+        try:
+            response = requests.post(url, json={
+                "chat_id": chat_id,
+                "text": message,
+                "parse_mode": "Markdown"
+            }, timeout=10)
+            
+            if response.status_code == 200:
+                logger.info(f"Histórico de alertas enviado para chat_id {chat_id}")
+                return True
+            else:
+                logger.error(f"Erro ao enviar histórico: {response.status_code} - {response.text}")
+                return False
+        except Exception as e:
+            logger.error(f"Exceção ao enviar histórico: {e}")
+            return False
+    
+    def handle_senders_command(self, chat_id: str, account: str = '') -> bool:
+        """Lida com o comando /remetentes com os maiores remetentes do dia (valores aproximados)"""
+        url = f"{self.base_url}/sendMessage"
+        visible = self.visible_accounts(chat_id)
+        denied = visible is not None and (not visible or (account and account not in visible))
+        summaries = {} if denied else get_sender_analytics().summary(account or None, top=5)
+        if visible is not None:
+            summaries = {name: summary for name, summary in summaries.items() if name in visible}
+        
+        if denied:
+            message = NO_ACCESS_MESSAGE
+        elif not summaries:
+            message = "📭 Nenhum e-mail recebido hoje" + (f" em {_escape(account)}." if account else ".")
+        else:
+            lines = ["📈 *Remetentes do dia*\n"]
+            for name, summary in sorted(summaries.items(), key=lambda item: -item[1]['total']):
+                lines.append(f"📧 {_escape(name)}: {summary['total']} e-mail(s), ~{summary['distinct']} remetente(s) distinto(s)")
+                for entry in summary['top']:
+                    lines.append(f"    • {_escape(entry['sender'])}: ~{entry['count']}")
+            message = "\n".join(lines)
+        
+        try:
+            response = requests.post(url, json={
+                "chat_id": chat_id,
+                "text": message,
+                "parse_mode": "Markdown"
+            }, timeout=10)
+            
+            if response.status_code == 200:
+                logger.info(f"Análise de remetentes enviada para chat_id {chat_id}")
+                return True
+            else:
+                logger.error(f"Erro ao enviar análise de remetentes: {response.status_code} - {response.text}")
+                return False
+        except Exception as e:
+            logger.error(f"Exceção ao enviar análise de remetentes: {e}")
+            return False
+    
     def handle_help_command(self, chat_id: str) -> bool:
         """Lida com o comando /help enviando informações de ajuda"""
         url = f"{self.base_url}/sendMessage"
@@ -120,6 +317,8 @@ class TelegramCommands:
             "*Comandos disponíveis:*\n"
             "/start - Iniciar o monitoramento\n"
             "/status - Verificar o status do sistema\n"
+            "/historico [termo] - Últimos alertas recebidos neste chat\n"
+            "/remetentes [conta] - Maiores remetentes do dia por conta\n"
             "/help - Exibir esta mensagem de ajuda\n\n"
             "✉️ Para suporte adicional, contate o administrador do sistema."
         )
@@ -157,14 +356,11 @@ class TelegramCommands:
         if text == '/start':
             return self.handle_start_command(chat_id)
         elif text == '/status':
-            # Informações de status simuladas - em uma implementação real, estas informações viriam do sistema
-            status_info = {
-                'active_servers': 2,
-                'emails_today': 24,
-                'notifications_sent': 18,
-                'uptime': '480'
-            }
-            return self.handle_status_command(chat_id, status_info)
+            return self.handle_status_command(chat_id, get_metrics().status_snapshot())
+        elif text == '/historico' or text.startswith('/historico '):
+            return self.handle_history_command(chat_id, text[len('/historico'):].strip())
+        elif text == '/remetentes' or text.startswith('/remetentes '):
+            return self.handle_senders_command(chat_id, text[len('/remetentes'):].strip())
         elif text == '/help':
             return self.handle_help_command(chat_id)
             
@@ -1,17 +1,24 @@
 import requests
 import logging
 import json
+import time
 from datetime import datetime
 from .telegram_bot_commands import TelegramCommands
+from .bot_registry import get_bot_registry
+from .metrics import get_metrics, bot_label
+from .tracing import SEND_ATTEMPT, DELIVERED
 
 logger = logging.getLogger('wegnots.telegram_client')
+metrics = get_metrics()
 
 class TelegramClient:
-    def __init__(self, token, chat_id):
+    def __init__(self, token, chat_id, registry=None):
         self.default_token = token
         self.default_chat_id = chat_id
         self.base_url = f"https://api.telegram.org/bot{token}"
-        self.commands = TelegramCommands(token)
+        # Registro persistente de metadados (getMe, comandos, chats descobertos)
+        self.registry = registry or get_bot_registry()
+        self.commands = TelegramCommands(token, self.registry)
         
         # Mapping for specific token -> chat_id relationships
         self.token_chat_map = {
@@ -32,40 +39,74 @@ class TelegramClient:
         except Exception as e:
             logger.error(f"Erro ao configurar comandos do bot: {e}")
         
-    def send_text_message(self, message, parse_mode='Markdown', token=None, chat_id=None):
-        """Envia mensagem de texto para o Telegram usando token e chat_id específicos ou os padrões"""
+    def send_text_message(self, message, parse_mode='Markdown', token=None, chat_id=None, trace=None,
+                          disable_notification=False, reply_to_message_id=None):
+        """
+        Envia mensagem de texto para o Telegram usando token e chat_id específicos ou os padrões.
+        Se um AlertTrace for informado, registra cada tentativa, a entrega e o message_id enviado.
+        """
         # Usa os valores padrão se não for fornecido
         token = token or self.default_token
         
         # Se chat_id não for fornecido ou estiver vazio, verifica se há um mapeamento por token
         if not chat_id and token in self.token_chat_map:
             chat_id = self.token_chat_map[token]
-            logger.info(f"Usando chat_id {chat_id} mapeado para o token {token[:8]}...")
+            logger.debug(f"Usando chat_id {chat_id} mapeado para o token {token[:8]}...")
         else:
             chat_id = chat_id or self.default_chat_id
         
         # Constrói a URL com o token correto
         url = f"https://api.telegram.org/bot{token}/sendMessage"
+        if trace is not None:
+            trace.destination = f"{bot_label(token)}:{chat_id}"
         
         # Faz até 5 tentativas em caso de falha
         max_retries = 5
+        bot = bot_label(token)
         for attempt in range(1, max_retries + 1):
+            if attempt > 1:
+                metrics.send_retries.inc(bot=bot)
             try:
                 logger.debug(f"Tentativa {attempt}/{max_retries} de envio para {chat_id} usando token: {token[:8]}...")
                 
-                response = requests.post(url, json={
+                send_started = time.monotonic()
+                if trace is not None:
+                    trace.mark(SEND_ATTEMPT)
+                payload = {
                     'chat_id': chat_id,
                     'text': message,
                     'parse_mode': parse_mode
-                }, timeout=10)  # Adicionando timeout de 10 segundos
+                }
+                if disable_notification:
+                    payload['disable_notification'] = True
+                if reply_to_message_id:
+                    # Se a mensagem original foi apagada, envia sem a resposta
+                    payload['reply_to_message_id'] = reply_to_message_id
+                    payload['allow_sending_without_reply'] = True
+                response = requests.post(url, json=payload, timeout=10)  # Adicionando timeout de 10 segundos
+                metrics.send_latency.observe(time.monotonic() - send_started, bot=bot)
                 
+                if response.status_code == 429:
+                    # Rate limit: respeita o retry_after informado pelo Telegram
+                    metrics.rate_limited.inc(bot=bot)
+                    retry_after = self._retry_after(response)
+                    logger.warning(f"Rate limit do Telegram para token {token[:8]}..., aguardando {retry_after}s")
+                    if attempt < max_retries:
+                        time.sleep(retry_after)
+                        continue
+                    return False
+                    
                 if response.status_code == 200:
+                    if trace is not None:
+                        trace.mark(DELIVERED)
+                        trace.message_id = self._message_id(response)
                     logger.info(f"Mensagem enviada com sucesso para chat_id {chat_id} usando token: {token[:8]}...")
                     
                     # Se a mensagem foi enviada com sucesso para um token específico
                     # e não havia mapeamento anterior, salva o mapeamento
                     if token != self.default_token and token not in self.token_chat_map:
                         self.token_chat_map[token] = chat_id
+                        self.registry.add_chat_id(token, chat_id)
                         logger.info(f"Mapeamento token->chat_id salvo: {token[:8]}... -> {chat_id}")
                         
                     return True
@@ -73,7 +114,6 @@ class TelegramClient:
                     logger.error(f"Erro ao enviar mensagem para chat_id {chat_id} usando token {token[:8]}: {response.status_code} - {response.text}")
                     if attempt < max_retries:
                         # Aguarda um pouco antes de tentar novamente
-                        import time
                         time.sleep(2)  
                     else:
                         return False
@@ -82,13 +122,28 @@ class TelegramClient:
                 logger.error(f"Exceção ao enviar mensagem para chat_id {chat_id} usando token {token[:8]}: {e}")
                 if attempt < max_retries:
                     # Aguarda um pouco antes de tentar novamente
-                    import time
                     time.sleep(2)
                 else:
                     return False
         
         return False
 
+    @staticmethod
+    def _message_id(response):
+        """message_id da mensagem enviada (None se a resposta não o trouxer)"""
+        try:
+            return response.json().get('result', {}).get('message_id')
+        except Exception:
+            return None
+
+    @staticmethod
+    def _retry_after(response, default=5):
+        """Extrai o retry_after (segundos) de uma resposta 429 do Telegram"""
+        try:
+            return int(response.json().get('parameters', {}).get('retry_after', default))
+        except Exception:
+            return default
+
     def escape_markdown(self, text):
         """Escapa caracteres especiais do Markdown V2"""
         if not text:
@@ -99,8 +154,14 @@ class TelegramClient:
             escaped_text = escaped_text.replace(char, f'\\{char}')
         return escaped_text
             
-    def send_alert(self, subject, from_addr, body, alert_type="📨 NOVO EMAIL", token=None, chat_id=None):
-        """Envia alerta formatado para o Telegram usando token e chat_id específicos"""
+    def send_alert(self, subject, from_addr, body, alert_type="📨 NOVO EMAIL", token=None, chat_id=None, trace=None,
+                   priority=None, reply_to_message_id=None):
+        """
+        Envia alerta formatado para o Telegram usando token e chat_id específicos.
+        Alertas de prioridade 'low' são entregues sem som de notificação; com
+        reply_to_message_id, o alerta responde à mensagem anterior da conversa.
+        """
+        silent = priority == 'low'
         try:
             # Escapa todos os textos para Markdown V2
             safe_subject = self.escape_markdown(subject)
@@ -121,7 +182,10 @@ class TelegramClient:
                 message=message, 
                 parse_mode='MarkdownV2',
                 token=token, 
-                chat_id=chat_id
+                chat_id=chat_id,
+                trace=trace,
+                disable_notification=silent,
+                reply_to_message_id=reply_to_message_id
             )
         except Exception as e:
             logger.error(f"Erro ao formatar/enviar alerta: {e}")
@@ -136,7 +200,10 @@ class TelegramClient:
                 message=fallback_message,
                 parse_mode='Markdown',  # Usa Markdown simples como fallback
                 token=token,
-                chat_id=chat_id
+                chat_id=chat_id,
+                trace=trace,
+                disable_notification=silent,
+                reply_to_message_id=reply_to_message_id
             )
         
     def process_webhook_update(self, update_json):
@@ -148,12 +215,16 @@ class TelegramClient:
             logger.error(f"Erro ao processar webhook update: {e}")
             return False
             
-    def check_for_updates(self):
-        """Verifica novas mensagens/comandos enviados para o bot"""
+    def check_for_updates(self, timeout=0):
+        """
+        Verifica novas mensagens/comandos enviados para o bot.
+        Para consumo contínuo use UpdatePoller (app.core.update_poller).
+        """
         url = f"{self.base_url}/getUpdates"
+        offset = self.registry.get_update_offset(self.default_token)
         
         try:
-            response = requests.get(url)
+            response = requests.get(url, params={'offset': offset, 'timeout': timeout}, timeout=timeout + 10)
             if response.status_code == 200:
                 updates = response.json().get('result', [])
                 
@@ -161,10 +232,9 @@ class TelegramClient:
                     # Processa cada update
                     self.commands.process_update(update)
                     
-                # Confirma processamento dos updates (opcional)
+                # O offset persistido confirma o lote na próxima chamada, sem requisição extra
                 if updates:
-                    last_update_id = updates[-1]['update_id']
-                    requests.get(f"{url}?offset={last_update_id + 1}")
+                    self.registry.set_update_offset(self.default_token, updates[-1]['update_id'] + 1)
                     
                 return True
             else:
@@ -230,6 +300,13 @@ class TelegramClient:
                 
         # For each token, try to get updates to identify chat_id
         for token in tokens_to_check:
+            # Chat IDs already discovered in previous runs skip the getUpdates call
+            cached_chat_ids = self.registry.get_chat_ids(token)
+            if cached_chat_ids:
+                self.token_chat_map[token] = cached_chat_ids[0]
+                logger.info(f"Chat ID {cached_chat_ids[0]} obtido do registro para token {token[:8]}...")
+                continue
+                
             try:
                 # Try to get recent updates for this bot
                 url = f"https://api.telegram.org/bot{token}/getUpdates"
@@ -245,6 +322,7 @@ class TelegramClient:
                                 chat_id = str(update['message']['chat']['id'])
                                 logger.info(f"Chat ID {chat_id} descoberto para token {token[:8]}...")
                                 self.token_chat_map[token] = chat_id
+                                self.registry.add_chat_id(token, chat_id)
                                 break
             except Exception as e:
                 logger.error(f"Erro ao tentar descobrir chat_id para token {token[:8]}: {e}")
@@ -258,6 +336,10 @@ class TelegramClient:
         if not token:
             return None
             
+        cached = self.registry.get_me(token)
+        if cached:
+            return cached
+            
         try:
             url = f"https://api.telegram.org/bot{token}/getMe"
             response = requests.get(url, timeout=5)
@@ -265,6 +347,7 @@ class TelegramClient:
             if response.status_code == 200:
                 data = response.json()
                 if data.get('ok') and data.get('result'):
+                    self.registry.store_me(token, data['result'])
                     return data['result']
             return None
         except Exception as e:
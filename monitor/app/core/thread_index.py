@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Agrupamento de respostas de e-mail em uma única conversa no Telegram
+
+Cada alerta enviado fica associado, por chat, às chaves do e-mail de origem
+(Message-ID e UID na caixa, com o UIDVALIDITY). Uma resposta cujo
+In-Reply-To/References (ou a árvore devolvida pelo comando IMAP UID THREAD,
+quando o servidor o suporta) aponta
+para um e-mail conhecido é enviada como resposta (reply_to_message_id) à
+mensagem do Telegram correspondente, em vez de uma nova mensagem solta. O
+índice fica em memória com descarte LRU.
+"""
+
+import re
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger('wegnots.thread_index')
+
+DEFAULT_MAX_ENTRIES = 5000
+
+_MESSAGE_ID = re.compile(r'<[^<>\s]+>')
+_THREAD_TOKEN = re.compile(rb'\(|\)|\d+')
+_FETCH_UID = re.compile(rb'\bUID (\d+)')
+
+
+def parse_message_ids(header: Optional[str]) -> List[str]:
+    """Message-IDs (<...>) de um cabeçalho Message-ID, In-Reply-To ou References"""
+    return _MESSAGE_ID.findall(header or '')
+
+
+def parent_ids(in_reply_to: Optional[str], references: Optional[str]) -> List[str]:
+    """Ancestrais do e-mail, do mais próximo para o mais distante"""
+    parents = parse_message_ids(in_reply_to)
+    parents.extend(reversed(parse_message_ids(references)))
+    return list(dict.fromkeys(parents))
+
+
+def parse_fetch_uid(fetch_meta: Any) -> Optional[bytes]:
+    """UID de uma resposta FETCH (ex.: b'3 (UID 1204 INTERNALDATE ...')"""
+    match = _FETCH_UID.search(fetch_meta) if isinstance(fetch_meta, bytes) else None
+    return match.group(1) if match else None
+
+
+def parse_thread_response(data: Iterable[Any]) -> List[List[bytes]]:
+    """
+    Converte a resposta do IMAP UID THREAD (RFC 5256), ex. b'(1 2)(3 (4)(5 6))',
+    em uma lista de conversas, cada uma com os UIDs das mensagens em
+    profundidade (o pai antes dos filhos).
+    """
+    threads: List[List[bytes]] = []
+    depth = 0
+    for chunk in data or ():
+        if not isinstance(chunk, bytes):
+            continue
+        for token in _THREAD_TOKEN.findall(chunk):
+            if token == b'(':
+                if depth == 0:
+                    threads.append([])
+                depth += 1
+            elif token == b')':
+                depth = max(0, depth - 1)
+            elif threads:
+                threads[-1].append(token)
+    return [thread for thread in threads if len(thread) > 1]
+
+
+def thread_parents(threads: List[List[bytes]]) -> dict:
+    """Para cada mensagem de uma conversa, as anteriores a ela (da mais próxima para a mais distante)"""
+    parents = {}
+    for thread in threads:
+        for position, number in enumerate(thread):
+            if position:
+                parents[number] = thread[position - 1::-1]
+    return parents
+
+
+class ThreadIndex:
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        # (chat, chave do e-mail) -> message_id da mensagem enviada ao Telegram
+        self._entries: 'OrderedDict[Tuple[str, str], int]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def find(self, chat: str, keys: Iterable[str]) -> Optional[int]:
+        """Mensagem do Telegram da conversa: a do ancestral conhecido mais próximo"""
+        with self._lock:
+            for key in keys:
+                message_id = self._entries.get((chat, key))
+                if message_id is not None:
+                    self._entries.move_to_end((chat, key))
+                    return message_id
+        return None
+
+    def remember(self, chat: str, keys: Iterable[str], message_id: int):
+        """Associa as chaves do e-mail à mensagem enviada, descartando as menos usadas"""
+        with self._lock:
+            for key in keys:
+                self._entries[(chat, key)] = message_id
+                self._entries.move_to_end((chat, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+_index: Optional[ThreadIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_thread_index() -> Optional[ThreadIndex]:
+    """Retorna o índice de conversas compartilhado pelo processo (None se desabilitado)"""
+    return _index
+
+
+def set_thread_index(index: Optional[ThreadIndex]):
+    global _index
+    with _index_lock:
+        _index = index
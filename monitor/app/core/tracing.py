@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Rastreamento de latência de cada alerta, da chegada no servidor até a entrega
+
+Cada e-mail carrega um AlertTrace com os instantes de cada etapa (INTERNALDATE
+do IMAP, detecção, fetch, parsing, roteamento, enfileiramento, tentativas de
+envio e entrega). Ao final, as durações alimentam sketches de quantis por
+conta e por destino, exportados pelo /metrics e em resumos periódicos no log.
+"""
+
+import math
+import time
+import logging
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+from .metrics import get_metrics, _escape_label
+
+logger = logging.getLogger('wegnots.tracing')
+
+# Etapas na ordem em que ocorrem
+ARRIVAL = 'server_arrival'
+DETECTED = 'detected'
+FETCHED = 'fetched'
+PARSED = 'parsed'
+ROUTED = 'routed'
+ENQUEUED = 'enqueued'
+SEND_ATTEMPT = 'send_attempt'
+DELIVERED = 'delivered'
+
+SUMMARY_QUANTILES = (0.5, 0.9, 0.95, 0.99)
+
+
+class AlertTrace:
+    __slots__ = ('account', 'destination', 'message_id', 'marks', 'attempts')
+
+    def __init__(self, account: str, arrival: Optional[float] = None):
+        self.account = account
+        self.destination: Optional[str] = None
+        # message_id da mensagem entregue no Telegram (respostas na mesma conversa)
+        self.message_id: Optional[int] = None
+        self.marks: Dict[str, float] = {}
+        self.attempts: List[float] = []
+        if arrival is not None:
+            self.marks[ARRIVAL] = arrival
+
+    def mark(self, stage: str, timestamp: Optional[float] = None):
+        timestamp = time.time() if timestamp is None else timestamp
+        if stage == SEND_ATTEMPT:
+            self.attempts.append(timestamp)
+            self.marks.setdefault(SEND_ATTEMPT, timestamp)
+        else:
+            self.marks[stage] = timestamp
+
+    def elapsed(self, start: str, end: str) -> Optional[float]:
+        """Duração entre duas etapas (nunca negativa, por causa de relógios dessincronizados)"""
+        if start in self.marks and end in self.marks:
+            return max(0.0, self.marks[end] - self.marks[start])
+        return None
+
+    def stage_durations(self) -> Dict[str, float]:
+        """Duração de cada etapa em relação à etapa anterior registrada"""
+        ordered = sorted(self.marks.items(), key=lambda item: item[1])
+        return {stage: max(0.0, ts - ordered[i - 1][1]) for i, (stage, ts) in enumerate(ordered) if i > 0}
+
+
+class QuantileSketch:
+    """
+    Sketch de quantis com erro relativo limitado (estilo DDSketch): valores
+    caem em buckets logarítmicos, com memória fixa independente do volume.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01, max_buckets: int = 2048, min_value: float = 1e-3):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.max_buckets = max_buckets
+        self.min_value = min_value
+        self.buckets: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+
+    def add(self, value: float):
+        self.count += 1
+        self.sum += value
+        if value <= self.min_value:
+            self.zero_count += 1
+            return
+        index = math.ceil(math.log(value) / self._log_gamma)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        if len(self.buckets) > self.max_buckets:
+            # Colapsa os dois menores buckets, preservando a precisão da cauda
+            lowest, second = sorted(self.buckets)[:2]
+            self.buckets[second] += self.buckets.pop(lowest)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        cumulative = self.zero_count
+        if rank < cumulative:
+            return 0.0
+        for index in sorted(self.buckets):
+            cumulative += self.buckets[index]
+            if cumulative > rank:
+                return 2 * self.gamma ** index / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+
+class LatencyTracker:
+    """Agrega traces finalizados em sketches por conta e por destino"""
+
+    def __init__(self, summary_interval: float = 300.0):
+        self.summary_interval = summary_interval
+        self._sketches: Dict[Tuple[str, str, str], QuantileSketch] = {}
+        self._lock = threading.Lock()
+        self._last_summary = time.monotonic()
+        self.name = 'wegnots_alert_stage_seconds'
+        self.help = 'Latência por etapa do alerta (server_arrival->delivered = ponta a ponta)'
+
+    def _observe(self, dimension: str, key: str, stage: str, value: float):
+        sketch_key = (dimension, key, stage)
+        sketch = self._sketches.get(sketch_key)
+        if sketch is None:
+            sketch = self._sketches[sketch_key] = QuantileSketch()
+        sketch.add(value)
+
+    def record(self, trace: AlertTrace):
+        """Registra um trace finalizado (entregue ou não)"""
+        end_to_end = trace.elapsed(ARRIVAL, DELIVERED)
+        detection = trace.elapsed(DETECTED, DELIVERED)
+        stages = trace.stage_durations()
+        with self._lock:
+            for dimension, key in (('account', trace.account), ('destination', trace.destination)):
+                if not key:
+                    continue
+                if end_to_end is not None:
+                    self._observe(dimension, key, 'end_to_end', end_to_end)
+                if detection is not None:
+                    self._observe(dimension, key, 'detection_to_delivery', detection)
+                for stage, duration in stages.items():
+                    self._observe(dimension, key, stage, duration)
+        logger.debug(f"Trace do alerta {trace.account} -> {trace.destination}: "
+                     f"ponta a ponta={end_to_end}, etapas={stages}, tentativas={len(trace.attempts)}")
+        self._maybe_log_summary()
+
+    def quantile(self, dimension: str, key: str, stage: str, q: float) -> Optional[float]:
+        with self._lock:
+            sketch = self._sketches.get((dimension, key, stage))
+            return sketch.quantile(q) if sketch else None
+
+    def summary(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """Quantis atuais agrupados por 'dimensão:chave' e etapa"""
+        with self._lock:
+            result: Dict[str, Dict[str, Dict[str, Any]]] = {}
+            for (dimension, key, stage), sketch in self._sketches.items():
+                result.setdefault(f"{dimension}:{key}", {})[stage] = {
+                    'count': sketch.count,
+                    **{f"p{int(q * 100)}": sketch.quantile(q) for q in SUMMARY_QUANTILES}
+                }
+            return result
+
+    def _maybe_log_summary(self):
+        now = time.monotonic()
+        if now - self._last_summary < self.summary_interval:
+            return
+        self._last_summary = now
+        for series, stages in self.summary().items():
+            for stage in ('end_to_end', 'detection_to_delivery'):
+                if stage in stages:
+                    values = stages[stage]
+                    logger.info(f"Latência {stage} {series}: n={values['count']} "
+                                f"p50={values['p50']:.2f}s p95={values['p95']:.2f}s p99={values['p99']:.2f}s")
+
+    def render(self) -> List[str]:
+        """Exporta os sketches como métricas summary do Prometheus"""
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} summary"]
+        with self._lock:
+            items = sorted(self._sketches.items())
+            for (dimension, key, stage), sketch in items:
+                labels = f'{dimension}="{_escape_label(key)}",stage="{stage}"'
+                for q in SUMMARY_QUANTILES:
+                    lines.append(f'{self.name}{{{labels},quantile="{q}"}} {sketch.quantile(q)}')
+                lines.append(f'{self.name}_sum{{{labels}}} {sketch.sum}')
+                lines.append(f'{self.name}_count{{{labels}}} {sketch.count}')
+        return lines
+
+
+_tracker: Optional[LatencyTracker] = None
+_tracker_lock = threading.Lock()
+
+
+def get_latency_tracker() -> LatencyTracker:
+    """Retorna o agregador de latência compartilhado, registrado no /metrics"""
+    global _tracker
+    with _tracker_lock:
+        if _tracker is None:
+            _tracker = LatencyTracker()
+            get_metrics().register(_tracker)
+        return _tracker
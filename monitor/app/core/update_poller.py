@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Consumidor de atualizações do Telegram via long polling (getUpdates)
+
+Cada token de bot ganha uma thread dedicada que remove um webhook anterior
+(getUpdates não funciona com webhook ativo), mantém um getUpdates com
+timeout longo aberto e despacha as atualizações para
+TelegramCommands.process_update através de um pool de workers compartilhado.
+O offset de cada atualização só avança (e é persistido no registro de bots)
+depois que o seu handler retorna: um reinício no meio do lote reprocessa as
+atualizações ainda não tratadas (entrega pelo menos uma vez).
+"""
+
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Dict, Any, Iterable, List, Optional
+
+import requests
+
+from .bot_registry import BotRegistry, get_bot_registry
+from .telegram_bot_commands import TelegramCommands
+
+logger = logging.getLogger('wegnots.telegram.poller')
+
+LONG_POLL_TIMEOUT = 50      # segundos que o Telegram segura a requisição aberta
+MAX_ERROR_BACKOFF = 60      # teto do backoff exponencial em caso de erro
+CONFLICT_BACKOFF = 30       # espera quando há webhook ativo ou outro consumidor
+HANDLER_TIMEOUT = 30        # espera máxima pelo handler antes de confirmar a atualização
+
+
+class UpdatePoller:
+    def __init__(self, token: str, executor: ThreadPoolExecutor,
+                 commands: Optional[TelegramCommands] = None,
+                 registry: Optional[BotRegistry] = None,
+                 poll_timeout: int = LONG_POLL_TIMEOUT):
+        self.token = token
+        self.executor = executor
+        self.registry = registry or get_bot_registry()
+        self.commands = commands or TelegramCommands(token, self.registry)
+        self.poll_timeout = poll_timeout
+        self.base_url = f"https://api.telegram.org/bot{token}"
+        self.url = f"{self.base_url}/getUpdates"
+        self.offset = self.registry.get_update_offset(token)
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # Sessão própria para reaproveitar a conexão TLS entre long polls
+        self._session = requests.Session()
+
+    def start(self):
+        """Inicia a thread de long polling"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run,
+            name=f"telegram-poller-{self.token[:8]}",
+            daemon=True
+        )
+        self._thread.start()
+        logger.info(f"Consumidor de atualizações iniciado para token {self.token[:8]}... (offset {self.offset})")
+
+    def stop(self, timeout: float = 5.0):
+        """Sinaliza a parada e aguarda a thread encerrar"""
+        self._stop_event.set()
+        self._session.close()
+        if self._thread:
+            self._thread.join(timeout)
+        logger.info(f"Consumidor de atualizações encerrado para token {self.token[:8]}...")
+
+    def delete_webhook(self) -> bool:
+        """
+        Remove o webhook do bot (de um deploy anterior em modo webhook) para
+        liberar o getUpdates; as atualizações pendentes são mantidas.
+        """
+        try:
+            response = self._session.post(f"{self.base_url}/deleteWebhook", timeout=10)
+            if response.status_code == 200:
+                return True
+            logger.warning(f"deleteWebhook falhou para token {self.token[:8]}...: "
+                           f"{response.status_code} - {response.text}")
+        except Exception as e:
+            logger.warning(f"Erro ao remover webhook do token {self.token[:8]}...: {e}")
+        return False
+
+    def _run(self):
+        self.delete_webhook()
+        backoff = 1
+        while not self._stop_event.is_set():
+            try:
+                updates = self.poll_once()
+                backoff = 1
+                if updates is None:
+                    # Conflito (webhook ativo ou outro getUpdates em andamento)
+                    self._stop_event.wait(CONFLICT_BACKOFF)
+            except Exception as e:
+                if self._stop_event.is_set():
+                    break
+                logger.error(f"Erro no long polling do token {self.token[:8]}: {e}")
+                self._stop_event.wait(backoff)
+                backoff = min(backoff * 2, MAX_ERROR_BACKOFF)
+
+    def poll_once(self) -> Optional[List[Dict[str, Any]]]:
+        """
+        Executa um único getUpdates a partir do offset atual e despacha o lote.
+        Retorna None em caso de conflito (HTTP 409).
+        """
+        response = self._session.get(self.url, params={
+            'offset': self.offset,
+            'timeout': self.poll_timeout,
+            'allowed_updates': '["message"]'
+        }, timeout=self.poll_timeout + 10)
+
+        if response.status_code == 409:
+            logger.warning(f"getUpdates em conflito para token {self.token[:8]}... (webhook ativo ou outro consumidor)")
+            return None
+        if response.status_code != 200:
+            raise RuntimeError(f"{response.status_code} - {response.text}")
+
+        updates = response.json().get('result', [])
+        dispatched = [(update, self.dispatch(update)) for update in updates]
+        for update, future in dispatched:
+            try:
+                future.result(timeout=HANDLER_TIMEOUT)
+            except FutureTimeout:
+                logger.warning(f"Update {update['update_id']} do token {self.token[:8]}... sem resposta "
+                               f"em {HANDLER_TIMEOUT}s; confirmando para não travar o consumo")
+            # O próximo getUpdates com offset maior confirma a atualização no Telegram:
+            # só avança depois que o handler retornou
+            self.offset = update['update_id'] + 1
+            self.registry.set_update_offset(self.token, self.offset)
+        return updates
+
+    def dispatch(self, update: Dict[str, Any]) -> Future:
+        """Encaminha a atualização ao pool de workers"""
+        chat = update.get('message', {}).get('chat', {})
+        if 'id' in chat:
+            self.registry.add_chat_id(self.token, chat['id'])
+        return self.executor.submit(self._handle, update)
+
+    def _handle(self, update: Dict[str, Any]):
+        try:
+            self.commands.process_update(update)
+        except Exception as e:
+            logger.error(f"Erro ao processar update {update.get('update_id')} do token {self.token[:8]}: {e}")
+
+
+class UpdatePollerGroup:
+    """Conjunto de consumidores (um por token) compartilhando o mesmo pool de workers"""
+
+    def __init__(self, tokens: Iterable[str], max_workers: int = 4,
+                 registry: Optional[BotRegistry] = None):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='telegram-update')
+        self.pollers = [
+            UpdatePoller(token, self.executor, registry=registry)
+            for token in dict.fromkeys(t for t in tokens if t)
+        ]
+
+    def start(self):
+        for poller in self.pollers:
+            poller.start()
+
+    def stop(self):
+        for poller in self.pollers:
+            poller._stop_event.set()
+        for poller in self.pollers:
+            poller.stop()
+        self.executor.shutdown(wait=False)
+
+
+def start_update_pollers(tokens: Iterable[str], max_workers: int = 4) -> UpdatePollerGroup:
+    """Cria e inicia os consumidores de atualizações para os tokens informados"""
+    group = UpdatePollerGroup(tokens, max_workers=max_workers)
+    group.start()
+    return group
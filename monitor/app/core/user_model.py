@@ -1,9 +1,11 @@
 import logging
-from typing import Dict, List, Optional
-from pymongo import MongoClient, ASCENDING
+from typing import Dict, Iterable, List, Optional
+from pymongo import MongoClient
 from pymongo.collection import Collection
 from pymongo.database import Database
 from datetime import datetime
+from .index_manager import IndexManager
+from .recipient_resolver import RecipientResolver, USER_FIELDS, normalize_sender, sender_domain_rule
 
 logger = logging.getLogger('wegnots.user_model')
 
@@ -16,14 +18,8 @@ class UserModel:
         self.processed_emails = set()
 
     def _setup_indexes(self):
-        """Configura índices necessários"""
-        # Garante índices únicos para email e chat_id
-        self.collection.drop_indexes()
-        self.collection.create_index([("email", ASCENDING)], unique=True)
-        self.collection.create_index([("chat_id", ASCENDING)], unique=True)
-        
-        # Índice para busca por remetente nas regras
-        self.collection.create_index([("notification_rules.sender", ASCENDING)])
+        """Garante os índices da coleção users (sem trabalho quando a especificação não mudou)"""
+        IndexManager(self.db).ensure(['users'])
 
     def _ensure_central_server(self):
         """Garante que o servidor central exista"""
@@ -95,13 +91,39 @@ class UserModel:
             ]
         }))
         
-        # Inclui servidor central se não estiver na lista
+        # Inclui servidor central se não estiver na lista (comparando pelo _id)
         central = self.collection.find_one({'is_central_server': True})
-        if central and central not in users:
+        if central and all(user['_id'] != central['_id'] for user in users):
             users.append(central)
             
         return users
 
+    def get_recipients_for_senders(self, senders: Iterable[str], level: Optional[str] = None,
+                                   all_levels: bool = False) -> Dict[str, List[Dict]]:
+        """
+        Resolve os destinatários de todos os remetentes de um ciclo com uma única
+        consulta ($in sobre email e notification_rules.sender, incluindo os
+        curingas de domínio e o servidor central). As preferências de notificação
+        de cada usuário para o nível informado são aplicadas no mesmo passo, a
+        menos que all_levels seja verdadeiro (ciclos com alertas de vários níveis).
+        
+        Returns:
+            Dict remetente -> lista de usuários
+        """
+        senders = list(dict.fromkeys(senders))
+        addresses = {normalize_sender(sender) for sender in senders} - {''}
+        rules = addresses | {rule for rule in map(sender_domain_rule, addresses) if rule}
+        users = self.collection.find({'$or': [
+            {'email': {'$in': sorted(addresses)}},
+            {'notification_rules.sender': {'$in': sorted(rules)}},
+            {'is_central_server': True}
+        ]}, USER_FIELDS)
+        
+        # Reaproveita os índices do resolvedor em memória apenas para este lote
+        batch = RecipientResolver(self.collection)
+        batch.load(users)
+        return batch.get_recipients_for_senders(senders, level, all_levels)
+
     def get_active_chat_ids(self) -> List[str]:
         """Retorna lista de chat_ids de usuários ativos"""
         users = self.collection.find({"is_active": True}, {"chat_id": 1})
@@ -179,6 +201,18 @@ class UserModel:
             logger.error(f'Erro ao atualizar regras: {e}')
             return False
 
+    def delete_user(self, user_id) -> bool:
+        """Remove um usuário pelo _id"""
+        try:
+            result = self.collection.delete_one({'_id': user_id})
+            if result.deleted_count > 0:
+                logger.info(f"Usuário removido: {user_id}")
+                return True
+            return False
+        except Exception as e:
+            logger.error(f"Erro ao remover usuário {user_id}: {e}")
+            return False
+
     def get_central_server(self) -> Optional[Dict]:
         """Retorna o usuário servidor central"""
         return self.collection.find_one({'is_central_server': True})
@@ -210,18 +244,11 @@ class UserModel:
         try:
             emails_collection = db['processed_emails']
             
-            # Cria índice de expiração se não existir
+            # Garante o índice de expiração (TTL) de forma idempotente
             try:
-                indexes = emails_collection.index_information()
-                if 'processed_time_ttl' not in indexes:
-                    emails_collection.create_index(
-                        [("processed_time", ASCENDING)], 
-                        expireAfterSeconds=7*24*60*60,  # 7 dias
-                        name="processed_time_ttl"
-                    )
-                    logger.info("Índice TTL criado para histórico de e-mails")
+                IndexManager(db).ensure(['processed_emails'])
             except Exception as e:
-                logger.error(f"Erro ao criar índice TTL: {e}")
+                logger.error(f"Erro ao verificar índices do histórico de e-mails: {e}")
             
             # Converte o conjunto em lista de documentos
             email_docs = [
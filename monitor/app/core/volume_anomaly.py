@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+Detecção de anomalias de volume por conta monitorada
+
+A cada verificação IMAP, a taxa de chegada (e-mails/minuto) de cada conta
+atualiza uma média móvel exponencial (EWMA) por verificação e, ao fim de cada
+hora, uma linha de base sazonal por hora da semana (168 posições, EWMA entre
+semanas). Tudo com custo O(1) por verificação. Com a linha de base aquecida:
+- inundação: taxa bem acima do esperado (k desvios e um múltiplo mínimo);
+- silêncio: os e-mails esperados pela linha sazonal desde o último recebido
+  somam vários, e nada chegou.
+Ambos geram um único meta-alerta para o chat do servidor central, com limite
+próprio (espera por conta e tipo, um alerta de silêncio por episódio e um teto
+global por hora). Valores anômalos entram limitados na linha de base.
+"""
+
+import os
+import json
+import math
+import time
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Callable
+
+from .markdown import escape_markdown
+
+logger = logging.getLogger('wegnots.volume_anomaly')
+
+DEFAULT_BASELINE_PATH = 'data/volume_baseline.json'
+HOURS_PER_WEEK = 168
+
+
+class Baseline:
+    """Média e variância exponencialmente ponderadas"""
+    __slots__ = ('mean', 'var', 'samples')
+
+    def __init__(self, mean: float = 0.0, var: float = 0.0, samples: int = 0):
+        self.mean = mean
+        self.var = var
+        self.samples = samples
+
+    def update(self, value: float, alpha: float):
+        if self.samples == 0:
+            self.mean = value
+        else:
+            delta = value - self.mean
+            self.mean += alpha * delta
+            self.var = (1 - alpha) * (self.var + alpha * delta * delta)
+        self.samples += 1
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.var)
+
+
+class AccountVolume:
+    __slots__ = ('overall', 'seasonal', 'last_poll', 'last_email', 'missing', 'slot', 'slot_count', 'slot_elapsed')
+
+    def __init__(self):
+        self.overall = Baseline()
+        self.seasonal: List[Optional[Baseline]] = [None] * HOURS_PER_WEEK
+        self.last_poll: Optional[float] = None
+        self.last_email: Optional[float] = None
+        # E-mails esperados (pela linha sazonal) desde o último recebido
+        self.missing = 0.0
+        # Acumulado da hora corrente, consolidado na linha sazonal ao virar a hora
+        self.slot: Optional[int] = None
+        self.slot_count = 0
+        self.slot_elapsed = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        def pack(baseline):
+            return [baseline.mean, baseline.var, baseline.samples] if baseline else None
+        return {'overall': pack(self.overall), 'seasonal': [pack(slot) for slot in self.seasonal],
+                'last_email': self.last_email}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'AccountVolume':
+        volume = cls()
+        volume.overall = Baseline(*data['overall'])
+        seasonal = data.get('seasonal') or []
+        if len(seasonal) == HOURS_PER_WEEK:
+            volume.seasonal = [Baseline(*slot) if slot else None for slot in seasonal]
+        volume.last_email = data.get('last_email')
+        return volume
+
+
+class VolumeAnomalyDetector:
+    def __init__(self, notify: Optional[Callable[[str], bool]] = None, alpha: float = 0.05,
+                 seasonal_alpha: float = 0.3, threshold: float = 4.0, flood_ratio: float = 3.0,
+                 min_flood_count: int = 20, warmup_samples: int = 60, seasonal_min_samples: int = 2,
+                 quiet_expected: float = 10.0, min_quiet_seconds: float = 1800, cooldown: float = 3600,
+                 max_alerts_per_hour: int = 5, path: Optional[str] = DEFAULT_BASELINE_PATH,
+                 checkpoint_interval: float = 300):
+        self.notify = notify
+        self.alpha = alpha
+        self.seasonal_alpha = seasonal_alpha
+        self.threshold = threshold
+        self.flood_ratio = flood_ratio
+        self.min_flood_count = min_flood_count
+        self.warmup_samples = warmup_samples
+        self.seasonal_min_samples = seasonal_min_samples
+        self.quiet_expected = quiet_expected
+        self.min_quiet_seconds = min_quiet_seconds
+        self.cooldown = cooldown
+        self.max_alerts_per_hour = max_alerts_per_hour
+        self.path = path
+        self.checkpoint_interval = checkpoint_interval
+        self._last_save = time.monotonic()
+        self._accounts: Dict[str, AccountVolume] = {}
+        self._last_alert: Dict[tuple, float] = {}
+        self._recent_alerts: deque = deque()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _slot(now: float) -> int:
+        local = datetime.fromtimestamp(now)
+        return local.weekday() * 24 + local.hour
+
+    def _seasonal(self, volume: AccountVolume, slot: int) -> Optional[Baseline]:
+        seasonal = volume.seasonal[slot]
+        if seasonal is not None and seasonal.samples >= self.seasonal_min_samples:
+            return seasonal
+        return None
+
+    def _roll_slot(self, volume: AccountVolume, slot: int, count: int, elapsed: float):
+        """Consolida a hora encerrada na linha sazonal e acumula a hora corrente"""
+        if volume.slot is not None and slot != volume.slot and volume.slot_elapsed > 0:
+            baseline = volume.seasonal[volume.slot]
+            if baseline is None:
+                baseline = volume.seasonal[volume.slot] = Baseline()
+            baseline.update(volume.slot_count * 60.0 / volume.slot_elapsed, self.seasonal_alpha)
+            volume.slot_count, volume.slot_elapsed = 0, 0.0
+        volume.slot = slot
+        volume.slot_count += count
+        volume.slot_elapsed += elapsed
+
+    def observe(self, account: str, count: int, now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Registra o resultado de uma verificação (quantidade de e-mails novos)
+        e retorna as anomalias detectadas (já notificadas, se houver notify).
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            volume = self._accounts.get(account)
+            if volume is None:
+                volume = self._accounts[account] = AccountVolume()
+            if volume.last_poll is None:
+                volume.last_poll = now
+                volume.last_email = volume.last_email or now
+                return []
+            elapsed = min(max(now - volume.last_poll, 1.0), 3600.0)
+            volume.last_poll = now
+            rate = count * 60.0 / elapsed
+            slot = self._slot(now)
+            self._roll_slot(volume, slot, count, elapsed)
+            seasonal = self._seasonal(volume, slot)
+            expected = seasonal or volume.overall
+            std = max(expected.std, 0.1)
+            warmed = volume.overall.samples >= self.warmup_samples
+
+            anomalies = []
+            if warmed and count >= self.min_flood_count and rate > expected.mean + self.threshold * std \
+                    and rate > expected.mean * self.flood_ratio:
+                anomalies.append({'account': account, 'kind': 'flood', 'count': count,
+                                  'rate': rate, 'expected': expected.mean})
+            if count:
+                volume.last_email = now
+                volume.missing = 0.0
+            elif seasonal is not None:
+                volume.missing += seasonal.mean * elapsed / 60.0
+                silence = now - volume.last_email
+                # Um alerta de silêncio por episódio (até chegar um novo e-mail)
+                already_alerted = self._last_alert.get((account, 'quiet'), float('-inf')) >= volume.last_email
+                if volume.missing >= self.quiet_expected and silence >= self.min_quiet_seconds and not already_alerted:
+                    anomalies.append({'account': account, 'kind': 'quiet', 'silence': silence,
+                                      'expected': volume.missing})
+
+            # Valores anômalos entram limitados para não contaminar a linha de base
+            volume.overall.update(min(rate, expected.mean + self.threshold * std) if warmed else rate, self.alpha)
+
+            allowed = [anomaly for anomaly in anomalies if self._allow(anomaly, now)]
+        for anomaly in allowed:
+            logger.warning(f"Anomalia de volume em {account}: {anomaly['kind']}")
+            if self.notify is not None:
+                try:
+                    self.notify(format_anomaly(anomaly))
+                except Exception as e:
+                    logger.error(f"Erro ao enviar alerta de anomalia de volume: {e}")
+        if time.monotonic() - self._last_save >= self.checkpoint_interval:
+            self.save()
+        return allowed
+
+    def _allow(self, anomaly: Dict[str, Any], now: float) -> bool:
+        """Espera por conta e tipo e teto global por hora dos meta-alertas"""
+        key = (anomaly['account'], anomaly['kind'])
+        if now - self._last_alert.get(key, float('-inf')) < self.cooldown:
+            return False
+        while self._recent_alerts and now - self._recent_alerts[0] >= 3600:
+            self._recent_alerts.popleft()
+        if len(self._recent_alerts) >= self.max_alerts_per_hour:
+            logger.warning(f"Limite de alertas de anomalia atingido; {anomaly['kind']} em {anomaly['account']} omitido")
+            return False
+        self._last_alert[key] = now
+        self._recent_alerts.append(now)
+        return True
+
+    # Persistência da linha de base (aquecimento sobrevive a reinícios) -----
+
+    def save(self):
+        self._last_save = time.monotonic()
+        if not self.path:
+            return
+        with self._lock:
+            data = {account: volume.to_dict() for account, volume in self._accounts.items()}
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'accounts': data}, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.error(f"Erro ao salvar linha de base de volume em {self.path}: {e}")
+
+    def load(self) -> bool:
+        if not self.path:
+            return False
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            accounts = {account: AccountVolume.from_dict(volume) for account, volume in data['accounts'].items()}
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Linha de base de volume ilegível em {self.path}, ignorando: {e}")
+            return False
+        with self._lock:
+            self._accounts.update(accounts)
+        return True
+
+
+def _format_duration(seconds: float) -> str:
+    if seconds < 3600:
+        return f"{int(seconds // 60)} min"
+    return f"{seconds / 3600:.1f} h"
+
+
+def format_anomaly(anomaly: Dict[str, Any]) -> str:
+    timestamp = datetime.now().strftime('%d/%m/%Y %H:%M:%S')
+    if anomaly['kind'] == 'flood':
+        return (
+            "📈 *Volume anômalo de e-mails*\n\n"
+            f"📧 Conta: {escape_markdown(anomaly['account'])}\n"
+            f"📨 {anomaly['count']} e-mail(s) na última verificação "
+            f"({anomaly['rate']:.1f}/min; esperado ~{anomaly['expected']:.1f}/min)\n"
+            f"⏰ {timestamp}\n\n"
+            "🔍 Verifique se algum sistema de origem está disparando mensagens em excesso."
+        )
+    return (
+        "🔇 *Conta sem e-mails*\n\n"
+        f"📧 Conta: {escape_markdown(anomaly['account'])}\n"
+        f"⏳ Nenhum e-mail há {_format_duration(anomaly['silence'])} "
+        f"(~{anomaly['expected']:.0f} esperados neste período)\n"
+        f"⏰ {timestamp}\n\n"
+        "🔍 Verifique se os sistemas de origem continuam enviando."
+    )
+
+
+_detector: Optional[VolumeAnomalyDetector] = None
+_detector_lock = threading.Lock()
+
+
+def get_volume_anomaly_detector() -> Optional[VolumeAnomalyDetector]:
+    """Retorna o detector compartilhado pelo processo (None se desabilitado)"""
+    return _detector
+
+
+def set_volume_anomaly_detector(detector: Optional[VolumeAnomalyDetector]):
+    global _detector
+    with _detector_lock:
+        _detector = detector
+
+
+def central_chat_notifier(telegram_client, user_model=None) -> Callable[[str], bool]:
+    """Envia ao chat do servidor central (usuário is_central_server) ou ao chat padrão"""
+    def notify(message: str) -> bool:
+        chat_id = None
+        if user_model is not None:
+            try:
+                central = user_model.get_central_server()
+                if central and central.get('is_active', True):
+                    chat_id = central.get('chat_id')
+            except Exception as e:
+                logger.error(f"Erro ao consultar o servidor central: {e}")
+        return telegram_client.send_text_message(message, chat_id=chat_id)
+    return notify
@@ -8,6 +8,7 @@ import logging
 import requests
 from typing import Dict, Optional, List, Tuple
 from datetime import datetime
+from app.core.bot_registry import get_bot_registry
 
 # Configurar logging
 os.makedirs('logs', exist_ok=True)
@@ -82,6 +83,25 @@ def is_valid_chat_id(chat_id: str) -> bool:
     except ValueError:
         return False
 
+def get_bot_info(token: str) -> Optional[Dict]:
+    """Obtém os dados do bot (getMe), reutilizando o registro em cache quando válido"""
+    if not token:
+        return None
+    registry = get_bot_registry()
+    cached = registry.get_me(token)
+    if cached:
+        return cached
+    try:
+        response = requests.get(f"https://api.telegram.org/bot{token}/getMe", timeout=5)
+        if response.status_code == 200 and response.json().get('ok'):
+            bot_info = response.json()['result']
+            registry.store_me(token, bot_info)
+            return bot_info
+        logger.error(f"Token do Telegram rejeitado: {response.status_code} - {response.text}")
+    except Exception as e:
+        logger.error(f"Erro ao validar token do Telegram: {e}")
+    return None
+
 def load_config() -> configparser.ConfigParser:
     """Carrega a configuração do arquivo config.ini"""
     config = configparser.ConfigParser()
@@ -1208,6 +1228,11 @@ def setup_telegram(config: configparser.ConfigParser):
             # Apenas verificar a configuração atual
             if current_token and current_chat_id:
                 print("\n✅ Configuração do Telegram está completa.")
+                bot_info = get_bot_info(current_token)
+                if bot_info:
+                    print(f"🤖 Bot: @{bot_info.get('username', 'desconhecido')}")
+                else:
+                    print("⚠️ Não foi possível validar o token do bot.")
                 
                 # Oferecer teste
                 test_now = input("\nDeseja testar a configuração atual? (s/n): ").lower()
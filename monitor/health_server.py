@@ -5,38 +5,125 @@ Servidor HTTP simples para health checks do sistema WegNots
 
 import os
 import sys
+import json
+import hmac
+import hashlib
 import logging
 import threading
 import http.server
 import socketserver
+from urllib.parse import urlsplit, parse_qs, unquote
+from wsgiref.simple_server import ServerHandler
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from app.core.bot_registry import token_hash
+from app.core.telegram_bot_commands import TelegramCommands
+from app.core.metrics import get_metrics
+from app.core.heartbeat import get_heartbeats
+from app.core.safe_regex import validate_pattern
+from app.core.profiling import sample_cpu, get_memory_tracker, ProfilerBusyError, MAX_PROFILE_SECONDS
 
-# Configura logger
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('logs/health_server.log'),
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+# Configura logger (o pipeline de logging é configurado pelo processo que importa este módulo)
 logger = logging.getLogger('wegnots.health')
 
+# Rotas de webhook do Telegram: hash do token -> {'commands', 'secret'}
+WEBHOOK_PATH_PREFIX = '/telegram/'
+MAX_WEBHOOK_BODY = 1024 * 1024  # 1MB, bem acima de qualquer update do Telegram
+_webhook_routes = {}
+_webhook_executor = None
+_webhook_lock = threading.Lock()
+
+# Rotas de diagnóstico protegidas pelo cabeçalho X-Admin-Token
+ADMIN_PATH_PREFIX = '/admin/'
+
+# Aplicações WSGI montadas na mesma porta (ex.: API do painel em /api/): prefixo -> app
+MAX_API_BODY = 1024 * 1024
+_wsgi_mounts = {}
+
+def webhook_secret_for(token, base_secret=None):
+    """Deriva o secret_token do webhook (A-Z, a-z, 0-9) para um bot específico"""
+    key = (base_secret or token).encode('utf-8')
+    return hmac.new(key, token.encode('utf-8'), hashlib.sha256).hexdigest()
+
+def register_webhook(token, secret, commands=None, max_workers=4):
+    """Registra a rota de webhook de um bot e retorna o caminho HTTP correspondente"""
+    global _webhook_executor
+    with _webhook_lock:
+        if _webhook_executor is None:
+            _webhook_executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='telegram-webhook')
+        _webhook_routes[token_hash(token)] = {
+            'commands': commands or TelegramCommands(token),
+            'secret': secret
+        }
+    return f"{WEBHOOK_PATH_PREFIX}{token_hash(token)}"
+
+def setup_telegram_webhooks(tokens, base_url, base_secret=None):
+    """Registra as rotas locais e aponta o webhook de cada bot para este servidor"""
+    configured = 0
+    for token in dict.fromkeys(t for t in tokens if t):
+        secret = webhook_secret_for(token, base_secret)
+        commands = TelegramCommands(token)
+        path = register_webhook(token, secret, commands)
+        if commands.set_webhook(f"{base_url.rstrip('/')}{path}", secret_token=secret):
+            configured += 1
+    logger.info(f"Webhooks do Telegram configurados: {configured}")
+    return configured
+
+def mount_wsgi_app(prefix, app):
+    """Atende os caminhos iniciados por `prefix` com uma aplicação WSGI (ex.: Flask)"""
+    _wsgi_mounts[prefix] = app
+    logger.info(f"Aplicação WSGI montada em {prefix}")
+
+def _mounted_app(path):
+    for prefix, app in _wsgi_mounts.items():
+        if path.startswith(prefix):
+            return app
+    return None
+
+def _process_webhook_update(route, update):
+    try:
+        route['commands'].process_update(update)
+    except Exception as e:
+        logger.error(f"Erro ao processar update {update.get('update_id')} recebido via webhook: {e}")
+
+def _query_int(query, name, default, minimum=1, maximum=None):
+    try:
+        value = int(query.get(name, [default])[0])
+    except ValueError:
+        value = default
+    value = max(minimum, value)
+    return min(value, maximum) if maximum is not None else value
+
 class HealthCheckHandler(http.server.SimpleHTTPRequestHandler):
     """Handler que responde ao healthcheck do Docker"""
     
     def do_GET(self):
         """Processa requisições GET"""
-        if self.path == '/health':
-            # Responde ao healthcheck
+        if self._dispatch_wsgi():
+            return
+        if self.path.startswith(ADMIN_PATH_PREFIX):
+            self._handle_admin('GET')
+        elif self.path in ('/health', '/live', '/ready'):
+            # Liveness: loop principal progredindo; readiness: também todas as contas
+            heartbeats = get_heartbeats()
+            max_missed = int(os.getenv('WATCHDOG_MAX_MISSED', 3))
+            if self.path == '/ready':
+                ok, details = heartbeats.readiness(max_missed)
+            else:
+                ok, details = heartbeats.liveness(max_missed)
+            self._send_json(200 if ok else 503, {
+                'status': 'healthy' if ok else 'unhealthy',
+                'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                'checks': details
+            })
+        elif self.path == '/metrics':
+            # Exposição das métricas no formato texto do Prometheus
+            body = get_metrics().render_prometheus().encode('utf-8')
             self.send_response(200)
-            self.send_header('Content-type', 'application/json')
+            self.send_header('Content-type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
             self.end_headers()
-            
-            timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            response = f'{{"status": "healthy", "timestamp": "{timestamp}"}}'
-            self.wfile.write(response.encode('utf-8'))
-            logger.debug(f"Healthcheck respondido: {response}")
+            self.wfile.write(body)
         elif self.path == '/':
             # Página inicial simples
             self.send_response(200)
@@ -61,7 +148,7 @@ class HealthCheckHandler(http.server.SimpleHTTPRequestHandler):
                     <p><strong>Horário:</strong> {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>
                 </div>
                 <p>O sistema está monitorando emails e enviando notificações.</p>
-                <p><a href="/health">Verificar Saúde do Sistema</a></p>
+                <p><a href="/health">Verificar Saúde do Sistema</a> | <a href="/metrics">Métricas</a></p>
             </body>
             </html>
             """
@@ -73,6 +160,148 @@ class HealthCheckHandler(http.server.SimpleHTTPRequestHandler):
             self.end_headers()
             self.wfile.write(b'Not Found')
             
+    def do_POST(self):
+        """Processa requisições POST (webhooks do Telegram e rotas administrativas)"""
+        if self._dispatch_wsgi():
+            return
+        if self.path.startswith(ADMIN_PATH_PREFIX):
+            self._handle_admin('POST')
+            return
+        if not self.path.startswith(WEBHOOK_PATH_PREFIX):
+            self._send_json(404, {'ok': False, 'error': 'not found'})
+            return
+            
+        route = _webhook_routes.get(self.path[len(WEBHOOK_PATH_PREFIX):])
+        if not route:
+            self._send_json(404, {'ok': False, 'error': 'unknown bot'})
+            return
+            
+        received_secret = self.headers.get('X-Telegram-Bot-Api-Secret-Token', '')
+        if not hmac.compare_digest(received_secret, route['secret']):
+            logger.warning(f"Webhook rejeitado por secret_token inválido: {self.path}")
+            self._send_json(403, {'ok': False, 'error': 'forbidden'})
+            return
+            
+        length = int(self.headers.get('Content-Length') or 0)
+        if length <= 0 or length > MAX_WEBHOOK_BODY:
+            self._send_json(413 if length > MAX_WEBHOOK_BODY else 400, {'ok': False})
+            return
+            
+        try:
+            update = json.loads(self.rfile.read(length))
+        except ValueError:
+            self._send_json(400, {'ok': False, 'error': 'invalid json'})
+            return
+            
+        # Fast-ack: confirma ao Telegram antes de processar o comando
+        self._send_json(200, {'ok': True})
+        _webhook_executor.submit(_process_webhook_update, route, update)
+        
+    def do_PUT(self):
+        if not self._dispatch_wsgi():
+            self._send_json(404, {'ok': False, 'error': 'not found'})
+
+    def do_DELETE(self):
+        if not self._dispatch_wsgi():
+            self._send_json(404, {'ok': False, 'error': 'not found'})
+
+    def do_OPTIONS(self):
+        if not self._dispatch_wsgi():
+            self._send_json(404, {'ok': False, 'error': 'not found'})
+
+    def _dispatch_wsgi(self):
+        """Encaminha a requisição à aplicação WSGI montada no caminho, se houver"""
+        app = _mounted_app(self.path)
+        if app is None:
+            return False
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > MAX_API_BODY:
+            self._send_json(413, {'ok': False, 'error': 'payload too large'})
+            return True
+        url = urlsplit(self.path)
+        environ = {
+            'REQUEST_METHOD': self.command,
+            'SCRIPT_NAME': '',
+            'PATH_INFO': unquote(url.path),
+            'QUERY_STRING': url.query,
+            'SERVER_NAME': str(self.server.server_address[0]),
+            'SERVER_PORT': str(self.server.server_address[1]),
+            'SERVER_PROTOCOL': self.request_version,
+            'REMOTE_ADDR': self.client_address[0],
+            'CONTENT_TYPE': self.headers.get('Content-Type', ''),
+            'CONTENT_LENGTH': str(length),
+            'wsgi.url_scheme': 'http',
+        }
+        for key, value in self.headers.items():
+            name = 'HTTP_' + key.upper().replace('-', '_')
+            if name not in ('HTTP_CONTENT_TYPE', 'HTTP_CONTENT_LENGTH'):
+                environ[name] = value
+        # ServerHandler (wsgiref) escreve status/cabeçalhos e envia o corpo em partes,
+        # o que também atende respostas em streaming
+        handler = ServerHandler(self.rfile, self.wfile, sys.stderr, environ, multithread=True)
+        handler.request_handler = self
+        handler.run(app)
+        return True
+
+    def _handle_admin(self, method):
+        """
+        Rotas de diagnóstico, habilitadas apenas quando ADMIN_TOKEN está definido:
+        GET  /admin/profile?seconds=N&top=K     amostragem de CPU por N segundos
+        POST /admin/tracemalloc/start|stop      liga/desliga o rastreamento de memória
+        GET  /admin/tracemalloc/snapshot?top=K  maiores pontos de alocação (diferença para o snapshot anterior)
+        POST /admin/patterns/validate           valida e pontua padrões de alerta ({"patterns": [...]})
+        """
+        admin_token = os.getenv('ADMIN_TOKEN', '')
+        if not admin_token:
+            self._send_json(404, {'ok': False, 'error': 'not found'})
+            return
+        if not hmac.compare_digest(self.headers.get('X-Admin-Token', ''), admin_token):
+            logger.warning(f"Acesso administrativo negado: {method} {self.path}")
+            self._send_json(403, {'ok': False, 'error': 'forbidden'})
+            return
+            
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        route = (method, url.path.rstrip('/'))
+        tracker = get_memory_tracker()
+        try:
+            if route == ('GET', '/admin/profile'):
+                seconds = _query_int(query, 'seconds', 10, maximum=MAX_PROFILE_SECONDS)
+                logger.info(f"Perfil de CPU solicitado por {seconds}s")
+                result = sample_cpu(seconds, top=_query_int(query, 'top', 25))
+            elif route == ('POST', '/admin/tracemalloc/start'):
+                result = tracker.start(_query_int(query, 'frames', 10, maximum=50))
+            elif route == ('POST', '/admin/tracemalloc/stop'):
+                result = tracker.stop()
+            elif route == ('GET', '/admin/tracemalloc/snapshot'):
+                result = tracker.snapshot(_query_int(query, 'top', 20))
+            elif route == ('GET', '/admin/tracemalloc'):
+                result = tracker.status()
+            elif route == ('POST', '/admin/patterns/validate'):
+                length = int(self.headers.get('Content-Length') or 0)
+                try:
+                    patterns = json.loads(self.rfile.read(min(length, MAX_WEBHOOK_BODY)) or b'{}').get('patterns', [])
+                except (ValueError, AttributeError):
+                    self._send_json(400, {'ok': False, 'error': 'invalid json'})
+                    return
+                checks = [validate_pattern(pattern).to_dict() for pattern in patterns]
+                result = {'valid': all(check['ok'] for check in checks), 'patterns': checks}
+            else:
+                self._send_json(404, {'ok': False, 'error': 'not found'})
+                return
+        except (ProfilerBusyError, RuntimeError) as e:
+            self._send_json(409, {'ok': False, 'error': str(e)})
+            return
+        self._send_json(200, {'ok': True, **result})
+        
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+            
     def log_message(self, format, *args):
         """Sobrescreve o método de log para usar o nosso logger"""
         try:
@@ -93,6 +322,8 @@ def start_health_server(port=5000, bind="0.0.0.0"):
         # Configura e inicia o servidor HTTP
         handler = HealthCheckHandler
         httpd = socketserver.ThreadingTCPServer((bind, port), handler)
+        # Conexões longas (SSE do painel) não podem impedir o encerramento do processo
+        httpd.daemon_threads = True
         
         logger.info(f"Iniciando servidor de health check na porta {port}")
         server_thread = threading.Thread(target=httpd.serve_forever)
@@ -107,6 +338,15 @@ def start_health_server(port=5000, bind="0.0.0.0"):
 
 if __name__ == "__main__":
     # Teste standalone
+    os.makedirs('logs', exist_ok=True)
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler('logs/health_server.log'),
+            logging.StreamHandler(sys.stdout)
+        ]
+    )
     server = start_health_server()
     try:
         logger.info("Pressione Ctrl+C para encerrar...")
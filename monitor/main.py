@@ -13,21 +13,29 @@ import os
 from datetime import datetime
 from app.core.telegram_client import TelegramClient
 from app.core.email_handler import EmailHandler
+from app.core.update_poller import start_update_pollers
+from app.core.telegram_bot_commands import CommandScope, set_command_scope
+from app.core.heartbeat import get_heartbeats, start_watchdog, SCHEDULER
+from app.core.user_model import UserModel
+from app.core.recipient_resolver import RecipientResolver
+from app.core.alert_history import AlertHistoryStore, set_alert_history
+from app.core.metrics_store import MetricsStore, set_metrics_store
+from app.core.rolling_stats import RollingStats, set_rolling_stats, DEFAULT_HISTORY_SIZE
+from app.core.alert_classifier import load_alerts_config
+from app.core.sender_sketch import SenderAnalytics, set_sender_analytics, mongo_persister, mongo_loader
+from app.core.flood_guard import FloodGuard, set_flood_guard
+from app.core.near_duplicate import NearDuplicateIndex, set_near_duplicate_index
+from app.core.thread_index import ThreadIndex, set_thread_index
+from app.core.volume_anomaly import VolumeAnomalyDetector, set_volume_anomaly_detector, central_chat_notifier
+from pymongo import MongoClient
 from config_manager import send_system_startup_notification, send_system_shutdown_notification
-from health_server import start_health_server  # Importa o servidor de health check
-
-# Configura log directory
-os.makedirs('logs', exist_ok=True)
-
-# Configura o logger para nível DEBUG para capturar informações mais detalhadas
-logging.basicConfig(
-    level=logging.DEBUG,  # Alterado de INFO para DEBUG
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('logs/wegnots.log'),
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+from health_server import start_health_server, setup_telegram_webhooks, mount_wsgi_app  # Importa o servidor de health check
+from app.config.logging_config import build_log_config, setup_logging, stop_logging
+
+# Configura o logging fora do caminho crítico: fila assíncrona, rotação por
+# tamanho (MAX_LOG_SIZE/LOG_BACKUP_COUNT) e limitação de taxa por mensagem.
+# Substitui os handlers que config_manager/health_server registram na importação.
+setup_logging(build_log_config())
 logger = logging.getLogger('wegnots')
 
 # Estado global para controle de execução
@@ -82,6 +90,195 @@ def load_config():
     
     return imap_configs, telegram_config, config
 
+def collect_bot_tokens(telegram_config, imap_configs):
+    """Retorna os tokens de bot distintos (padrão + personalizados por conta)"""
+    tokens = [telegram_config.get('token')]
+    tokens.extend(config.get('telegram_token') for config in imap_configs.values())
+    return [token for token in dict.fromkeys(tokens) if token]
+
+def configure_command_scope(telegram_config, imap_configs):
+    """
+    Define quais contas cada chat vê em /status e /remetentes: o chat padrão e os
+    de TELEGRAM_ADMIN_CHAT_IDS veem todas; os demais, só as contas roteadas a eles
+    """
+    admin_chats = [chat.strip() for chat in os.getenv('TELEGRAM_ADMIN_CHAT_IDS', '').split(',') if chat.strip()]
+    scope = CommandScope.from_config(telegram_config, imap_configs, admin_chats)
+    set_command_scope(scope)
+    return scope
+
+def connect_mongodb():
+    """Conecta ao MongoDB de MONGODB_URI; retorna None se não configurado ou indisponível"""
+    uri = os.getenv('MONGODB_URI')
+    if not uri:
+        return None
+    try:
+        client = MongoClient(uri, serverSelectionTimeoutMS=5000)
+        client.admin.command('ping')
+        logger.info("Conectado ao MongoDB")
+        return client
+    except Exception as e:
+        logger.warning(f"MongoDB indisponível ({e}); histórico e regras de destinatários desativados")
+        return None
+
+def start_recipient_resolver(mongo_client):
+    """
+    Carrega as regras de notificação dos usuários do MongoDB em memória, quando
+    RECIPIENT_RULES_ENABLED=true.
+    """
+    if mongo_client is None or os.getenv('RECIPIENT_RULES_ENABLED', 'false').lower() != 'true':
+        return None
+    try:
+        user_model = UserModel(mongo_client)
+        if os.getenv('RECIPIENT_RULES_CACHE', 'true').lower() != 'true':
+            # Sem cache: uma consulta em lote por ciclo
+            return user_model
+        resolver = RecipientResolver(user_model.collection, poll_interval=float(os.getenv('RECIPIENT_REFRESH_INTERVAL', 60)))
+        return resolver.start()
+    except Exception as e:
+        logger.error(f"Não foi possível carregar os destinatários do MongoDB: {e}")
+        return None
+
+def start_alert_history(mongo_client):
+    """Inicia a gravação em lote do histórico de alertas (ALERT_HISTORY_ENABLED, padrão true)"""
+    if mongo_client is None or os.getenv('ALERT_HISTORY_ENABLED', 'true').lower() != 'true':
+        return None
+    try:
+        store = AlertHistoryStore.from_client(mongo_client).start()
+        set_alert_history(store)
+        return store
+    except Exception as e:
+        logger.error(f"Não foi possível iniciar o histórico de alertas: {e}")
+        return None
+
+def start_metrics_store(mongo_client):
+    """Inicia o histórico de métricas no MongoDB (METRICS_HISTORY_ENABLED, padrão true)"""
+    if mongo_client is None or os.getenv('METRICS_HISTORY_ENABLED', 'true').lower() != 'true':
+        return None
+    try:
+        store = MetricsStore(
+            mongo_client.wegnots,
+            flush_interval=float(os.getenv('METRICS_FLUSH_INTERVAL', 60)),
+            raw_retention_days=int(os.getenv('METRICS_RAW_RETENTION_DAYS', 30)),
+            timezone_name=os.getenv('METRICS_TIMEZONE', 'America/Sao_Paulo')
+        ).start()
+        set_metrics_store(store)
+        return store
+    except Exception as e:
+        logger.error(f"Não foi possível iniciar o histórico de métricas: {e}")
+        return None
+
+def start_rolling_stats(telegram_client):
+    """
+    Contadores por minuto/hora/dia (stats_history_size do config.json), com
+    checkpoint em disco e resumo diário às system.daily_summary_time
+    """
+    system = load_alerts_config().get('system', {})
+    stats = RollingStats(
+        history_size=int(system.get('stats_history_size', DEFAULT_HISTORY_SIZE)),
+        path=os.getenv('STATS_CHECKPOINT_PATH', 'data/rolling_stats.json')
+    )
+    if stats.load():
+        logger.info("Contadores restaurados do último checkpoint")
+    set_rolling_stats(stats)
+    summary_time = system.get('daily_summary_time') if os.getenv('DAILY_SUMMARY_ENABLED', 'true').lower() == 'true' else None
+    return stats.start(
+        checkpoint_interval=float(os.getenv('STATS_CHECKPOINT_INTERVAL', 60)),
+        telegram_client=telegram_client,
+        summary_time=summary_time
+    )
+
+def start_sender_analytics(mongo_client):
+    """
+    Sketches de remetentes por conta; o resumo de cada dia é gravado em sender_stats
+    quando há MongoDB, e o estado do dia corrente é restaurado na inicialização
+    """
+    analytics = SenderAnalytics()
+    if mongo_client is not None:
+        try:
+            analytics.persist = mongo_persister(mongo_client.wegnots)
+            restored = analytics.restore(mongo_loader(mongo_client.wegnots)(analytics.day))
+            if restored:
+                logger.info(f"Análise de remetentes do dia restaurada ({restored} conta(s))")
+        except Exception as e:
+            logger.error(f"Análise de remetentes sem persistência no MongoDB: {e}")
+    set_sender_analytics(analytics)
+    return analytics
+
+def start_volume_anomaly(mongo_client, telegram_client):
+    """
+    Detecção de inundação/silêncio por conta (VOLUME_ANOMALY_ENABLED, padrão true);
+    os meta-alertas vão para o chat do servidor central
+    """
+    if os.getenv('VOLUME_ANOMALY_ENABLED', 'true').lower() != 'true':
+        return None
+    user_model = None
+    if mongo_client is not None:
+        try:
+            user_model = UserModel(mongo_client)
+        except Exception as e:
+            logger.error(f"Alertas de volume sem consulta ao servidor central: {e}")
+    detector = VolumeAnomalyDetector(
+        notify=central_chat_notifier(telegram_client, user_model),
+        threshold=float(os.getenv('VOLUME_ANOMALY_THRESHOLD', 4.0)),
+        cooldown=float(os.getenv('VOLUME_ANOMALY_COOLDOWN', 3600)),
+        max_alerts_per_hour=int(os.getenv('VOLUME_ANOMALY_MAX_PER_HOUR', 5)),
+        path=os.getenv('VOLUME_BASELINE_PATH', 'data/volume_baseline.json')
+    )
+    if detector.load():
+        logger.info("Linha de base de volume restaurada")
+    set_volume_anomaly_detector(detector)
+    return detector
+
+def start_flood_guard():
+    """Limite de alertas por (conta, remetente) em janela deslizante (FLOOD_GUARD_ENABLED, padrão true)"""
+    if os.getenv('FLOOD_GUARD_ENABLED', 'true').lower() != 'true':
+        return None
+    guard = FloodGuard(
+        limit=int(os.getenv('FLOOD_GUARD_LIMIT', 20)),
+        window=float(os.getenv('FLOOD_GUARD_WINDOW', 600)),
+        summary_interval=float(os.getenv('FLOOD_GUARD_SUMMARY_INTERVAL', 300))
+    )
+    set_flood_guard(guard)
+    return guard
+
+def start_near_duplicate_index():
+    """Agrupamento de alertas quase duplicados por chat (NEAR_DUPLICATE_ENABLED, padrão true)"""
+    if os.getenv('NEAR_DUPLICATE_ENABLED', 'true').lower() != 'true':
+        return None
+    index = NearDuplicateIndex(
+        window=float(os.getenv('NEAR_DUPLICATE_WINDOW', 600)),
+        max_distance=int(os.getenv('NEAR_DUPLICATE_MAX_DISTANCE', 3))
+    )
+    set_near_duplicate_index(index)
+    return index
+
+def start_thread_index():
+    """Respostas de e-mail como replies da mensagem original no Telegram (EMAIL_THREADING_ENABLED, padrão true)"""
+    if os.getenv('EMAIL_THREADING_ENABLED', 'true').lower() != 'true':
+        return None
+    index = ThreadIndex(max_entries=int(os.getenv('EMAIL_THREADING_MAX_ENTRIES', 5000)))
+    set_thread_index(index)
+    return index
+
+def start_admin_api(mongo_client, telegram_client):
+    """
+    Monta a API do painel administrativo em /api/ no servidor de health check
+    (ADMIN_API_ENABLED, padrão true); exige ADMIN_TOKEN, sem ele a API não é montada
+    """
+    if os.getenv('ADMIN_API_ENABLED', 'true').lower() != 'true':
+        return None
+    if not os.getenv('ADMIN_TOKEN'):
+        logger.warning("API do painel não montada: defina ADMIN_TOKEN para habilitá-la")
+        return None
+    try:
+        from app import create_app
+        app = create_app(mongo_client, telegram_client=telegram_client)
+        mount_wsgi_app('/api/', app)
+        return app
+    except Exception as e:
+        logger.error(f"Não foi possível iniciar a API do painel: {e}")
+        return None
+
 def main():
     """Função principal do monitor de e-mails"""
     # Carrega toda a configuração uma única vez
@@ -127,8 +324,38 @@ def main():
         logger.info("Inicializando mapeamentos de token -> chat_id...")
         telegram_client.initialize_chat_mappings(imap_configs)
         
+        # Inicia o recebimento de comandos do bot: long polling ou webhook no servidor de health check
+        configure_command_scope(telegram_config, imap_configs)
+        update_pollers = None
+        update_mode = os.getenv('TELEGRAM_UPDATE_MODE', 'polling').lower()
+        bot_tokens = collect_bot_tokens(telegram_config, imap_configs)
+        if update_mode == 'webhook' and health_server and os.getenv('TELEGRAM_WEBHOOK_URL'):
+            setup_telegram_webhooks(bot_tokens, os.getenv('TELEGRAM_WEBHOOK_URL'), os.getenv('TELEGRAM_WEBHOOK_SECRET'))
+        elif update_mode in ('polling', 'webhook'):
+            if update_mode == 'webhook':
+                logger.warning("Modo webhook requer TELEGRAM_WEBHOOK_URL e o servidor de health check. Usando long polling.")
+            update_pollers = start_update_pollers(bot_tokens)
+        
+        # Loop principal com monitoramento aprimorado
+        check_interval = 60  # 1 minuto
+        
         # Inicializa handler de e-mail e configura todas as conexões
-        email_handler = EmailHandler(telegram_client)
+        mongo_client = connect_mongodb()
+        recipient_resolver = start_recipient_resolver(mongo_client)
+        alert_history = start_alert_history(mongo_client)
+        metrics_store = start_metrics_store(mongo_client)
+        rolling_stats = start_rolling_stats(telegram_client)
+        sender_analytics = start_sender_analytics(mongo_client)
+        volume_anomaly = start_volume_anomaly(mongo_client, telegram_client)
+        flood_guard = start_flood_guard()
+        near_duplicates = start_near_duplicate_index()
+        thread_index = start_thread_index()
+        if health_server:
+            start_admin_api(mongo_client, telegram_client)
+        email_handler = EmailHandler(telegram_client, check_interval=check_interval,
+                                     recipients=recipient_resolver, history=alert_history, stats=rolling_stats,
+                                     senders=sender_analytics, anomalies=volume_anomaly, flood_guard=flood_guard,
+                                     duplicates=near_duplicates, threads=thread_index)
         email_handler.setup_connections(imap_configs)
         
         # Tenta conectar aos servidores IMAP
@@ -143,14 +370,21 @@ def main():
             )
             return 1
         
-        # Loop principal com monitoramento aprimorado
-        check_interval = 60  # 1 minuto
+        # Heartbeat do agendador: /live e /ready dependem dele, e o watchdog
+        # encerra o processo se o loop ficar travado (o contêiner é reiniciado)
+        heartbeats = get_heartbeats()
+        heartbeats.register(SCHEDULER, check_interval)
+        max_missed = int(os.getenv('WATCHDOG_MAX_MISSED', 3))
+        if os.getenv('WATCHDOG_ENABLED', 'true').lower() == 'true':
+            start_watchdog(heartbeats, max_missed=max_missed)
+        
         last_check_time = 0
         consecutive_failures = 0
         max_failures = 3
         
         while running:
             current_time = time.time()
+            heartbeats.beat(SCHEDULER)
             
             if current_time - last_check_time >= check_interval:
                 try:
@@ -177,6 +411,18 @@ def main():
         logger.info("Loop de monitoramento encerrado, realizando limpeza...")
         
         # Encerramento gracioso
+        if update_pollers:
+            update_pollers.stop()
+        if isinstance(recipient_resolver, RecipientResolver):
+            recipient_resolver.stop()
+        if alert_history:
+            alert_history.stop()
+        if metrics_store:
+            metrics_store.stop()
+        rolling_stats.stop()
+        sender_analytics.flush()
+        if volume_anomaly:
+            volume_anomaly.save()
         email_handler.shutdown()
         
         # Envia notificação de encerramento através do novo sistema
@@ -219,4 +465,5 @@ def main():
 if __name__ == "__main__":
     exit_code = main()
     logger.info(f"Programa encerrado com código de saída: {exit_code}")
+    stop_logging()
     sys.exit(exit_code)
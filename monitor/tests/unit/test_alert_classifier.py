@@ -0,0 +1,72 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+import json
+import tempfile
+import unittest
+from app.core.alert_classifier import (AhoCorasick, AlertClassifier, fold_text, load_alerts_config,
+                                       DEFAULT_ALERT_TYPE)
+
+LEVELS = {
+    'critical': ['urgente', 'crítico', 'emergência'],
+    'important': ['importante', 'atenção', 'alerta'],
+    'low': ['informação', 'atualização', 'concluído'],
+}
+
+
+class TestAhoCorasick(unittest.TestCase):
+    def test_overlapping_matches(self):
+        automaton = AhoCorasick()
+        for word in ('he', 'she', 'his', 'hers'):
+            automaton.add(word, word)
+        found = sorted((start, word) for start, _end, word in automaton.iter_matches('ushers'))
+        self.assertEqual(found, [(1, 'she'), (2, 'he'), (2, 'hers')])
+
+
+class TestAlertClassifier(unittest.TestCase):
+    def setUp(self):
+        self.classifier = AlertClassifier(LEVELS, {'critical': [r'c[aâ]mera\s+\d+\s+offline'], 'low': ['[invalido']})
+
+    def test_accent_and_case_folding(self):
+        self.assertEqual(fold_text('EMERGÊNCIA Crítico'), 'emergencia critico')
+        result = self.classifier.classify('CRITICO: falha no servidor')
+        self.assertEqual(result.level, 'critical')
+        self.assertEqual(result.priority, 'critical')
+        self.assertEqual(result.matches, ['crítico'])
+
+    def test_most_severe_level_wins(self):
+        result = self.classifier.classify('Atualização importante', 'Situação urgente no portão')
+        self.assertEqual(result.level, 'critical')
+
+    def test_word_start_only(self):
+        self.assertIsNone(self.classifier.classify('Relatório desalertado').level)
+        self.assertEqual(self.classifier.classify('Alertas do dia').level, 'important')
+
+    def test_regex_patterns(self):
+        result = self.classifier.classify('Status', 'Câmera 12 OFFLINE desde 10h')
+        self.assertEqual(result.level, 'critical')
+        self.assertEqual(len(self.classifier.patterns), 1)
+        self.assertEqual(len(self.classifier.patterns.rejected), 1)
+
+    def test_body_preview_limit(self):
+        classifier = AlertClassifier(LEVELS, preview_chars=20)
+        self.assertIsNone(classifier.classify('Relatório', 'x' * 50 + ' urgente').level)
+
+    def test_default_classification(self):
+        result = self.classifier.classify('Olá', None)
+        self.assertIsNone(result.level)
+        self.assertEqual(result.alert_type, DEFAULT_ALERT_TYPE)
+        self.assertEqual(result.priority, 'medium')
+
+    def test_load_config(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'config.json')
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump({'alerts': {'levels': LEVELS, 'patterns': {}}}, f)
+            classifier = AlertClassifier.from_config(load_alerts_config(path))
+        self.assertEqual(classifier.keyword_count, 9)
+
+
+if __name__ == '__main__':
+    unittest.main()
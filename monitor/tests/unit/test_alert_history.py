@@ -0,0 +1,113 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+import unittest
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+from bson import ObjectId
+from app.core import alert_history
+from app.core.alert_history import AlertHistoryStore, compress_preview, decompress_preview, PREVIEW_CODEC
+from app.core.alert_classifier import AlertClassifier
+from app.core.telegram_bot_commands import TelegramCommands
+from app.core.tracing import AlertTrace
+
+
+def email_data(index=0):
+    trace = AlertTrace('a@x.com')
+    trace.destination = '123:999'
+    return {
+        'username': 'a@x.com', 'server': 'imap.x.com', 'email_key': f'imap.x.com:a@x.com:{index}',
+        'subject': f'URGENTE câmera {index}', 'from': 'Câmera <cam@cameras.com>', 'body': 'corpo ' * 50,
+        'trace': trace, 'classification': AlertClassifier({'critical': ['urgente']}).classify('urgente'),
+    }
+
+
+class TestAlertHistoryStore(unittest.TestCase):
+    def setUp(self):
+        self.collection = MagicMock()
+        self.store = AlertHistoryStore(self.collection, batch_size=3)
+
+    def test_preview_round_trip(self):
+        text = 'Alarme disparado na zona 3 ' * 40
+        packed = compress_preview(text)
+        self.assertLess(len(packed), len(text))
+        self.assertEqual(decompress_preview(packed, PREVIEW_CODEC), text[:2000])
+
+    def test_documents_and_batched_bulk_write(self):
+        for index in range(5):
+            self.store.record(email_data(index), delivered=index != 4)
+        self.assertTrue(self.store._wakeup.is_set())
+
+        self.assertEqual(self.store.flush(), 5)
+        self.collection.bulk_write.assert_called_once()
+        requests, = self.collection.bulk_write.call_args[0]
+        document = requests[0]._doc
+        self.assertEqual(len(requests), 5)
+        self.assertEqual(document['sender'], 'cam@cameras.com')
+        self.assertEqual(document['chat_id'], '999')
+        self.assertEqual(document['level'], 'critical')
+        self.assertNotIn('body', document)
+        self.assertEqual(document['outcome'], 'delivered')
+        self.assertEqual(requests[4]._doc['outcome'], 'failed')
+
+    def test_suppressed_outcome(self):
+        self.store.record(email_data(), delivered=False, chat_id='42', outcome='suppressed')
+        self.store.flush()
+        document = self.collection.bulk_write.call_args[0][0][0]._doc
+        self.assertFalse(document['delivered'])
+        self.assertEqual(document['outcome'], 'suppressed')
+        self.assertEqual(document['chat_id'], '42')
+        self.assertNotIn('original', document)
+
+    def test_coalesced_outcome_references_original(self):
+        original = {'email_key': 'u@x:7', 'subject': 'Falha na bomba'}
+        self.store.record(email_data(), delivered=False, outcome='coalesced', original=original)
+        self.store.flush()
+        document = self.collection.bulk_write.call_args[0][0][0]._doc
+        self.assertEqual(document['outcome'], 'coalesced')
+        self.assertEqual(document['original'], original)
+
+    def test_failed_write_is_kept_for_retry(self):
+        self.collection.bulk_write.side_effect = Exception('mongo fora')
+        self.store.record(email_data(), delivered=True)
+        self.assertEqual(self.store.flush(), 0)
+        self.assertEqual(len(self.store._buffer), 1)
+
+    def test_full_buffer_drops_oldest(self):
+        store = AlertHistoryStore(self.collection, max_buffer=2)
+        for index in range(3):
+            store.record(email_data(index), delivered=True)
+        self.assertEqual([document['subject'] for document in store._buffer], ['URGENTE câmera 1', 'URGENTE câmera 2'])
+        self.assertEqual(store.dropped, 1)
+
+    def test_search_query(self):
+        cursor = self.collection.find.return_value.sort.return_value.limit.return_value
+        cursor.__iter__.return_value = iter([])
+        last = {'ts': datetime(2025, 7, 1), '_id': str(ObjectId())}
+        self.store.search(account='a@x.com', text='câmera', before=last, limit=20)
+
+        query, projection = self.collection.find.call_args[0]
+        self.assertEqual(query['account'], 'a@x.com')
+        self.assertEqual(query['$text'], {'$search': 'câmera'})
+        self.assertEqual(query['$or'][0], {'ts': {'$lt': last['ts']}})
+        self.assertEqual(projection, {'preview': 0})
+
+
+class TestHistoryCommand(unittest.TestCase):
+    @patch('app.core.telegram_bot_commands.requests.post')
+    def test_history_is_scoped_to_chat(self, post):
+        post.return_value.status_code = 200
+        store = MagicMock()
+        store.search.return_value = [{'ts': datetime(2025, 7, 1, 12, 0), 'delivered': True,
+                                      'subject': 'URGENTE_porta', 'sender': 'cam@cameras.com'}]
+        with patch.object(alert_history, '_store', store):
+            TelegramCommands('123:ABC', registry=MagicMock()).process_update(
+                {'message': {'chat': {'id': 999}, 'text': '/historico porta'}})
+
+        store.search.assert_called_once_with(chat_id='999', text='porta', limit=10)
+        self.assertIn('URGENTE\\_porta', post.call_args[1]['json']['text'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+import unittest
+from app.core.alert_templates import TemplateRegistry
+
+TEMPLATE = {
+    'name': 'alarme_equipamento',
+    'senders': ['alarmes@plant.com', '*@cameras.com'],
+    'fields': {
+        'Equipamento': 'Equipamento',
+        'Código': {'pattern': r'C[oó]digo\s*[:=]\s*(\S+)'},
+        'Severidade': 'Severidade',
+        'Site': {'line': 1, 'start': 5},
+    },
+    'severity_field': 'Severidade',
+    'levels': {'alta': 'critical', 'média': 'important'},
+    'dedupe_fields': ['Equipamento', 'Código'],
+}
+BODY = "\nSITE Planta Norte\nEquipamento: Forno 2\nCódigo = E42\nSEVERIDADE: ALTA\nHorário: 10:32:01\n"
+
+
+class TestTemplateRegistry(unittest.TestCase):
+    def setUp(self):
+        self.registry = TemplateRegistry([TEMPLATE])
+
+    def test_extracts_fields_level_and_dedupe_key(self):
+        extraction = self.registry.extract('alarmes@plant.com', BODY)
+        self.assertEqual(extraction.fields, {'Equipamento': 'Forno 2', 'Código': 'E42',
+                                             'Severidade': 'ALTA', 'Site': 'Planta Norte'})
+        self.assertEqual(extraction.level, 'critical')
+        self.assertEqual(extraction.dedupe_key, 'alarme_equipamento Equipamento=Forno 2 Código=E42')
+        self.assertEqual(extraction.render().splitlines()[0], 'Equipamento: Forno 2')
+
+    def test_sender_lookup_is_cached_and_supports_domain_wildcard(self):
+        self.assertIsNotNone(self.registry.for_sender('cam7@cameras.com'))
+        self.assertIsNone(self.registry.for_sender('outro@x.com'))
+        self.assertIn('outro@x.com', self.registry._cache)
+        self.assertIsNone(self.registry.extract('outro@x.com', BODY))
+
+    def test_unmatched_layout_falls_back(self):
+        self.assertIsNone(self.registry.extract('alarmes@plant.com', ''))
+        extraction = self.registry.extract('alarmes@plant.com', 'Equipamento: Bomba\nSeveridade: desconhecida')
+        self.assertIsNone(extraction.level)
+        self.assertIsNone(extraction.dedupe_key)
+
+    def test_invalid_templates_are_skipped(self):
+        registry = TemplateRegistry([
+            {'name': 'ruim', 'senders': ['a@x.com'], 'fields': {'x': {'pattern': '(a+)+$'}}},
+            {'name': 'vazio', 'senders': ['b@x.com'], 'fields': {'x': {}}},
+            TEMPLATE,
+        ])
+        self.assertEqual([template.name for template in registry.templates], ['alarme_equipamento'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+import unittest
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+from bson import ObjectId
+from app import api as api_module
+from app.api import create_app
+from app.core.event_bus import EventBus
+
+IDS = [ObjectId() for _ in range(3)]
+USERS = [{'_id': _id, 'email': f'user{i}@x.com', 'name': f'Usuário {i}', 'chat_id': str(100 + i),
+          'created_at': datetime(2024, 1, 1), 'notification_rules': [{'sender': '*@cameras.com'}]}
+         for i, _id in enumerate(IDS)]
+
+
+class TestAdminApi(unittest.TestCase):
+    def setUp(self):
+        environ = patch.dict(os.environ, {'ADMIN_TOKEN': 'chave'})
+        environ.start()
+        self.addCleanup(environ.stop)
+        self.app = create_app()
+        self.users = MagicMock()
+        self.app.config['USER_MODEL'] = self.users
+        self.cursor = self.users.collection.find.return_value.sort.return_value.limit
+        self.cursor.return_value = [dict(user) for user in USERS]
+        self.client = self.app.test_client()
+        self.client.environ_base['HTTP_AUTHORIZATION'] = 'Bearer chave'
+
+    def test_keyset_pagination_and_projection(self):
+        response = self.client.get('/api/emails?limit=2&fields=id,email')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json(), [{'id': str(IDS[0]), 'email': 'user0@x.com'},
+                                               {'id': str(IDS[1]), 'email': 'user1@x.com'}])
+        self.assertEqual(response.headers['X-Next-Cursor'], str(IDS[1]))
+        query, projection = self.users.collection.find.call_args[0]
+        self.assertEqual((query, projection), ({}, {'_id': 1, 'email': 1}))
+        self.cursor.assert_called_with(3)
+
+        self.cursor.return_value = [dict(USERS[2])]
+        response = self.client.get(f'/api/emails?limit=2&after={IDS[1]}')
+        self.assertNotIn('X-Next-Cursor', response.headers)
+        self.assertEqual(self.users.collection.find.call_args[0][0], {'_id': {'$gt': IDS[1]}})
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.client.get('/api/emails?fields=senha').status_code, 400)
+        self.assertEqual(self.client.get('/api/emails?after=xyz').status_code, 400)
+
+    def test_etag_returns_304_when_unchanged(self):
+        first = self.client.get('/api/routing-rules')
+        self.assertEqual(first.get_json()[0]['senders'], ['*@cameras.com'])
+        second = self.client.get('/api/routing-rules', headers={'If-None-Match': first.headers['ETag']})
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second.data, b'')
+
+    def test_routing_rule_create_and_delete(self):
+        collection = self.users.collection
+        collection.find_one.side_effect = [{'_id': IDS[0]}, dict(USERS[0])]
+        response = self.client.post('/api/routing-rules', json={'emailId': str(IDS[0]), 'senders': ['*@Cameras.com', '']})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.get_json()['senders'], ['*@cameras.com'])
+        self.assertEqual(collection.update_one.call_args[0][1]['$set']['notification_rules'],
+                         [{'sender': '*@cameras.com'}])
+
+        collection.find_one.side_effect = [dict(USERS[1])]
+        response = self.client.post('/api/routing-rules', json={'emailId': str(IDS[1]), 'senders': ['a@x.com']})
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(self.client.post('/api/routing-rules', json={'emailId': str(IDS[1]), 'senders': []}).status_code,
+                         400)
+
+        collection.find_one.side_effect = [dict(USERS[2])]
+        self.assertEqual(self.client.delete(f'/api/routing-rules/{IDS[2]}').status_code, 204)
+        query, update = collection.update_one.call_args[0]
+        self.assertEqual((query, update['$set']['notification_rules']), ({'_id': IDS[2]}, []))
+
+    def test_token_required(self):
+        anonymous = self.app.test_client()
+        self.assertEqual(anonymous.get('/api/emails').status_code, 401)
+        self.assertEqual(anonymous.get('/api/emails', headers={'Authorization': 'Bearer errada'}).status_code, 401)
+        self.assertEqual(anonymous.get('/api/emails', headers={'X-Admin-Token': 'chave'}).status_code, 200)
+
+    def test_fails_closed_without_admin_token(self):
+        with patch.dict(os.environ, {'ADMIN_TOKEN': ''}):
+            self.assertEqual(self.client.get('/api/emails').status_code, 503)
+            self.assertEqual(self.client.delete(f'/api/emails/{IDS[0]}').status_code, 503)
+            self.users.delete_user.assert_not_called()
+
+    def test_central_server_cannot_be_deleted(self):
+        self.users.get_central_server.return_value = USERS[0]
+        self.assertEqual(self.client.delete(f'/api/emails/{IDS[0]}').status_code, 409)
+        self.users.delete_user.return_value = True
+        self.assertEqual(self.client.delete(f'/api/emails/{IDS[1]}').status_code, 204)
+        self.users.delete_user.assert_called_once_with(IDS[1])
+
+    def test_monitoring_status(self):
+        response = self.client.get('/api/monitoring/status')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.get_json()), {'imap', 'telegram', 'mongodb', 'monitoring', 'accounts'})
+
+    def test_event_stream_resumes_from_last_event_id(self):
+        bus = EventBus()
+        for index in range(3):
+            bus.publish('alert', {'n': index})
+        with patch.object(api_module, 'get_event_bus', return_value=bus):
+            response = self.client.get('/api/events', headers={'Last-Event-ID': f'{bus.epoch}-1'})
+            self.assertEqual(response.mimetype, 'text/event-stream')
+            chunks = response.response
+            self.assertEqual(next(chunks), b'retry: 5000\n\n')
+            self.assertTrue(next(chunks).startswith(f'id: {bus.epoch}-2\nevent: alert\n'.encode()))
+            self.assertTrue(next(chunks).startswith(f'id: {bus.epoch}-3\n'.encode()))
+            self.assertEqual(bus.subscriber_count(), 1)
+            response.close()
+        self.assertEqual(bus.subscriber_count(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
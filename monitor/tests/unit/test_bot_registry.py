@@ -0,0 +1,92 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+import json
+import tempfile
+import unittest
+from unittest.mock import patch, MagicMock
+from app.core.bot_registry import BotRegistry, token_hash
+from app.core.telegram_bot_commands import TelegramCommands, BOT_COMMANDS
+from app.core.telegram_client import TelegramClient
+
+TOKEN = '123456:ABCDEF'
+
+
+class TestBotRegistry(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'bot_registry.json')
+        self.registry = BotRegistry(self.path)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_persists_without_plain_token(self):
+        self.registry.store_me(TOKEN, {'username': 'wegbot'})
+        self.registry.add_chat_id(TOKEN, 42)
+
+        with open(self.path, encoding='utf-8') as f:
+            raw = f.read()
+        self.assertNotIn(TOKEN, raw)
+        self.assertIn(token_hash(TOKEN), json.loads(raw)['bots'])
+
+        reloaded = BotRegistry(self.path)
+        self.assertEqual(reloaded.get_me(TOKEN), {'username': 'wegbot'})
+        self.assertEqual(reloaded.get_chat_ids(TOKEN), ['42'])
+
+    def test_ttl_expiry(self):
+        registry = BotRegistry(self.path, me_ttl=0, chat_ttl=0)
+        registry.store_me(TOKEN, {'username': 'wegbot'})
+        registry.add_chat_id(TOKEN, '42')
+        self.assertIsNone(registry.get_me(TOKEN))
+        self.assertEqual(registry.get_chat_ids(TOKEN), [])
+
+    def test_commands_version_changes_invalidate(self):
+        self.registry.mark_commands(TOKEN, BOT_COMMANDS)
+        self.assertTrue(self.registry.commands_up_to_date(TOKEN, BOT_COMMANDS))
+        changed = BOT_COMMANDS + [{'command': 'novo', 'description': 'Novo comando'}]
+        self.assertFalse(self.registry.commands_up_to_date(TOKEN, changed))
+
+    @patch('app.core.telegram_bot_commands.requests.post')
+    def test_set_bot_commands_skips_when_registered(self, mock_post):
+        mock_post.return_value.status_code = 200
+        commands = TelegramCommands(TOKEN, registry=self.registry)
+
+        self.assertTrue(commands.set_bot_commands())
+        self.assertTrue(commands.set_bot_commands())
+        self.assertEqual(mock_post.call_count, 1)
+
+        self.assertTrue(commands.set_bot_commands(force=True))
+        self.assertEqual(mock_post.call_count, 2)
+
+    @patch('app.core.telegram_client.requests.get')
+    @patch('app.core.telegram_bot_commands.requests.post')
+    def test_discovery_uses_cached_chat_ids(self, mock_post, mock_get):
+        mock_post.return_value.status_code = 200
+        custom_token = '999:CUSTOM'
+        self.registry.add_chat_id(custom_token, '777')
+
+        client = TelegramClient(TOKEN, '1', registry=self.registry)
+        client.token_chat_map[custom_token] = '1'
+        client.discover_token_chat_ids()
+
+        mock_get.assert_not_called()
+        self.assertEqual(client.token_chat_map[custom_token], '777')
+
+    @patch('app.core.telegram_client.requests.get')
+    @patch('app.core.telegram_bot_commands.requests.post')
+    def test_get_token_info_cached(self, mock_post, mock_get):
+        mock_post.return_value.status_code = 200
+        response = MagicMock(status_code=200)
+        response.json.return_value = {'ok': True, 'result': {'username': 'wegbot'}}
+        mock_get.return_value = response
+
+        client = TelegramClient(TOKEN, '1', registry=self.registry)
+        self.assertEqual(client.get_token_info(TOKEN), {'username': 'wegbot'})
+        self.assertEqual(client.get_token_info(TOKEN), {'username': 'wegbot'})
+        self.assertEqual(mock_get.call_count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+import json
+import unittest
+from app.core.event_bus import EventBus
+
+
+class TestEventBus(unittest.TestCase):
+    def test_fan_out_to_subscribers(self):
+        bus = EventBus()
+        first, second = bus.subscribe(), bus.subscribe()
+        bus.publish('alert', {'account': 'a@x.com'})
+        for subscription in (first, second):
+            event = subscription.get(timeout=1)
+            self.assertEqual((event.id, event.type, event.data['account']), (1, 'alert', 'a@x.com'))
+        self.assertIsNone(first.get(timeout=0.01))
+
+    def test_resume_from_last_event_id(self):
+        bus = EventBus(history_size=10)
+        for index in range(5):
+            bus.publish('alert', {'n': index})
+        subscription = bus.subscribe(last_event_id=f'{bus.epoch}-3')
+        self.assertEqual([subscription.get(0.1).id, subscription.get(0.1).id], [4, 5])
+
+    def test_reset_when_history_no_longer_covers_gap(self):
+        bus = EventBus(history_size=3)
+        for index in range(10):
+            bus.publish('alert', {'n': index})
+        subscription = bus.subscribe(last_event_id=f'{bus.epoch}-2')
+        self.assertEqual(subscription.get(0.1).type, 'reset')
+        self.assertIsNone(subscription.get(0.01))
+
+    def test_reset_when_event_id_is_from_before_a_restart(self):
+        bus = EventBus()
+        bus.publish('alert', {'n': 1})
+        # Mesmo n de outra época, ID do formato antigo e ID malformado
+        for last_event_id in ('1000-1', '1', f'{bus.epoch}-x'):
+            subscription = bus.subscribe(last_event_id=last_event_id)
+            self.assertEqual(subscription.get(0.1).data, {'reason': 'unknown_event_id'}, last_event_id)
+            self.assertIsNone(subscription.get(0.01))
+            subscription.close()
+        subscription = bus.subscribe(last_event_id=f'{bus.epoch}-500')
+        self.assertEqual(subscription.get(0.1).type, 'reset')
+        bus.publish('alert', {'n': 2})
+        self.assertEqual(subscription.get(0.1).sse_id, f'{bus.epoch}-2')
+
+    def test_slow_client_is_dropped_without_blocking(self):
+        bus = EventBus(client_queue_size=2)
+        slow = bus.subscribe()
+        for index in range(5):
+            bus.publish('queue-depth', {'total': index})
+        self.assertTrue(slow.dropped)
+        self.assertEqual(bus.subscriber_count(), 0)
+        self.assertEqual(bus.dropped_clients, 1)
+        # O que já estava na fila ainda é entregue antes do encerramento
+        self.assertEqual([slow.get(0.1).id, slow.get(0.1).id, slow.get(0.01)], [1, 2, None])
+
+    def test_subscriber_limit_and_sse_format(self):
+        bus = EventBus(max_subscribers=1)
+        subscription = bus.subscribe()
+        self.assertIsNone(bus.subscribe())
+        subscription.close()
+        self.assertIsNotNone(bus.subscribe())
+        lines = bus.publish('account-status', {'status': 'connected'}).to_sse().splitlines()
+        self.assertEqual(lines[:2], [f'id: {bus.epoch}-1', 'event: account-status'])
+        self.assertEqual(json.loads(lines[2][len('data: '):])['status'], 'connected')
+
+
+if __name__ == '__main__':
+    unittest.main()
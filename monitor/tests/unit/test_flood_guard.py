@@ -0,0 +1,55 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+import unittest
+from app.core.flood_guard import FloodGuard, format_suppressed_summary
+
+NOW = 1_700_000_000
+
+
+class TestFloodGuard(unittest.TestCase):
+    def setUp(self):
+        self.guard = FloodGuard(limit=3, window=600, summary_interval=300)
+
+    def test_limit_per_account_and_sender(self):
+        allowed = [self.guard.allow('a@x.com', 'flood@cam.com', 'low', now=NOW + i) for i in range(5)]
+        self.assertEqual(allowed, [True, True, True, False, False])
+        self.assertTrue(self.guard.allow('a@x.com', 'outro@x.com', 'low', now=NOW + 5))
+        self.assertTrue(self.guard.allow('b@x.com', 'flood@cam.com', 'low', now=NOW + 5))
+        self.assertEqual(self.guard.suppressed(), {'a@x.com': 2})
+
+    def test_critical_alerts_are_exempt(self):
+        for i in range(5):
+            self.guard.allow('a@x.com', 'flood@cam.com', 'low', now=NOW + i)
+        self.assertTrue(self.guard.allow('a@x.com', 'flood@cam.com', 'critical', now=NOW + 10))
+
+    def test_window_slides(self):
+        for i in range(4):
+            self.guard.allow('a@x.com', 'flood@cam.com', now=NOW + i)
+        self.assertFalse(self.guard.allow('a@x.com', 'flood@cam.com', now=NOW + 599))
+        self.assertTrue(self.guard.allow('a@x.com', 'flood@cam.com', now=NOW + 600))
+
+    def test_periodic_summary(self):
+        for i in range(10):
+            self.guard.allow('a@x.com', 'flood@cam.com', subject=f'Alarme {i}',
+                             target={'chat_id': '42'}, now=NOW + i)
+        self.assertEqual(self.guard.due_summaries(now=NOW + 60), [])
+        summaries = self.guard.due_summaries(now=NOW + 303)
+        self.assertEqual(len(summaries), 1)
+        self.assertEqual((summaries[0]['suppressed'], summaries[0]['last_subject'], summaries[0]['target']),
+                         (7, 'Alarme 9', {'chat_id': '42'}))
+        self.assertIn('Mais 7 alerta(s)', format_suppressed_summary(summaries[0], 600, 3))
+        self.assertEqual(self.guard.due_summaries(now=NOW + 700), [])
+        self.assertEqual(self.guard._sources, {})
+
+    def test_summary_escapes_markdown(self):
+        message = format_suppressed_summary({'account': 'ops_team@x.com', 'sender': 'no_reply@cam.com', 'suppressed': 2,
+                                             'since': NOW, 'last_subject': 'Falha *grave* [M01]'})
+        self.assertIn('ops\\_team@x.com', message)
+        self.assertIn('no\\_reply@cam.com', message)
+        self.assertIn('Falha \\*grave\\* \\[M01]', message)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,167 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+import json
+import threading
+import unittest
+import urllib.request
+import urllib.error
+from unittest.mock import patch
+import health_server
+from app.core import heartbeat
+from app.core.heartbeat import HeartbeatMonitor
+
+
+class StubCommands:
+    """Substituto local de TelegramCommands que apenas registra os updates"""
+
+    def __init__(self):
+        self.updates = []
+        self.processed = threading.Event()
+
+    def process_update(self, update):
+        self.updates.append(update)
+        self.processed.set()
+
+
+class TestHealthServer(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = health_server.start_health_server(port=0, bind='127.0.0.1')
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def request(self, path, payload=None, headers=None, method=None):
+        data = json.dumps(payload).encode('utf-8') if payload is not None else None
+        req = urllib.request.Request(self.base_url + path, data=data, headers=headers or {}, method=method)
+        try:
+            with urllib.request.urlopen(req, timeout=5) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+    def test_health(self):
+        status, body = self.request('/health')
+        self.assertEqual(status, 200)
+        self.assertTrue(self.server.daemon_threads)
+        self.assertEqual(json.loads(body)['status'], 'healthy')
+
+    def test_ready_returns_503_with_account_detail(self):
+        monitor = HeartbeatMonitor()
+        monitor.register('scheduler', 60)
+        monitor.register('account:a@x.com', 60)
+        monitor._beats['account:a@x.com'][0] -= 1000
+
+        with patch.object(heartbeat, '_heartbeats', monitor):
+            status, body = self.request('/ready')
+            self.assertEqual(status, 503)
+            self.assertFalse(json.loads(body)['checks']['account:a@x.com']['ok'])
+
+            status, _ = self.request('/live')
+            self.assertEqual(status, 200)
+
+    def test_metrics_endpoint(self):
+        status, body = self.request('/metrics')
+        self.assertEqual(status, 200)
+        text = body.decode('utf-8')
+        self.assertIn('# TYPE wegnots_poll_duration_seconds histogram', text)
+        self.assertIn('wegnots_uptime_seconds', text)
+
+    def test_webhook_fast_ack_and_async_dispatch(self):
+        stub = StubCommands()
+        path = health_server.register_webhook('111:AAA', 'segredo', commands=stub)
+        update = {'update_id': 1, 'message': {'chat': {'id': 9}, 'text': '/help'}}
+
+        status, body = self.request(path, update, {
+            'Content-Type': 'application/json',
+            'X-Telegram-Bot-Api-Secret-Token': 'segredo'
+        })
+
+        self.assertEqual(status, 200)
+        self.assertTrue(json.loads(body)['ok'])
+        self.assertTrue(stub.processed.wait(2))
+        self.assertEqual(stub.updates, [update])
+
+    def test_webhook_rejects_wrong_secret(self):
+        stub = StubCommands()
+        path = health_server.register_webhook('222:BBB', 'segredo', commands=stub)
+
+        status, _ = self.request(path, {'update_id': 2}, {'X-Telegram-Bot-Api-Secret-Token': 'errado'})
+        self.assertEqual(status, 403)
+        status, _ = self.request(path, {'update_id': 2})
+        self.assertEqual(status, 403)
+        self.assertEqual(stub.updates, [])
+
+    def test_webhook_unknown_bot(self):
+        status, _ = self.request('/telegram/desconhecido', {'update_id': 3})
+        self.assertEqual(status, 404)
+
+    def test_webhook_secret_is_per_token(self):
+        first = health_server.webhook_secret_for('111:AAA', 'base')
+        second = health_server.webhook_secret_for('222:BBB', 'base')
+        self.assertNotEqual(first, second)
+        self.assertRegex(first, r'^[0-9a-f]{64}$')
+
+    def test_admin_disabled_without_token(self):
+        with patch.dict(os.environ, {'ADMIN_TOKEN': ''}):
+            status, _ = self.request('/admin/profile?seconds=1')
+        self.assertEqual(status, 404)
+
+    def test_admin_requires_token(self):
+        with patch.dict(os.environ, {'ADMIN_TOKEN': 'chave'}):
+            status, _ = self.request('/admin/profile?seconds=1', headers={'X-Admin-Token': 'errada'})
+        self.assertEqual(status, 403)
+
+    def test_admin_cpu_profile(self):
+        worker = threading.Thread(target=lambda: sum(i * i for i in range(3_000_000)), name='busy-worker')
+        worker.start()
+        with patch.dict(os.environ, {'ADMIN_TOKEN': 'chave'}):
+            status, body = self.request('/admin/profile?seconds=1&top=5', headers={'X-Admin-Token': 'chave'})
+        worker.join()
+        result = json.loads(body)
+        self.assertEqual(status, 200)
+        self.assertGreater(result['samples'], 0)
+        self.assertLessEqual(len(result['top_stacks']), 5)
+
+    def test_admin_tracemalloc_diff(self):
+        headers = {'X-Admin-Token': 'chave'}
+        with patch.dict(os.environ, {'ADMIN_TOKEN': 'chave'}):
+            status, _ = self.request('/admin/tracemalloc/snapshot', headers=headers)
+            self.assertEqual(status, 409)
+            status, body = self.request('/admin/tracemalloc/start', headers=headers, method='POST')
+            self.assertEqual(status, 200)
+            self.assertTrue(json.loads(body)['tracing'])
+            retained = [bytearray(1024) for _ in range(2000)]
+            status, body = self.request('/admin/tracemalloc/snapshot?top=5', headers=headers)
+            status_stop, _ = self.request('/admin/tracemalloc/stop', headers=headers, method='POST')
+        result = json.loads(body)
+        self.assertEqual(status, 200)
+        self.assertEqual(status_stop, 200)
+        self.assertTrue(result['compared_to_previous'])
+        self.assertTrue(any(entry['size_diff_bytes'] >= 1024 * 1000 for entry in result['top']))
+        del retained
+
+    def test_mounted_wsgi_app(self):
+        def app(environ, start_response):
+            body = json.dumps({'method': environ['REQUEST_METHOD'], 'path': environ['PATH_INFO'],
+                               'query': environ['QUERY_STRING'],
+                               'body': environ['wsgi.input'].read(int(environ['CONTENT_LENGTH'] or 0)).decode()})
+            start_response('201 Created', [('Content-Type', 'application/json')])
+            return [body.encode('utf-8')]
+
+        with patch.dict(health_server._wsgi_mounts, {'/api/': app}):
+            status, body = self.request('/api/emails/1?x=1', payload={'a': 1}, method='PUT')
+            missing, _ = self.request('/outro', method='DELETE')
+        self.assertEqual(status, 201)
+        self.assertEqual(json.loads(body), {'method': 'PUT', 'path': '/api/emails/1', 'query': 'x=1',
+                                            'body': '{"a": 1}'})
+        self.assertEqual(missing, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
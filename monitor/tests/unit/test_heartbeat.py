@@ -0,0 +1,62 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+import unittest
+from unittest.mock import MagicMock, patch
+from app.core.heartbeat import HeartbeatMonitor, SCHEDULER, account_heartbeat, start_watchdog
+
+
+class TestHeartbeatMonitor(unittest.TestCase):
+    def setUp(self):
+        self.monitor = HeartbeatMonitor()
+        self.clock = [1000.0]
+        patcher = patch('app.core.heartbeat.time.monotonic', side_effect=lambda: self.clock[0])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_liveness_follows_scheduler(self):
+        self.monitor.register(SCHEDULER, 60)
+        self.assertTrue(self.monitor.liveness(max_missed=3)[0])
+
+        self.clock[0] += 181
+        ok, details = self.monitor.liveness(max_missed=3)
+        self.assertFalse(ok)
+        self.assertFalse(details[SCHEDULER]['ok'])
+
+        self.monitor.beat(SCHEDULER)
+        self.assertTrue(self.monitor.liveness(max_missed=3)[0])
+
+    def test_readiness_reports_stuck_account(self):
+        self.monitor.register(SCHEDULER, 60)
+        self.monitor.register(account_heartbeat('a@x.com'), 60)
+        self.monitor.register(account_heartbeat('b@x.com'), 60)
+
+        self.clock[0] += 200
+        self.monitor.beat(SCHEDULER)
+        self.monitor.beat(account_heartbeat('a@x.com'))
+
+        ok, details = self.monitor.readiness(max_missed=3)
+        self.assertFalse(ok)
+        self.assertTrue(details['account:a@x.com']['ok'])
+        self.assertFalse(details['account:b@x.com']['ok'])
+        # A conta travada não afeta a liveness do processo
+        self.assertTrue(self.monitor.liveness(max_missed=3)[0])
+
+    def test_no_registrations_is_healthy(self):
+        self.assertEqual(self.monitor.readiness(), (True, {}))
+
+    def test_watchdog_drains_logs_before_exiting(self):
+        self.monitor.register(SCHEDULER, 60)
+        self.clock[0] += 181
+        calls = MagicMock()
+        with patch('app.core.heartbeat.stop_logging', calls.stop_logging), \
+                patch('app.core.heartbeat.os._exit', side_effect=SystemExit) as exit_mock, \
+                patch('threading.excepthook'):
+            calls.attach_mock(exit_mock, 'exit')
+            start_watchdog(self.monitor, max_missed=3, check_every=0).join(timeout=5)
+        self.assertEqual([name for name, _args, _kwargs in calls.mock_calls], ['stop_logging', 'exit'])
+
+
+if __name__ == '__main__':
+    unittest.main()
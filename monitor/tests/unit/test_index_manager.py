@@ -0,0 +1,90 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+import unittest
+from unittest.mock import MagicMock, patch
+from app.core import index_manager
+from app.core.index_manager import IndexManager, spec_hash
+
+SPECS = {
+    'users': [
+        {'keys': [('email', 1)], 'name': 'email_1', 'unique': True},
+        {'keys': [('chat_id', 1)], 'name': 'chat_id_1', 'unique': True},
+    ],
+    'processed_emails': [
+        {'keys': [('processed_time', 1)], 'name': 'processed_time_ttl', 'expireAfterSeconds': 3600},
+    ],
+}
+
+
+class FakeDB:
+    """Banco mínimo em memória com coleções MagicMock"""
+
+    def __init__(self, applied=None):
+        self.name = 'wegnots'
+        self.collections = {}
+        self.command = MagicMock()
+        meta = self['schema_meta']
+        meta.find_one.return_value = {'collections': applied or {}}
+
+    def __getitem__(self, name):
+        return self.collections.setdefault(name, MagicMock())
+
+
+class TestIndexManager(unittest.TestCase):
+    def setUp(self):
+        patcher = patch.object(index_manager, '_verified', set())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_no_index_work_when_spec_unchanged(self):
+        db = FakeDB({name: spec_hash(specs) for name, specs in SPECS.items()})
+        self.assertEqual(IndexManager(db, SPECS).ensure(), 0)
+        db['users'].index_information.assert_not_called()
+        db['users'].create_index.assert_not_called()
+        db['users'].drop_indexes.assert_not_called()
+
+        # Chamadas seguintes no mesmo processo nem consultam os metadados
+        db['schema_meta'].find_one.reset_mock()
+        IndexManager(db, SPECS).ensure(['users'])
+        db['schema_meta'].find_one.assert_not_called()
+
+    def test_creates_only_missing_indexes(self):
+        db = FakeDB()
+        db['users'].index_information.return_value = {'_id_': {}, 'email_1': {'unique': True}}
+        db['processed_emails'].index_information.return_value = {}
+
+        self.assertEqual(IndexManager(db, SPECS).ensure(), 2)
+        db['users'].create_index.assert_called_once_with([('chat_id', 1)], name='chat_id_1', unique=True)
+        db['users'].drop_indexes.assert_not_called()
+        self.assertEqual(db['schema_meta'].update_one.call_count, 2)
+
+    def test_ttl_change_uses_collmod(self):
+        db = FakeDB()
+        db['processed_emails'].index_information.return_value = {
+            'processed_time_ttl': {'expireAfterSeconds': 60}}
+        self.assertEqual(IndexManager(db, SPECS).ensure(['processed_emails']), 1)
+        db.command.assert_called_once_with('collMod', 'processed_emails',
+                                           index={'name': 'processed_time_ttl', 'expireAfterSeconds': 3600})
+        db['processed_emails'].create_index.assert_not_called()
+
+    def test_failed_collmod_is_logged_and_retried(self):
+        db = FakeDB()
+        db['processed_emails'].index_information.return_value = {
+            'processed_time_ttl': {'expireAfterSeconds': 60}}
+        db.command.side_effect = Exception('not authorized')
+        with self.assertLogs('wegnots.index_manager', 'ERROR'):
+            self.assertEqual(IndexManager(db, SPECS).ensure(['processed_emails']), 0)
+        db['schema_meta'].update_one.assert_not_called()
+
+    def test_failed_creation_is_retried(self):
+        db = FakeDB()
+        db['users'].index_information.return_value = {}
+        db['users'].create_index.side_effect = Exception('duplicate key')
+        IndexManager(db, SPECS).ensure(['users'])
+        db['schema_meta'].update_one.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
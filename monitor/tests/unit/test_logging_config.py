@@ -0,0 +1,65 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+import logging
+import tempfile
+import unittest
+from app.config.logging_config import RateLimitFilter, build_log_config, setup_logging, stop_logging
+
+
+def make_record(level=logging.INFO, lineno=10, msg='Novo email encontrado'):
+    return logging.LogRecord('wegnots.email_handler', level, 'email_handler.py', lineno, msg, (), None)
+
+
+class TestRateLimitFilter(unittest.TestCase):
+    def test_burst_then_sampling(self):
+        rate_filter = RateLimitFilter(burst=5, window=60, sample=10)
+        allowed = [rate_filter.filter(make_record()) for _ in range(100)]
+        # 5 do burst + 1 a cada 10 das 95 restantes
+        self.assertEqual(sum(allowed), 5 + 9)
+
+    def test_suppressed_count_reported(self):
+        rate_filter = RateLimitFilter(burst=1, window=60, sample=3)
+        records = [make_record() for _ in range(4)]
+        results = [rate_filter.filter(record) for record in records]
+        self.assertEqual(results, [True, False, False, True])
+        self.assertIn('+2 mensagens semelhantes suprimidas', records[3].getMessage())
+
+    def test_call_sites_are_independent_and_warnings_pass(self):
+        rate_filter = RateLimitFilter(burst=1, window=60, sample=1000)
+        self.assertTrue(rate_filter.filter(make_record(lineno=1)))
+        self.assertFalse(rate_filter.filter(make_record(lineno=1)))
+        self.assertTrue(rate_filter.filter(make_record(lineno=2)))
+        for _ in range(10):
+            self.assertTrue(rate_filter.filter(make_record(level=logging.ERROR, lineno=1)))
+
+
+class TestSetupLogging(unittest.TestCase):
+    def test_rotating_file_through_queue(self):
+        root = logging.getLogger()
+        previous_handlers, previous_level = list(root.handlers), root.level
+        with tempfile.TemporaryDirectory() as tmpdir:
+            config = build_log_config()
+            config.update({'file': os.path.join(tmpdir, 'wegnots.log'), 'max_size': 2000,
+                           'backup_count': 2, 'rate_limit_burst': 1000})
+            try:
+                setup_logging(config)
+                logger = logging.getLogger('wegnots.teste')
+                for i in range(200):
+                    logger.info(f"linha de teste {i:04d} " + 'x' * 40)
+                stop_logging()
+                files = sorted(os.listdir(tmpdir))
+                self.assertIn('wegnots.log.1', files)
+                self.assertNotIn('wegnots.log.3', files)
+            finally:
+                stop_logging()
+                for handler in list(root.handlers):
+                    root.removeHandler(handler)
+                for handler in previous_handlers:
+                    root.addHandler(handler)
+                root.setLevel(previous_level)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+from app.core import metrics as metrics_module
+from app.core.bot_registry import BotRegistry
+from app.core.metrics import MetricsRegistry, Histogram, bot_label
+from app.core.telegram_bot_commands import TelegramCommands, CommandScope
+
+
+class TestMetricsRegistry(unittest.TestCase):
+    def test_histogram_quantile(self):
+        histogram = Histogram('latency', 'Latência', ('account',), buckets=(1, 2, 5, 10))
+        for value in [0.5] * 90 + [8] * 10:
+            histogram.observe(value, account='a')
+
+        self.assertLessEqual(histogram.quantile(0.5, account='a'), 1)
+        self.assertGreater(histogram.quantile(0.95, account='a'), 5)
+        self.assertIsNone(histogram.quantile(0.95, account='b'))
+
+    def test_status_snapshot(self):
+        registry = MetricsRegistry()
+        registry.record_connection_state('a@x.com', 'connected')
+        registry.record_connection_state('b@x.com', 'error')
+        registry.record_poll('a@x.com', 0.2, success=True)
+        registry.record_email_detected('a@x.com')
+        registry.record_alert('a@x.com', success=True, latency=1.5)
+        registry.record_alert('a@x.com', success=False)
+        registry.queue_depth.inc(bot='123')
+
+        snapshot = registry.status_snapshot()
+        account = snapshot['accounts']['a@x.com']
+        self.assertEqual(snapshot['active_servers'], 1)
+        self.assertEqual(snapshot['emails_today'], 1)
+        self.assertEqual(snapshot['notifications_sent'], 1)
+        self.assertEqual(snapshot['queue_depth'], 1)
+        self.assertEqual(account['failed_today'], 1)
+        self.assertIsNotNone(account['last_poll_age'])
+        self.assertIsNone(snapshot['accounts']['b@x.com']['last_poll_age'])
+
+    def test_prometheus_rendering(self):
+        registry = MetricsRegistry()
+        registry.record_poll('a"b@x.com', 0.3, success=True)
+        registry.rate_limited.inc(bot='123')
+
+        text = registry.render_prometheus(max_age=0)
+        self.assertIn('wegnots_telegram_rate_limited_total{bot="123"} 1', text)
+        self.assertIn('wegnots_poll_duration_seconds_bucket{account="a\\"b@x.com",le="0.5"} 1', text)
+        self.assertIn('wegnots_poll_duration_seconds_bucket{account="a\\"b@x.com",le="+Inf"} 1', text)
+        self.assertIn('wegnots_poll_duration_seconds_count{account="a\\"b@x.com"} 1', text)
+
+        # Dentro de max_age o texto pré-renderizado é reaproveitado
+        registry.rate_limited.inc(bot='123')
+        self.assertEqual(registry.render_prometheus(max_age=60), registry.render_prometheus(max_age=60))
+
+    def test_bot_label_hides_secret(self):
+        self.assertEqual(bot_label('123456:SECRET'), '123456')
+        self.assertEqual(bot_label(None), 'default')
+
+
+class TestStatusCommand(unittest.TestCase):
+    @patch('app.core.telegram_bot_commands.requests.post')
+    def test_status_uses_live_metrics(self, mock_post):
+        mock_post.return_value.status_code = 200
+        registry = MetricsRegistry()
+        registry.record_connection_state('ops_team@x.com', 'connected')
+        registry.record_alert('ops_team@x.com', success=True, latency=2.0)
+
+        with tempfile.TemporaryDirectory() as tmpdir, \
+                patch.object(metrics_module, '_metrics', registry):
+            commands = TelegramCommands('1:A', registry=BotRegistry(os.path.join(tmpdir, 'bots.json')),
+                                        scope=CommandScope(admin_chats=[1]))
+            self.assertTrue(commands.process_update({'message': {'chat': {'id': 1}, 'text': '/status'}}))
+
+        text = mock_post.call_args.kwargs['json']['text']
+        self.assertIn('ops\\_team@x.com', text)
+        self.assertIn('alertas hoje: 1', text)
+        self.assertNotIn('24', text)
+
+    @patch('app.core.telegram_bot_commands.requests.post')
+    def test_status_is_scoped_to_chat_accounts(self, mock_post):
+        mock_post.return_value.status_code = 200
+        registry = MetricsRegistry()
+        for account in ('a@x.com', 'b@x.com'):
+            registry.record_connection_state(account, 'connected')
+        scope = CommandScope.from_config({'chat_id': '1'}, {'IMAP_A': {'username': 'a@x.com', 'telegram_chat_id': '2'},
+                                                            'IMAP_B': {'username': 'b@x.com'}})
+
+        with patch.object(metrics_module, '_metrics', registry):
+            commands = TelegramCommands('1:A', registry=MagicMock(), scope=scope)
+            commands.process_update({'message': {'chat': {'id': 2}, 'text': '/status'}})
+            text = mock_post.call_args.kwargs['json']['text']
+            self.assertIn('a@x.com', text)
+            self.assertNotIn('b@x.com', text)
+            self.assertIn('Servidores ativos: 1/1', text)
+
+            commands.process_update({'message': {'chat': {'id': 3}, 'text': '/status'}})
+            self.assertNotIn('@x.com', mock_post.call_args.kwargs['json']['text'])
+            self.assertEqual(commands.scope.visible_accounts('1'), None)
+
+
+if __name__ == '__main__':
+    unittest.main()
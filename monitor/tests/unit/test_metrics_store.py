@@ -0,0 +1,92 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+import unittest
+from datetime import datetime, timezone
+from unittest.mock import MagicMock
+from app.core.metrics import MetricsRegistry
+from app.core.metrics_store import MetricsStore, RAW_COLLECTION, HOURLY_COLLECTION, DAILY_COLLECTION
+
+
+class TestMetricsStore(unittest.TestCase):
+    def setUp(self):
+        self.registry = MetricsRegistry()
+        self.collections = {}
+        self.db = MagicMock()
+        self.db.__getitem__.side_effect = lambda name: self.collections.setdefault(name, MagicMock())
+        self.store = MetricsStore(self.db, registry=self.registry)
+
+    def test_sample_records_deltas_per_account(self):
+        self.registry.emails_detected.inc(3, account='a@x.com')
+        self.registry.poll_duration.observe(0.5, account='a@x.com')
+        first, _current = self.store.sample()
+        self.assertEqual(len(first), 1)
+        self.assertEqual(first[0]['meta'], {'account': 'a@x.com'})
+        self.assertEqual((first[0]['emails'], first[0]['polls'], first[0]['poll_seconds']), (3, 1, 0.5))
+
+        self.store.flush()
+        self.registry.emails_detected.inc(2, account='a@x.com')
+        self.registry.alerts_failed.inc(account='b@x.com')
+        second = {doc['meta']['account']: doc for doc in self.store.sample()[0]}
+        self.assertEqual(second['a@x.com']['emails'], 2)
+        self.assertEqual(second['a@x.com']['polls'], 0)
+        self.assertEqual(second['b@x.com']['alerts_failed'], 1)
+
+        self.store.flush()
+        self.assertEqual(self.store.sample()[0], [])
+
+    def test_flush_inserts_only_when_there_are_changes(self):
+        self.assertEqual(self.store.flush(), 0)
+        self.registry.alerts_sent.inc(account='a@x.com')
+        self.assertEqual(self.store.flush(), 1)
+        self.db[RAW_COLLECTION].insert_many.assert_called_once()
+
+    def test_failed_insert_keeps_deltas_for_next_flush(self):
+        insert_many = self.db[RAW_COLLECTION].insert_many
+        insert_many.side_effect = Exception('mongo fora')
+        self.registry.alerts_sent.inc(account='a@x.com')
+        with self.assertRaises(Exception):
+            self.store.flush()
+        insert_many.side_effect = None
+        self.registry.alerts_sent.inc(account='a@x.com')
+        self.assertEqual(self.store.flush(), 1)
+        self.assertEqual(insert_many.call_args[0][0][0]['alerts_sent'], 2)
+
+    def test_ensure_collections_creates_timeseries_once(self):
+        self.db.list_collection_names.return_value = []
+        self.db['schema_meta'].find_one.return_value = None
+        self.store.ensure_collections()
+        args, kwargs = self.db.create_collection.call_args
+        self.assertEqual(args, (RAW_COLLECTION,))
+        self.assertEqual(kwargs['timeseries']['timeField'], 'ts')
+        self.assertEqual(kwargs['expireAfterSeconds'], 30 * 24 * 60 * 60)
+
+        self.db.reset_mock()
+        self.db.list_collection_names.return_value = [RAW_COLLECTION]
+        self.store.ensure_collections()
+        self.db.create_collection.assert_not_called()
+
+    def test_rollups_merge_into_summaries(self):
+        self.store.run_rollups(datetime(2024, 5, 10, 14, 30, tzinfo=timezone.utc))
+        hourly = self.db[RAW_COLLECTION].aggregate.call_args[0][0]
+        self.assertEqual(hourly[0]['$match']['ts']['$gte'], datetime(2024, 5, 10, 13, 0, tzinfo=timezone.utc))
+        self.assertEqual(hourly[-1]['$merge']['into'], HOURLY_COLLECTION)
+        daily = self.db[HOURLY_COLLECTION].aggregate.call_args[0][0]
+        self.assertEqual(daily[0]['$match']['period']['$gte'], datetime(2024, 5, 8, tzinfo=timezone.utc))
+        self.assertEqual(daily[-1]['$merge']['into'], DAILY_COLLECTION)
+
+    def test_daily_rollup_starts_at_local_midnight(self):
+        store = MetricsStore(self.db, registry=self.registry, timezone_name='America/Sao_Paulo')
+        # 01:30 UTC de 10/05 ainda é 22:30 de 09/05 em São Paulo (UTC-3)
+        store.run_rollups(datetime(2024, 5, 10, 1, 30, tzinfo=timezone.utc))
+        daily = self.db[HOURLY_COLLECTION].aggregate.call_args[0][0]
+        self.assertEqual(daily[0]['$match']['period']['$gte'], datetime(2024, 5, 7, 3, 0, tzinfo=timezone.utc))
+
+        store.run_rollups(datetime(2024, 5, 10, 3, 0, tzinfo=timezone.utc))
+        daily = self.db[HOURLY_COLLECTION].aggregate.call_args[0][0]
+        self.assertEqual(daily[0]['$match']['period']['$gte'], datetime(2024, 5, 8, 3, 0, tzinfo=timezone.utc))
+
+
+if __name__ == '__main__':
+    unittest.main()
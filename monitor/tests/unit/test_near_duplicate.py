@@ -0,0 +1,89 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+import unittest
+from app.core.near_duplicate import (NearDuplicateIndex, DuplicateEntry, format_repeat_summary, fingerprint,
+                                     normalize, simhash, hamming)
+
+NOW = 1_700_000_000
+BODY = ("Alarme de temperatura no painel de controle da linha de produção.\n"
+        "Equipamento: forno principal\nValor medido: {value} C em {ts}\nOcorrência {id}")
+
+
+class TestSimHash(unittest.TestCase):
+    def test_only_variable_parts_are_masked(self):
+        self.assertEqual(normalize('Falha 12345 em 10:32:01 de 17/07/2025', 'id 9f86d081884c7d65'),
+                         ['falha', '0', 'em', '0', 'de', '0', 'id', '0'])
+        self.assertEqual(normalize('CRITICO: Motor M01 parado - Linha 2'),
+                         ['critico', 'motor', 'm01', 'parado', 'linha', '2'])
+
+    def test_similar_texts_are_close(self):
+        a = simhash(normalize('Alarme forno', BODY.format(value=301, ts='10:01', id='a1b2c3d4e5')))
+        b = simhash(normalize('Alarme forno', BODY.format(value=301, ts='10:07', id='ffee0011aa')))
+        other = simhash(normalize('Backup concluído', 'Rotina noturna de backup finalizada sem erros'))
+        self.assertEqual(hamming(a, b), 0)
+        self.assertGreater(hamming(a, other), 3)
+
+    def test_different_equipment_is_not_a_duplicate(self):
+        a = fingerprint('CRITICO: Motor M01 parado - Linha 2')
+        b = fingerprint('CRITICO: Motor M07 parado - Linha 5')
+        self.assertGreater(hamming(a, b), 3)
+
+
+class TestNearDuplicateIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = NearDuplicateIndex(window=600, max_distance=3)
+
+    def _fingerprint(self, minute, subject='Alarme forno'):
+        return fingerprint(subject, BODY.format(value=300, ts=f'10:{minute:02d}', id=f'{minute:08x}'))
+
+    def test_only_delivered_alerts_are_matched(self):
+        self.assertIsNone(self.index.find(':1', self._fingerprint(0), now=NOW))
+        self.assertIsNone(self.index.find(':1', self._fingerprint(1), now=NOW + 30))
+        self.index.register(':1', 'Alarme forno', self._fingerprint(1), account='a@x.com', now=NOW + 30)
+        self.assertEqual(self.index.find(':1', self._fingerprint(2), now=NOW + 60).repeats, 1)
+        self.assertIsNone(self.index.find(':2', self._fingerprint(3), now=NOW + 60))
+        self.assertIsNone(self.index.find(':1', fingerprint('Backup concluído sem erros'), now=NOW + 60))
+
+    def test_summary_escapes_markdown(self):
+        entry = DuplicateEntry(None, NOW, subject='Falha_no *motor*', account='ops_team@x.com')
+        message = format_repeat_summary(entry)
+        self.assertIn('Falha\\_no \\*motor\\*', message)
+        self.assertIn('ops\\_team@x.com', message)
+
+    def test_dedupe_key_matches_exactly(self):
+        key = 'alarme_equipamento Equipamento=Motor M01 Código=E101'
+        self.index.register(':1', 'Falha no motor', key=key, now=NOW, email_key='a@x.com:1:42')
+        self.assertIsNone(self.index.find(':1', key='alarme_equipamento Equipamento=Motor M07 Código=E205',
+                                          now=NOW + 30))
+        original = self.index.find(':1', key=key, now=NOW + 60)
+        self.assertEqual((original.subject, original.email_key), ('Falha no motor', 'a@x.com:1:42'))
+        self.assertEqual(self.index.expired_repeats(now=NOW + 600)[0].repeats, 1)
+        self.assertEqual(self.index._chats, {})
+
+    def test_critical_alerts_are_exempt(self):
+        self.index.register(':1', 'Alarme forno', self._fingerprint(0), now=NOW)
+        self.assertIsNone(self.index.find(':1', self._fingerprint(1), level='critical', now=NOW + 30))
+
+    def test_repeats_reported_after_window(self):
+        self.index.register(':1', 'Alarme forno', self._fingerprint(0), account='a@x.com', now=NOW)
+        self.index.find(':1', self._fingerprint(1), now=NOW + 30)
+        self.assertEqual(self.index.expired_repeats(now=NOW + 300), [])
+        repeated = self.index.expired_repeats(now=NOW + 600)
+        self.assertEqual([(entry.subject, entry.repeats) for entry in repeated], [('Alarme forno', 1)])
+        self.assertIsNone(self.index.find(':1', self._fingerprint(2), now=NOW + 601))
+        self.assertEqual(self.index.expired_repeats(now=NOW + 700), [])
+
+    def test_near_match_found_through_band(self):
+        index = NearDuplicateIndex(max_distance=3)
+        fingerprint_value = 0x0123456789ABCDEF
+        keys = index._band_keys(fingerprint_value)
+        self.assertEqual(len(keys), 4)
+        # Três bits diferentes em faixas distintas: a quarta faixa continua igual
+        flipped = fingerprint_value ^ (1 | 1 << 20 | 1 << 40)
+        self.assertEqual(sum(a == b for a, b in zip(keys, index._band_keys(flipped))), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+import unittest
+from unittest.mock import MagicMock
+from app.core.recipient_resolver import RecipientResolver, normalize_sender
+
+USERS = [
+    {'_id': 1, 'email': 'sooretama@megasec.com.br', 'chat_id': '100', 'is_central_server': True,
+     'notification_rules': []},
+    {'_id': 2, 'email': 'alarme@planta.com', 'chat_id': '200', 'notification_rules': []},
+    {'_id': 3, 'email': 'op@megasec.com.br', 'chat_id': '300',
+     'notification_rules': [{'sender': 'Alarme@Planta.com'}, {'sender': '*@cameras.com'}]},
+    {'_id': 4, 'email': 'inativo@megasec.com.br', 'chat_id': '400', 'is_active': False,
+     'notification_rules': [{'sender': '*@cameras.com'}]},
+    {'_id': 6, 'email': 'gerente@megasec.com.br', 'chat_id': '600',
+     'notification_preferences': {'receive_criticals': True, 'receive_moderates': False, 'receive_low': False},
+     'notification_rules': [{'sender': '*@cameras.com'}]},
+]
+
+
+class TestRecipientResolver(unittest.TestCase):
+    def setUp(self):
+        self.collection = MagicMock()
+        self.collection.find.return_value = [dict(user) for user in USERS]
+        self.resolver = RecipientResolver(self.collection)
+        self.resolver.refresh()
+
+    def chat_ids(self, sender):
+        return sorted(user['chat_id'] for user in self.resolver.resolve(sender))
+
+    def test_exact_sender_owner_and_central(self):
+        self.assertEqual(self.chat_ids('Alarme <ALARME@planta.com>'), ['100', '200', '300'])
+
+    def test_domain_wildcard_skips_inactive(self):
+        self.assertEqual(self.chat_ids('cam01@cameras.com'), ['100', '300'])
+
+    def test_notification_preferences_by_level(self):
+        critical = sorted(user['chat_id'] for user in self.resolver.resolve('cam01@cameras.com', 'critical'))
+        self.assertEqual(critical, ['100', '300', '600'])
+        low = sorted(user['chat_id'] for user in self.resolver.resolve('cam01@cameras.com', 'low'))
+        self.assertEqual(low, ['100', '300'])
+
+    def test_unknown_sender_gets_central_once(self):
+        self.assertEqual(self.chat_ids('x@y.com'), ['100'])
+        self.assertEqual(self.chat_ids('sooretama@megasec.com.br'), ['100'])
+
+    def test_batch_has_no_database_round_trips(self):
+        self.collection.reset_mock()
+        result = self.resolver.get_recipients_for_senders(['a@cameras.com', 'x@y.com', 'a@cameras.com'])
+        self.assertEqual(set(result), {'a@cameras.com', 'x@y.com'})
+        self.assertFalse(self.collection.method_calls)
+
+    def test_change_stream_events(self):
+        self.resolver.apply_change({'operationType': 'update', 'fullDocument': {
+            '_id': 3, 'email': 'op@megasec.com.br', 'chat_id': '300', 'notification_rules': []}})
+        self.assertEqual(self.chat_ids('cam01@cameras.com'), ['100'])
+
+        self.resolver.apply_change({'operationType': 'delete', 'documentKey': {'_id': 6}})
+        self.resolver.apply_change({'operationType': 'insert', 'fullDocument': {
+            '_id': 5, 'email': 'novo@megasec.com.br', 'chat_id': '500',
+            'notification_rules': [{'sender': '*@cameras.com'}]}})
+        self.assertEqual(self.chat_ids('cam01@cameras.com'), ['100', '500'])
+
+        self.resolver.apply_change({'operationType': 'delete', 'documentKey': {'_id': 1}})
+        self.assertEqual(self.chat_ids('x@y.com'), [])
+        self.assertEqual(len(self.resolver), 4)
+
+    def test_normalize_sender(self):
+        self.assertEqual(normalize_sender('"Câmera 1" <Cam1@Cameras.COM>'), 'cam1@cameras.com')
+        self.assertEqual(normalize_sender(None), '')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+import tempfile
+import unittest
+from datetime import datetime
+from unittest.mock import MagicMock
+from app.core.rolling_stats import RollingCounter, RollingStats, format_daily_summary
+
+DAY = 86400
+NOW = 1_700_000_000 - 1_700_000_000 % DAY + 10 * 3600  # 10h de um dia (UTC)
+
+
+class TestRollingCounter(unittest.TestCase):
+    def test_ring_buffer_windows(self):
+        counter = RollingCounter(60, 5)
+        counter.add(2, NOW)
+        counter.add(1, NOW + 60)
+        counter.add(4, NOW + 120)
+        self.assertEqual(counter.total(1, NOW + 120), 4)
+        self.assertEqual(counter.total(3, NOW + 120), 7)
+        self.assertEqual([count for _, count in counter.series(4, NOW + 120)], [0, 2, 1, 4])
+
+    def test_old_positions_are_reused(self):
+        counter = RollingCounter(60, 3)
+        counter.add(5, NOW)
+        counter.add(1, NOW + 180)  # mesma posição, período novo
+        self.assertEqual(counter.total(3, NOW + 180), 1)
+        self.assertEqual(counter.total(10, NOW + 600), 0)
+
+
+class TestRollingStats(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'stats.json')
+        self.stats = RollingStats(history_size=10, path=self.path, offset=0)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_today_totals_and_day_rollover(self):
+        self.stats.record_email('a@x.com', 'critical', now=NOW)
+        self.stats.record_email('b@x.com', 'low', now=NOW + 60)
+        self.stats.record_alert('a@x.com', 'Falha', True, now=NOW)
+        self.stats.record_alert('b@x.com', 'Info', False, now=NOW + 60)
+        today = self.stats.today(NOW + 120)
+        self.assertEqual((today['emails'], today['alerts_sent'], today['alerts_failed'], today['critical']),
+                         (2, 1, 1, 1))
+        self.assertEqual(today['accounts'], {'a@x.com': 1, 'b@x.com': 1})
+        self.assertEqual(self.stats.last_alert['subject'], 'Falha')
+        self.assertEqual(self.stats.today(NOW + DAY)['emails'], 0)
+        self.assertEqual(self.stats.total('emails', 'day', 2, NOW + DAY), 2)
+
+    def test_checkpoint_round_trip(self):
+        self.stats.record_email('a@x.com', 'important', now=NOW)
+        self.stats.save()
+        restored = RollingStats(history_size=10, path=self.path, offset=0)
+        self.assertTrue(restored.load())
+        self.assertEqual(restored.today(NOW)['important'], 1)
+        self.assertFalse(RollingStats(history_size=20, path=self.path, offset=0).load())
+
+    def test_daily_summary_sent_once_after_time(self):
+        telegram = MagicMock()
+        telegram.send_text_message.return_value = True
+        self.assertFalse(self.stats.maybe_send_summary(telegram, '23:59', datetime(2024, 5, 10, 23, 0)))
+        self.assertTrue(self.stats.maybe_send_summary(telegram, '23:59', datetime(2024, 5, 10, 23, 59)))
+        self.assertFalse(self.stats.maybe_send_summary(telegram, '23:59', datetime(2024, 5, 10, 23, 59, 30)))
+        self.assertEqual(telegram.send_text_message.call_count, 1)
+        self.assertIn('Resumo Diário', telegram.send_text_message.call_args[0][0])
+
+    def test_daily_summary_escapes_account_names(self):
+        totals = {'emails': 1, 'alerts_sent': 1, 'alerts_failed': 0, 'critical': 0, 'important': 0, 'low': 1,
+                  'accounts': {'ops_team@x.com': 1}}
+        self.assertIn('• ops\\_team@x.com: 1', format_daily_summary(totals, datetime(2024, 5, 10)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+import time
+import unittest
+from unittest.mock import patch
+from app.core import safe_regex
+from app.core.safe_regex import SafePatternSet, validate_pattern
+
+
+class TestValidatePattern(unittest.TestCase):
+    def test_rejects_catastrophic_constructs(self):
+        for pattern in ('(a+)+$', r'(\w+\s?)*$', '(a|aa)+', r'(a)\1', '(?=x)a', '(?<!x)a', '(?P<n>a)', '[', ''):
+            check = validate_pattern(pattern)
+            self.assertFalse(check.ok, pattern)
+            self.assertTrue(check.errors, pattern)
+
+    def test_rejects_unbounded_inside_bounded_repeat(self):
+        for pattern in ('(.*,){15}X', '(a*b?){12}c', r'(\w*){10}!'):
+            self.assertFalse(validate_pattern(pattern).ok, pattern)
+        self.assertTrue(validate_pattern('(a+)?b').ok)
+
+    def test_leading_flags_are_scoped(self):
+        self.assertEqual(safe_regex.scope_leading_flags('(?i)falha|erro'), '(?i:falha|erro)')
+        self.assertTrue(validate_pattern('(?i)falha').ok)
+        self.assertFalse(validate_pattern('a(?i)b').ok)
+
+    def test_accepts_and_scores_simple_patterns(self):
+        simple = validate_pattern(r'falha\s+\d+')
+        bounded = validate_pattern(r'c[aâ]mera\s+\d+\s+offline|(ab|cd){1,5}')
+        self.assertTrue(simple.ok)
+        self.assertTrue(bounded.ok)
+        self.assertGreater(bounded.cost, simple.cost)
+
+    @unittest.skipIf(safe_regex.re2 is not None, 're2 não faz backtracking')
+    def test_rejects_overlapping_branches_in_repeat_without_re2(self):
+        for pattern in (r'(\d\d|1\d)+x', r'(\w\d|\d\w)+x', r'(\d\d|1\d){40}x'):
+            self.assertFalse(validate_pattern(pattern).ok, pattern)
+
+    def test_cost_limit(self):
+        check = validate_pattern('(?:(?:(?:(?:ab{1,9}c){9}d){9}e){9}f)')
+        self.assertFalse(check.ok)
+        self.assertIn('custo', check.errors[0])
+
+
+class TestSafePatternSet(unittest.TestCase):
+    def test_labels_and_rejections(self):
+        patterns = SafePatternSet([(r'porta\s+aberta', 'critical'), ('(a+)+$', 'low'), ('bateria', 'low')])
+        self.assertEqual(len(patterns), 2)
+        self.assertEqual(len(patterns.rejected), 1)
+        found = patterns.matches('PORTA  ABERTA e bateria fraca')
+        self.assertEqual([label for _pattern, label in found], ['critical', 'low'])
+
+    def test_leading_flags_in_combined_set(self):
+        patterns = SafePatternSet([('(?s)porta.aberta', 'critical'), ('(?i)bateria', 'low')])
+        self.assertEqual([label for _pattern, label in patterns.matches('porta\naberta, bateria')],
+                         ['critical', 'low'])
+
+    def test_input_is_truncated(self):
+        patterns = SafePatternSet([('alvo', 'low')], max_input=10)
+        self.assertEqual(patterns.matches('x' * 20 + 'alvo'), [])
+
+    @unittest.skipIf(safe_regex.re2 is not None, 're2 avalia os padrões no próprio processo')
+    def test_slow_pattern_is_quarantined(self):
+        accept_all = lambda pattern: safe_regex.PatternCheck(pattern, True, 1, [])
+        with patch.object(safe_regex, 'validate_pattern', accept_all):
+            patterns = SafePatternSet([('bateria', 'low'), ('(a+)+$', 'critical'), ('porta', 'high')], budget=0.5)
+        self.addCleanup(patterns.close)
+        started = time.monotonic()
+        found = patterns.matches('bateria ' + 'a' * 40 + '!')
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertEqual(found, [('bateria', 'low')])
+        self.assertEqual(patterns.quarantined, ['(a+)+$'])
+        self.assertEqual(len(patterns), 2)
+        self.assertEqual(patterns.matches('porta aberta'), [('porta', 'high')])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+import unittest
+from datetime import date
+from unittest.mock import MagicMock, patch
+from app.core import sender_sketch
+from app.core.sender_sketch import CountMinSketch, HyperLogLog, TopK, SenderAnalytics
+from app.core.telegram_bot_commands import TelegramCommands, CommandScope
+
+
+class TestSketches(unittest.TestCase):
+    def test_count_min_never_underestimates(self):
+        cms = CountMinSketch(width=256, depth=4)
+        for index in range(2000):
+            cms.add(f'ruido{index}@x.com')
+        for _ in range(300):
+            cms.add('flood@cameras.com')
+        self.assertGreaterEqual(cms.estimate('flood@cameras.com'), 300)
+        self.assertLess(cms.estimate('flood@cameras.com'), 300 + 2 * cms.total / 256)
+        self.assertEqual(cms.total, 2300)
+
+    def test_hyperloglog_estimate_within_error(self):
+        hll = HyperLogLog()
+        for index in range(5000):
+            hll.add(f'sender{index}@x.com')
+            hll.add(f'sender{index}@x.com')
+        self.assertAlmostEqual(hll.count(), 5000, delta=5000 * 0.05)
+        small = HyperLogLog()
+        for sender in ('a@x.com', 'b@x.com', 'c@x.com'):
+            small.add(sender)
+        self.assertEqual(small.count(), 3)
+
+    def test_top_k_keeps_heaviest(self):
+        top = TopK(k=2)
+        for key, count in (('a', 1), ('b', 5), ('c', 3), ('a', 2), ('d', 9)):
+            top.offer(key, count)
+        self.assertEqual(top.items(), [('d', 9), ('b', 5)])
+
+
+class TestSenderAnalytics(unittest.TestCase):
+    def test_summary_and_day_rollover_persists(self):
+        persist = MagicMock()
+        analytics = SenderAnalytics(persist=persist, top_k=3)
+        analytics.day = date(2024, 5, 10)
+        for _ in range(5):
+            analytics.add('a@x.com', 'flood@cameras.com', today=date(2024, 5, 10))
+        analytics.add('a@x.com', 'outro@x.com', today=date(2024, 5, 10))
+        analytics.add('b@x.com', '', today=date(2024, 5, 10))
+
+        summary = analytics._accounts['a@x.com'].summary()
+        self.assertEqual((summary['total'], summary['distinct']), (6, 2))
+        self.assertEqual(summary['top'][0], {'sender': 'flood@cameras.com', 'count': 5})
+        self.assertNotIn('b@x.com', analytics._accounts)
+
+        analytics.add('a@x.com', 'novo@x.com', today=date(2024, 5, 11))
+        day, summaries = persist.call_args[0]
+        self.assertEqual(day, date(2024, 5, 10))
+        self.assertEqual(summaries['a@x.com']['total'], 6)
+        self.assertEqual(analytics._accounts['a@x.com'].summary()['total'], 1)
+
+    def test_flush_and_restore_continue_the_day(self):
+        persist = MagicMock()
+        analytics = SenderAnalytics(persist=persist)
+        for index in range(30):
+            analytics.add('a@x.com', f'remetente{index % 10}@x.com')
+        analytics.flush()
+        stored = persist.call_args[0][1]
+
+        restarted = SenderAnalytics(persist=persist)
+        self.assertEqual(restarted.restore({**stored, 'b@x.com': {'total': 1, 'state': {'cms': b'', 'hll': b''}}}), 1)
+        for _ in range(5):
+            restarted.add('a@x.com', 'remetente0@x.com')
+        summary = restarted.summary()['a@x.com']
+        self.assertEqual((summary['total'], summary['distinct']), (35, 10))
+        self.assertEqual(summary['top'][0], {'sender': 'remetente0@x.com', 'count': 8})
+
+
+class TestSendersCommand(unittest.TestCase):
+    @patch('app.core.telegram_bot_commands.requests.post')
+    def test_senders_are_scoped_to_chat_accounts(self, post):
+        post.return_value.status_code = 200
+        analytics = SenderAnalytics()
+        analytics.add('a@x.com', 'cam@a.com')
+        analytics.add('b@x.com', 'cam@b.com')
+        commands = TelegramCommands('1:A', registry=MagicMock(),
+                                    scope=CommandScope(['1'], {'a@x.com': '2', 'b@x.com': '1'}))
+
+        with patch.object(sender_sketch, '_analytics', analytics):
+            commands.process_update({'message': {'chat': {'id': 2}, 'text': '/remetentes'}})
+            text = post.call_args.kwargs['json']['text']
+            self.assertIn('cam@a.com', text)
+            self.assertNotIn('cam@b.com', text)
+            for chat, argument in ((2, ' b@x.com'), (3, '')):
+                commands.process_update({'message': {'chat': {'id': chat}, 'text': '/remetentes' + argument}})
+                self.assertNotIn('cam@', post.call_args.kwargs['json']['text'])
+            commands.process_update({'message': {'chat': {'id': 1}, 'text': '/remetentes'}})
+            self.assertIn('cam@b.com', post.call_args.kwargs['json']['text'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+import unittest
+from app.core.thread_index import (ThreadIndex, parent_ids, parse_fetch_uid, parse_message_ids,
+                                   parse_thread_response, thread_parents)
+
+
+class TestThreadParsing(unittest.TestCase):
+    def test_parent_ids_nearest_first(self):
+        self.assertEqual(parse_message_ids(' <a@x> '), ['<a@x>'])
+        self.assertEqual(parent_ids('<c@x>', '<a@x>\r\n <b@x> <c@x>'), ['<c@x>', '<b@x>', '<a@x>'])
+        self.assertEqual(parent_ids(None, None), [])
+
+    def test_imap_thread_response(self):
+        threads = parse_thread_response([b'(1)(2 3 (4)(5 6))'])
+        self.assertEqual(threads, [[b'2', b'3', b'4', b'5', b'6']])
+        parents = thread_parents(threads)
+        self.assertNotIn(b'2', parents)
+        self.assertEqual(parents[b'4'], [b'3', b'2'])
+
+    def test_uid_from_fetch_response(self):
+        self.assertEqual(parse_fetch_uid(b'3 (UID 1204 INTERNALDATE "17-Jul-2025 02:44:25 -0300" RFC822 {10}'),
+                         b'1204')
+        self.assertIsNone(parse_fetch_uid(b'3 (INTERNALDATE "17-Jul-2025 02:44:25 -0300" RFC822 {10}'))
+        self.assertIsNone(parse_fetch_uid(None))
+
+
+class TestThreadIndex(unittest.TestCase):
+    def test_find_nearest_known_ancestor_per_chat(self):
+        index = ThreadIndex()
+        index.remember('bot:1', ['<a@x>', 's:u:77:1204'], 100)
+        index.remember('bot:1', ['<b@x>'], 101)
+        self.assertEqual(index.find('bot:1', ['<c@x>', '<b@x>', '<a@x>']), 101)
+        self.assertEqual(index.find('bot:1', ['s:u:77:1204']), 100)
+        self.assertIsNone(index.find('bot:2', ['<a@x>']))
+
+    def test_lru_eviction(self):
+        index = ThreadIndex(max_entries=2)
+        index.remember('c', ['<a@x>'], 1)
+        index.remember('c', ['<b@x>'], 2)
+        index.find('c', ['<a@x>'])
+        index.remember('c', ['<c@x>'], 3)
+        self.assertEqual(index.find('c', ['<a@x>']), 1)
+        self.assertIsNone(index.find('c', ['<b@x>']))
+
+
+if __name__ == '__main__':
+    unittest.main()
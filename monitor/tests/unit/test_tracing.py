@@ -0,0 +1,82 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+import random
+import unittest
+from app.core.email_handler import parse_internaldate
+from app.core.tracing import (AlertTrace, LatencyTracker, QuantileSketch,
+                              ARRIVAL, DETECTED, FETCHED, PARSED, SEND_ATTEMPT, DELIVERED)
+
+
+class TestQuantileSketch(unittest.TestCase):
+    def test_relative_accuracy(self):
+        rng = random.Random(7)
+        values = sorted(rng.expovariate(1 / 5.0) for _ in range(5000))
+        sketch = QuantileSketch(relative_accuracy=0.01)
+        for value in values:
+            sketch.add(value)
+
+        for q in (0.5, 0.9, 0.95, 0.99):
+            exact = values[int(q * (len(values) - 1))]
+            self.assertAlmostEqual(sketch.quantile(q), exact, delta=exact * 0.02)
+        self.assertEqual(sketch.count, 5000)
+
+    def test_memory_is_bounded(self):
+        sketch = QuantileSketch(max_buckets=64)
+        for exponent in range(-3, 300):
+            sketch.add(1.1 ** exponent)
+        self.assertLessEqual(len(sketch.buckets), 64)
+
+    def test_empty(self):
+        self.assertIsNone(QuantileSketch().quantile(0.5))
+
+
+class TestAlertTrace(unittest.TestCase):
+    def test_stage_durations_and_retries(self):
+        trace = AlertTrace('a@x.com', arrival=100.0)
+        trace.mark(DETECTED, 130.0)
+        trace.mark(FETCHED, 130.5)
+        trace.mark(PARSED, 130.6)
+        trace.mark(SEND_ATTEMPT, 131.0)
+        trace.mark(SEND_ATTEMPT, 133.0)
+        trace.mark(DELIVERED, 133.4)
+
+        self.assertAlmostEqual(trace.elapsed(ARRIVAL, DELIVERED), 33.4)
+        self.assertEqual(len(trace.attempts), 2)
+        durations = trace.stage_durations()
+        self.assertAlmostEqual(durations[DETECTED], 30.0)
+        self.assertAlmostEqual(durations[DELIVERED], 2.4)
+
+    def test_clock_skew_never_negative(self):
+        trace = AlertTrace('a@x.com', arrival=200.0)
+        trace.mark(DELIVERED, 150.0)
+        self.assertEqual(trace.elapsed(ARRIVAL, DELIVERED), 0.0)
+
+
+class TestLatencyTracker(unittest.TestCase):
+    def test_per_account_and_destination(self):
+        tracker = LatencyTracker()
+        for delay in (1.0, 2.0, 3.0):
+            trace = AlertTrace('a@x.com', arrival=0.0)
+            trace.destination = '123:999'
+            trace.mark(DETECTED, 0.5)
+            trace.mark(DELIVERED, delay)
+            tracker.record(trace)
+
+        self.assertAlmostEqual(tracker.quantile('account', 'a@x.com', 'end_to_end', 0.5), 2.0, delta=0.05)
+        self.assertIsNotNone(tracker.quantile('destination', '123:999', 'detection_to_delivery', 0.95))
+        text = '\n'.join(tracker.render())
+        self.assertIn('stage="end_to_end",quantile="0.95"', text)
+        self.assertIn('wegnots_alert_stage_seconds_count{account="a@x.com",stage="end_to_end"} 3', text)
+
+
+class TestInternalDate(unittest.TestCase):
+    def test_parse_fetch_response(self):
+        meta = b'12 (INTERNALDATE "17-Jul-2025 02:44:25 -0300" RFC822 {342}'
+        self.assertIsNotNone(parse_internaldate(meta))
+        self.assertIsNone(parse_internaldate(b'12 (RFC822 {342}'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock
+from app.core.bot_registry import BotRegistry
+from app.core.update_poller import UpdatePoller
+
+TOKEN = '123456:ABCDEF'
+
+
+def make_response(status_code, updates=None):
+    response = MagicMock(status_code=status_code, text='')
+    response.json.return_value = {'ok': status_code == 200, 'result': updates or []}
+    return response
+
+
+class TestUpdatePoller(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.registry = BotRegistry(os.path.join(self.tmpdir.name, 'bots.json'))
+        self.executor = ThreadPoolExecutor(max_workers=2)
+        self.commands = MagicMock()
+        self.poller = UpdatePoller(TOKEN, self.executor, commands=self.commands, registry=self.registry)
+        self.poller._session = MagicMock()
+
+    def tearDown(self):
+        self.executor.shutdown(wait=True)
+        self.tmpdir.cleanup()
+
+    def test_long_poll_dispatches_and_persists_offset(self):
+        updates = [
+            {'update_id': 10, 'message': {'chat': {'id': 5}, 'text': '/help'}},
+            {'update_id': 11, 'message': {'chat': {'id': 5}, 'text': '/status'}},
+        ]
+        self.poller._session.get.return_value = make_response(200, updates)
+
+        self.assertEqual(self.poller.poll_once(), updates)
+        self.executor.shutdown(wait=True)
+
+        _, kwargs = self.poller._session.get.call_args
+        self.assertEqual(kwargs['params']['timeout'], 50)
+        self.assertEqual(kwargs['params']['offset'], 0)
+        self.assertEqual(self.commands.process_update.call_count, 2)
+        self.assertEqual(self.registry.get_update_offset(TOKEN), 12)
+        self.assertEqual(self.registry.get_chat_ids(TOKEN), ['5'])
+
+        # O offset sobrevive a uma nova instância (reinício do processo)
+        restarted = UpdatePoller(TOKEN, self.executor, commands=self.commands, registry=self.registry)
+        self.assertEqual(restarted.offset, 12)
+
+    def test_offset_advances_only_after_handler_returns(self):
+        updates = [{'update_id': 10, 'message': {'chat': {'id': 5}, 'text': '/help'}},
+                   {'update_id': 11, 'message': {'chat': {'id': 5}, 'text': '/status'}}]
+        self.poller._session.get.return_value = make_response(200, updates)
+        offsets = []
+        self.commands.process_update.side_effect = lambda update: offsets.append(
+            self.registry.get_update_offset(TOKEN))
+
+        self.poller.poll_once()
+
+        self.assertEqual(offsets[0], 0)
+        self.assertLessEqual(max(offsets), 11)
+        self.assertEqual(self.registry.get_update_offset(TOKEN), 12)
+
+    def test_empty_poll_keeps_offset(self):
+        self.registry.set_update_offset(TOKEN, 7)
+        poller = UpdatePoller(TOKEN, self.executor, commands=self.commands, registry=self.registry)
+        poller._session = MagicMock()
+        poller._session.get.return_value = make_response(200, [])
+
+        self.assertEqual(poller.poll_once(), [])
+        self.assertEqual(self.registry.get_update_offset(TOKEN), 7)
+
+    def test_run_deletes_webhook_before_polling(self):
+        self.poller._session.post.return_value = make_response(200)
+        self.poller._session.get.side_effect = lambda *args, **kwargs: self.poller._stop_event.set() or make_response(200)
+
+        self.poller._run()
+
+        url = self.poller._session.post.call_args[0][0]
+        self.assertTrue(url.endswith('/deleteWebhook'))
+        self.assertNotIn('drop_pending_updates', str(self.poller._session.post.call_args))
+        self.assertEqual([name for name, _args, _kwargs in self.poller._session.method_calls], ['post', 'get'])
+
+    def test_conflict_returns_none(self):
+        self.poller._session.get.return_value = make_response(409)
+        self.assertIsNone(self.poller.poll_once())
+        self.commands.process_update.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+import unittest
+from unittest.mock import MagicMock
+from app.core.user_model import UserModel
+
+CENTRAL = {'_id': 1, 'email': 'sooretama@megasec.com.br', 'chat_id': '100', 'is_central_server': True}
+OPERATOR = {'_id': 3, 'email': 'op@megasec.com.br', 'chat_id': '300',
+            'notification_preferences': {'receive_low': False},
+            'notification_rules': [{'sender': '*@cameras.com'}]}
+
+
+class TestUserModelRecipients(unittest.TestCase):
+    def setUp(self):
+        self.model = UserModel(MagicMock())
+        self.collection = self.model.collection = MagicMock()
+
+    def test_batch_uses_single_in_query(self):
+        self.collection.find.return_value = [dict(CENTRAL), dict(OPERATOR)]
+        senders = [f'Cam {i} <cam{i}@cameras.com>' for i in range(300)] + ['x@y.com']
+
+        result = self.model.get_recipients_for_senders(senders, level='critical')
+
+        self.assertEqual(self.collection.find.call_count, 1)
+        query = self.collection.find.call_args[0][0]['$or']
+        self.assertIn('cam0@cameras.com', query[0]['email']['$in'])
+        self.assertIn('*@cameras.com', query[1]['notification_rules.sender']['$in'])
+        self.assertEqual(sorted(u['chat_id'] for u in result['Cam 7 <cam7@cameras.com>']), ['100', '300'])
+        self.assertEqual([u['chat_id'] for u in result['x@y.com']], ['100'])
+
+    def test_preferences_applied(self):
+        self.collection.find.return_value = [dict(CENTRAL), dict(OPERATOR)]
+        result = self.model.get_recipients_for_senders(['cam1@cameras.com'], level='low')
+        self.assertEqual([u['chat_id'] for u in result['cam1@cameras.com']], ['100'])
+
+    def test_all_levels_skips_preferences(self):
+        self.collection.find.return_value = [dict(CENTRAL), dict(OPERATOR)]
+        result = self.model.get_recipients_for_senders(['cam1@cameras.com'], all_levels=True)
+        self.assertEqual(sorted(u['chat_id'] for u in result['cam1@cameras.com']), ['100', '300'])
+        self.assertEqual(self.collection.find.call_count, 1)
+
+    def test_central_deduplicated_by_id(self):
+        self.collection.find.return_value = [dict(CENTRAL)]
+        self.collection.find_one.return_value = dict(CENTRAL)
+        self.assertEqual(len(self.model.get_users_by_email('sooretama@megasec.com.br')), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+from app.core.volume_anomaly import VolumeAnomalyDetector, Baseline, format_anomaly
+
+NOW = 1_700_000_000
+
+
+class TestVolumeAnomalyDetector(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.notify = MagicMock()
+        self.detector = VolumeAnomalyDetector(notify=self.notify, warmup_samples=10, min_flood_count=20,
+                                              path=os.path.join(self.tmp.name, 'baseline.json'))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _warm_up(self, account='a@x.com', polls=30, count=1):
+        now = NOW
+        for index in range(polls):
+            now = NOW + index * 60
+            self.detector.observe(account, count if index % 2 else 0, now=now)
+        return now
+
+    def test_flood_alerts_once_within_cooldown(self):
+        now = self._warm_up()
+        anomalies = self.detector.observe('a@x.com', 80, now=now + 60)
+        self.assertEqual([anomaly['kind'] for anomaly in anomalies], ['flood'])
+        self.assertIn('Volume anômalo', self.notify.call_args[0][0])
+        self.assertEqual(self.detector.observe('a@x.com', 90, now=now + 120), [])
+        self.assertEqual(self.notify.call_count, 1)
+
+    def test_no_flood_before_warmup(self):
+        self.detector.observe('a@x.com', 0, now=NOW)
+        self.assertEqual(self.detector.observe('a@x.com', 500, now=NOW + 60), [])
+
+    def test_quiet_alert_once_per_episode(self):
+        now = self._warm_up()
+        volume = self.detector._accounts['a@x.com']
+        for slot in range(168):
+            volume.seasonal[slot] = Baseline(mean=1.0, samples=5)
+        kinds = []
+        for minute in range(1, 61):
+            kinds += [anomaly['kind'] for anomaly in self.detector.observe('a@x.com', 0, now=now + minute * 60)]
+        self.assertEqual(kinds, ['quiet'])
+        self.assertIn('sem e-mails', format_anomaly({'account': 'a@x.com', 'kind': 'quiet',
+                                                      'silence': 3600, 'expected': 60}))
+
+    def test_format_escapes_account(self):
+        message = format_anomaly({'account': 'ops_team@x.com', 'kind': 'flood', 'count': 80, 'rate': 80.0,
+                                  'expected': 1.0})
+        self.assertIn('ops\\_team@x.com', message)
+
+    def test_global_hourly_cap(self):
+        self.detector.max_alerts_per_hour = 2
+        for account in ('a@x.com', 'b@x.com', 'c@x.com'):
+            self._warm_up(account)
+        now = NOW + 30 * 60
+        fired = [self.detector.observe(account, 80, now=now) for account in ('a@x.com', 'b@x.com', 'c@x.com')]
+        self.assertEqual([len(anomalies) for anomalies in fired], [1, 1, 0])
+
+    def test_baseline_round_trip(self):
+        self._warm_up()
+        self.detector.save()
+        restored = VolumeAnomalyDetector(path=self.detector.path)
+        self.assertTrue(restored.load())
+        original = self.detector._accounts['a@x.com'].overall
+        self.assertAlmostEqual(restored._accounts['a@x.com'].overall.mean, original.mean)
+        self.assertEqual(restored._accounts['a@x.com'].overall.samples, original.samples)
+
+
+if __name__ == '__main__':
+    unittest.main()
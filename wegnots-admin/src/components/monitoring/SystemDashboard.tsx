@@ -23,6 +23,7 @@ import {
 import { useQuery } from '@tanstack/react-query';
 import { monitoringService } from '../../services/monitoring';
 import { SystemStatus } from '../../types/monitoring';
+import { useMonitorEvents } from '../../hooks/useMonitorEvents';
 
 interface StatCardProps {
   title: string;
@@ -66,10 +67,11 @@ const StatCard: React.FC<StatCardProps> = ({ title, value, icon, color, progress
 );
 
 export const SystemDashboard: React.FC = () => {
+  useMonitorEvents();
   const { data: status, isLoading, error, refetch } = useQuery<SystemStatus>({
     queryKey: ['systemStatus'],
     queryFn: monitoringService.getSystemStatus,
-    refetchInterval: 30000 // Atualiza a cada 30 segundos
+    refetchInterval: 300000 // Atualizações chegam pelo stream de eventos; consulta periódica só como reserva
   });
 
   const getStatusColor = (status: string) => {
@@ -0,0 +1,107 @@
+import { useEffect } from 'react';
+import { useQueryClient } from '@tanstack/react-query';
+import type { AccountStatus, SystemStatus } from '../types/monitoring';
+
+const STATUS_KEY = ['systemStatus'];
+
+interface AlertEvent {
+  account: string;
+  outcome?: 'delivered' | 'failed' | 'suppressed' | 'coalesced';
+  delivered: boolean;
+}
+
+interface AccountStatusEvent {
+  account: string;
+  status: AccountStatus['status'];
+}
+
+interface QueueDepthEvent {
+  total: number;
+}
+
+// Mesma agregação do /api/monitoring/status: conectado só se todas as contas estiverem
+const imapStatus = (accounts: Record<string, AccountStatus>): AccountStatus['status'] => {
+  const states = Object.values(accounts).map((account) => account.status);
+  if (states.length === 0) return 'disconnected';
+  if (states.every((state) => state === 'connected')) return 'connected';
+  return states.includes('error') ? 'error' : 'disconnected';
+};
+
+const applyAlert = (status: SystemStatus, event: AlertEvent): SystemStatus => {
+  const delivered = event.outcome ? event.outcome === 'delivered' : event.delivered;
+  const failed = event.outcome ? event.outcome === 'failed' : !event.delivered;
+  const account = status.accounts?.[event.account];
+  return {
+    ...status,
+    monitoring: {
+      ...status.monitoring,
+      processedEmails: status.monitoring.processedEmails + 1,
+      sentAlerts: status.monitoring.sentAlerts + (delivered ? 1 : 0),
+      failedAlerts: (status.monitoring.failedAlerts ?? 0) + (failed ? 1 : 0),
+      lastAlert: delivered ? new Date().toISOString() : status.monitoring.lastAlert,
+    },
+    accounts: account
+      ? {
+          ...status.accounts,
+          [event.account]: {
+            ...account,
+            emailsToday: account.emailsToday + 1,
+            alertsToday: account.alertsToday + (delivered ? 1 : 0),
+            failedToday: account.failedToday + (failed ? 1 : 0),
+          },
+        }
+      : status.accounts,
+  };
+};
+
+const applyAccountStatus = (status: SystemStatus, event: AccountStatusEvent): SystemStatus => {
+  const account = status.accounts?.[event.account];
+  if (!account) return status;
+  const accounts = { ...status.accounts, [event.account]: { ...account, status: event.status } };
+  return { ...status, accounts, imap: { ...status.imap, status: imapStatus(accounts) } };
+};
+
+const applyQueueDepth = (status: SystemStatus, event: QueueDepthEvent): SystemStatus => ({
+  ...status,
+  monitoring: { ...status.monitoring, queueDepth: event.total },
+});
+
+// Atualiza o cache do react-query a partir do stream SSE do monitor (/api/events),
+// em vez de consultar o status periodicamente em cada aba aberta. Cada evento é
+// aplicado diretamente ao status em cache; só um reset (ou uma conta ainda
+// desconhecida) leva a uma nova consulta.
+export const useMonitorEvents = () => {
+  const queryClient = useQueryClient();
+
+  useEffect(() => {
+    const baseURL = import.meta.env.VITE_API_URL || 'http://localhost:8000';
+    const token = localStorage.getItem('token');
+    const url = `${baseURL}/api/events${token ? `?token=${encodeURIComponent(token)}` : ''}`;
+    // O EventSource reconecta sozinho e reenvia Last-Event-ID
+    const source = new EventSource(url);
+
+    const listen = <T>(type: string, apply: (status: SystemStatus, event: T) => SystemStatus) => {
+      source.addEventListener(type, (message) => {
+        const event: T = JSON.parse((message as MessageEvent).data);
+        const status = queryClient.getQueryData<SystemStatus>(STATUS_KEY);
+        if (!status) return;
+        const { account } = event as { account?: string };
+        if (account && !status.accounts?.[account]) {
+          // Uma consulta basta para uma rajada de eventos da conta nova
+          if (!queryClient.isFetching({ queryKey: STATUS_KEY })) {
+            queryClient.invalidateQueries({ queryKey: STATUS_KEY });
+          }
+          return;
+        }
+        queryClient.setQueryData<SystemStatus>(STATUS_KEY, apply(status, event));
+      });
+    };
+    listen<AlertEvent>('alert', applyAlert);
+    listen<AccountStatusEvent>('account-status', applyAccountStatus);
+    listen<QueueDepthEvent>('queue-depth', applyQueueDepth);
+    // Eventos perdidos não estão mais no buffer do servidor: recarrega tudo
+    source.addEventListener('reset', () => queryClient.invalidateQueries());
+
+    return () => source.close();
+  }, [queryClient]);
+};
@@ -22,6 +22,21 @@ api.interceptors.request.use((config) => {
   return config;
 });
 
+// Listas da API são paginadas (?limit=N&after=<cursor>, próximo cursor em X-Next-Cursor):
+// segue os cursores até a última página para não truncar a lista
+const PAGE_SIZE = 200;
+
+export const getAllPages = async <T>(url: string): Promise<T[]> => {
+  const items: T[] = [];
+  let after: string | undefined;
+  do {
+    const response = await api.get<T[]>(url, { params: { limit: PAGE_SIZE, ...(after ? { after } : {}) } });
+    items.push(...response.data);
+    after = response.headers['x-next-cursor'] || undefined;
+  } while (after);
+  return items;
+};
+
 // Função para obter dados de monitoramento
 export const fetchMonitoringData = async () => {
   if (USE_MOCK) {
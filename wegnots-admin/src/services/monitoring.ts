@@ -1,4 +1,4 @@
-import { api } from './api';
+import { api, getAllPages } from './api';
 import type { MonitoredEmail, TelegramConfig, NotificationRouting, CentralServer } from '../types/monitoring';
 
 export const monitoringService = {
@@ -20,8 +20,7 @@ export const monitoringService = {
 
   // E-mails monitorados
   async getMonitoredEmails() {
-    const { data } = await api.get<MonitoredEmail[]>('/api/emails');
-    return data;
+    return getAllPages<MonitoredEmail>('/api/emails');
   },
 
   async createMonitoredEmail(email: Omit<MonitoredEmail, 'id' | 'createdAt' | 'updatedAt'>) {
@@ -40,8 +39,7 @@ export const monitoringService = {
 
   // Configurações do Telegram
   async getTelegramConfigs() {
-    const { data } = await api.get<TelegramConfig[]>('/api/telegram/configs');
-    return data;
+    return getAllPages<TelegramConfig>('/api/telegram/configs');
   },
 
   async createTelegramConfig(config: Omit<TelegramConfig, 'id'>) {
@@ -60,8 +58,7 @@ export const monitoringService = {
 
   // Roteamento de notificações
   async getNotificationRoutings() {
-    const { data } = await api.get<NotificationRouting[]>('/api/routing-rules');
-    return data;
+    return getAllPages<NotificationRouting>('/api/routing-rules');
   },
 
   async createNotificationRouting(routing: Omit<NotificationRouting, 'id' | 'createdAt' | 'updatedAt'>) {
@@ -18,6 +18,7 @@ export interface NotificationRouting {
   id: string;
   emailId: string;
   telegramChatIds: string[];
+  senders?: string[];
   useRocketChat: boolean;
   rocketChatChannel?: string;
   createdAt: string;
@@ -50,7 +51,18 @@ export interface SystemStatus {
     lastAlert: string;
     processedEmails: number;
     sentAlerts: number;
+    failedAlerts?: number;
+    queueDepth?: number;
   };
+  accounts?: Record<string, AccountStatus>;
+}
+
+export interface AccountStatus {
+  status: 'connected' | 'disconnected' | 'error';
+  lastCheck: string | null;
+  emailsToday: number;
+  alertsToday: number;
+  failedToday: number;
 }
 
 export interface MonitoringConfig {